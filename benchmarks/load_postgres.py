@@ -0,0 +1,169 @@
+import os
+import sys
+
+from psycopg2 import sql
+
+# Necessary to import modules from parent folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.database_utils import create_database, get_connection
+from utils.create_results_table import create_table_fresh_statement
+from utils.energy_label_index import ENERGY_LABEL_CLASSES
+from utils.results_writer import rows_to_copy_buffer
+from utils.file_utils import get_env
+
+# The synthetic data is loaded into its own database,
+# never into the database with the real data.
+BENCHMARK_DBNAME = f"{get_env()['POSTGRES_DBNAME']}_benchmark"
+
+utils_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'utils')
+
+# Number of rows per COPY.
+COPY_SIZE = 500000
+
+# The tables that are not created with the SQL files of utils/,
+# with the columns that the modules use.
+create_tables_statement = '''
+DROP TABLE IF EXISTS
+	bag,
+	energy_labels,
+	cbs_pc6_2019_energy_use,
+	cbs_pc6_2017_kerncijfers,
+	cbs_84983ned_woningen_hoofdverwarmings_buurt_2019_typed,
+	cbs_83878ned_aardgaslevering_woningkenmerken,
+	cbs_83882ned_elektriciteitslevering_woningkenmerken,
+	benchmark_info;
+CREATE TABLE energy_labels
+(
+	vbo_id character(16),
+	pc6 character(6),
+	energieklasse energy_label_class,
+	epi_imputed real
+);
+CREATE TABLE cbs_84983ned_woningen_hoofdverwarmings_buurt_2019_typed
+(
+	area_code varchar,
+	type_verwarmingsinstallatie varchar,
+	woningen double precision
+);
+CREATE TABLE cbs_83878ned_aardgaslevering_woningkenmerken
+(
+	perioden varchar,
+	energielabelklasse energy_label_class,
+	woningkenmerken varchar,
+	gebruiks_oppervlakteklasse varchar,
+	bouwjaarklasse varchar,
+	percentielen varchar,
+	aardgasleveringen_openbare_net double precision
+);
+CREATE TABLE cbs_83882ned_elektriciteitslevering_woningkenmerken
+(
+	perioden varchar,
+	woningkenmerken varchar,
+	gebruiks_oppervlakteklasse varchar,
+	bewonersklasse_woningen varchar,
+	percentielen varchar,
+	elektriciteitsleveringen_openbare_net double precision
+);
+CREATE TABLE benchmark_info
+(
+	n_dwellings integer,
+	seed integer
+);
+'''
+
+# The indexes of setup.py
+indexes = [
+	('bag', 'pc6'),
+	('bag', 'buurt_id'),
+	('energy_labels', 'vbo_id'),
+	('energy_labels', 'pc6'),
+	('cbs_pc6_2019_energy_use', 'pc6'),
+	('cbs_pc6_2017_kerncijfers', 'pc6'),
+	('cbs_84983ned_woningen_hoofdverwarmings_buurt_2019_typed', 'area_code')
+]
+
+def get_benchmark_connection(dbname=BENCHMARK_DBNAME):
+	create_database(dbname)
+	return get_connection(dbname=dbname)
+
+def create_types(cursor):
+	'''
+	Create the types of setup.py, if they don't exist yet.
+	'''
+	cursor.execute("SELECT typname FROM pg_type WHERE typname IN ('energy_label_class', 'energy_label_class_range')")
+	existing_types = {typname for (typname,) in cursor.fetchall()}
+	if 'energy_label_class' not in existing_types:
+		cursor.execute(sql.SQL('CREATE TYPE energy_label_class AS ENUM ({})').format(
+			sql.SQL(', ').join([sql.Literal(label) for label in ENERGY_LABEL_CLASSES])
+		))
+	if 'energy_label_class_range' not in existing_types:
+		cursor.execute('CREATE TYPE energy_label_class_range AS RANGE (subtype=energy_label_class)')
+
+def execute_sql_file(cursor, file_name):
+	with open(os.path.join(utils_dir, file_name)) as file:
+		cursor.execute(file.read())
+
+def copy_rows(cursor, table_name, columns, rows):
+	copy_statement = sql.SQL('COPY {table_name} ({columns}) FROM STDIN').format(
+		table_name=sql.Identifier(table_name),
+		columns=sql.SQL(', ').join([sql.Identifier(column) for column in columns])
+	)
+	cursor.copy_expert(copy_statement, rows_to_copy_buffer([dict(zip(columns, row)) for row in rows]))
+
+def is_loaded(connection, dataset):
+	cursor = connection.cursor()
+	cursor.execute("SELECT to_regclass('benchmark_info') IS NOT NULL")
+	(exists,) = cursor.fetchone()
+	if not exists:
+		cursor.close()
+		return False
+	cursor.execute('SELECT n_dwellings, seed FROM benchmark_info')
+	info = cursor.fetchone()
+	cursor.close()
+	return info == (len(dataset), dataset.seed)
+
+def load_dataset(connection, dataset):
+	'''
+	Load the SyntheticDataset into the database of 'connection',
+	unless it has already been loaded, and empty the results.
+	'''
+	cursor = connection.cursor()
+	if is_loaded(connection, dataset):
+		print('   synthetic data has already been loaded')
+	else:
+		create_types(cursor)
+		cursor.execute(create_tables_statement)
+		execute_sql_file(cursor, 'BAG_create_table.sql')
+		execute_sql_file(cursor, 'CBS_PC6_2019_energy_use_create_table.sql')
+		execute_sql_file(cursor, 'CBS_PC6_2017_kerncijfers_create_table.sql')
+
+		print('   loading bag...')
+		for start in range(0, len(dataset), COPY_SIZE):
+			copy_rows(cursor, 'bag', ['vbo_id', 'pc6', 'oppervlakte', 'bouwjaar', 'woningtype', 'buurt_id'], dataset.get_bag_rows(start, min(start + COPY_SIZE, len(dataset))))
+
+		print('   loading energy_labels...')
+		n_labels = len(dataset.label_dwellings)
+		for start in range(0, n_labels, COPY_SIZE):
+			copy_rows(cursor, 'energy_labels', ['vbo_id', 'pc6', 'energieklasse', 'epi_imputed'], dataset.get_energy_label_rows(start, min(start + COPY_SIZE, n_labels)))
+
+		print('   loading CBS tables...')
+		copy_rows(cursor, 'cbs_pc6_2019_energy_use', ['pc6', 'gemiddelde_aardgaslevering_woningen', 'gemiddelde_elektriciteitslevering_woningen'], dataset.get_energy_use_rows())
+		copy_rows(cursor, 'cbs_pc6_2017_kerncijfers', ['pc6', 'gem_hh_gr'], dataset.get_kerncijfers_rows())
+		copy_rows(cursor, 'cbs_84983ned_woningen_hoofdverwarmings_buurt_2019_typed', ['area_code', 'type_verwarmingsinstallatie', 'woningen'], dataset.get_heating_shares_rows())
+		copy_rows(cursor, 'cbs_83878ned_aardgaslevering_woningkenmerken', ['perioden', 'energielabelklasse', 'woningkenmerken', 'gebruiks_oppervlakteklasse', 'bouwjaarklasse', 'percentielen', 'aardgasleveringen_openbare_net'], [('2019', *row) for row in dataset.get_gas_benchmark_rows()])
+		copy_rows(cursor, 'cbs_83882ned_elektriciteitslevering_woningkenmerken', ['perioden', 'woningkenmerken', 'gebruiks_oppervlakteklasse', 'bewonersklasse_woningen', 'percentielen', 'elektriciteitsleveringen_openbare_net'], [('2019', *row) for row in dataset.get_electricity_benchmark_rows()])
+
+		print('   creating indexes and pc6_stats...')
+		for (table_name, column_name) in indexes:
+			cursor.execute(sql.SQL('CREATE INDEX ON {table_name} ({column_name})').format(
+				table_name=sql.Identifier(table_name),
+				column_name=sql.Identifier(column_name)
+			))
+		execute_sql_file(cursor, 'pc6_stats_create_table.sql')
+		cursor.execute('ANALYZE')
+		cursor.execute('INSERT INTO benchmark_info (n_dwellings, seed) VALUES (%s, %s)', (len(dataset), dataset.seed))
+
+	cursor.execute(create_table_fresh_statement)
+	cursor.execute('ALTER TABLE results ADD PRIMARY KEY (vbo_id)')
+	cursor.close()
+	connection.commit()
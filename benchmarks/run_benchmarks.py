@@ -0,0 +1,272 @@
+import json
+import os
+import sys
+import time
+from unittest import mock
+
+import psycopg2.extensions
+
+try:
+	import resource
+except ImportError:
+	# Not available on Windows.
+	resource = None
+
+# Necessary to import modules from parent folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import check_module_kwargs, get_buurt_ids, get_modules, get_regional_modules, instrument, process_buurten
+from utils.instrumentation import PIPELINE_LABEL, Instrumentation
+from utils.pipeline_progress import Checkpointer
+from utils.record_replay import ReplayConnection, load_recording
+from utils.results_writer import ResultsWriter
+
+sys.path.append(os.path.dirname(__file__))
+from synthetic_data import SyntheticDataset
+from stand_in import StandInConnection, register_range
+
+def get_peak_rss():
+	'''
+	Get the peak resident set size of
+	the process in bytes, or None.
+	'''
+	if resource is None:
+		return None
+	peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# In bytes on macOS, in kilobytes on Linux.
+	return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+def get_statement_count(instrumentation):
+	return sum([stats['statements'] for stats in instrumentation.stats.values()])
+
+def run_benchmark(connection, N=None, module_kwargs=None, batch=False, flush_size=10000, commit_every=50000, commit_interval=300):
+	'''
+	Run the modules and the pipeline on the dwellings of the
+	database of 'connection' (at most N) like pipeline.pipeline()
+	does, and measure the time, SQL statements and peak RSS.
+	Returns the measurements as a dict.
+	'''
+	check_module_kwargs(module_kwargs or {}, batch)
+	peak_rss_start = get_peak_rss()
+
+	# The connection is instrumented first, so the
+	# statements of the initialization are counted.
+	cursor_factory = connection.cursor_factory
+	instrumentation = Instrumentation()
+	instrumentation.instrument_connection(connection)
+
+	start_time = time.perf_counter()
+	module_kwargs = {'silent': True, **(module_kwargs or {})}
+	if not isinstance(connection, psycopg2.extensions.connection):
+		# The stand-in has no catalog to read the range type from.
+		with mock.patch('modules.energy_label_module.register_range', register_range):
+			regional_modules = get_regional_modules(connection, **module_kwargs)
+			modules = get_modules(connection, regional_modules, **module_kwargs)
+	else:
+		regional_modules = get_regional_modules(connection, **module_kwargs)
+		modules = get_modules(connection, regional_modules, **module_kwargs)
+	initialization_time = time.perf_counter() - start_time
+	initialization_statements = get_statement_count(instrumentation)
+	# Start over for the pipeline, instrument()
+	# instruments the connection again.
+	connection.cursor_factory = cursor_factory
+	instrumentation = Instrumentation()
+	instrument(instrumentation, connection, modules, regional_modules)
+
+	start_time = time.perf_counter()
+	buurt_ids = get_buurt_ids(connection)
+	results_writer = ResultsWriter(connection, flush_size=flush_size)
+	checkpointer = Checkpointer(connection, results_writer, commit_every, commit_interval)
+
+	n_dwellings = process_buurten(buurt_ids, connection, modules, checkpointer, N, batch)
+	checkpointer.commit()
+	pipeline_time = time.perf_counter() - start_time
+
+	report = instrumentation.get_report()
+	pipeline_statements = get_statement_count(instrumentation)
+
+	module_stats = {}
+	for (owner, methods) in report['modules'].items():
+		if (owner, 'other') == PIPELINE_LABEL:
+			continue
+		time_ = sum([stats['self_time'] for stats in methods.values()])
+		statements = sum([stats['statements'] for stats in methods.values()])
+		module_stats[owner] = {
+			'time': time_,
+			'dwellings_per_second': n_dwellings / time_ if time_ > 0 else None,
+			'statements': statements,
+			'statements_per_dwelling': statements / n_dwellings if n_dwellings > 0 else None,
+			'db_time': sum([stats['db_time'] for stats in methods.values()])
+		}
+
+	return {
+		'initialization': {
+			'time': initialization_time,
+			'statements': initialization_statements
+		},
+		'pipeline': {
+			'dwellings': n_dwellings,
+			'buurten': len(buurt_ids),
+			'time': pipeline_time,
+			'dwellings_per_second': n_dwellings / pipeline_time if pipeline_time > 0 else None,
+			'statements': pipeline_statements,
+			'statements_per_dwelling': pipeline_statements / n_dwellings if n_dwellings > 0 else None,
+			# E.g. the dwellings of the buurten and the COPY of the results.
+			'statements_outside_modules': instrumentation.get_stats(PIPELINE_LABEL)['statements'],
+			'written_results': results_writer.n_written
+		},
+		'peak_rss_start': peak_rss_start,
+		'peak_rss': get_peak_rss(),
+		'modules': module_stats
+	}
+
+def format_bytes(n_bytes):
+	return 'unknown' if n_bytes is None else f'{n_bytes / 2 ** 20:,.0f} MB'
+
+def print_report(report, n=None):
+	'''
+	Print the report of run_benchmark(), with
+	the 'n' modules with the most time.
+	'''
+	initialization = report['initialization']
+	pipeline = report['pipeline']
+	print(f"\nInitialization: {initialization['time']:.2f} s, {initialization['statements']:,} statements")
+	print(f"Pipeline: {pipeline['dwellings']:,} dwellings in {pipeline['time']:.2f} s ({pipeline['dwellings_per_second'] or 0:,.0f} dwellings/s), {pipeline['statements_per_dwelling'] or 0:.3f} statements per dwelling ({pipeline['statements_outside_modules']:,} outside of the modules)")
+	print(f"Peak RSS: {format_bytes(report['peak_rss'])} ({format_bytes(report['peak_rss_start'])} before the modules)")
+
+	print('\nModules (by time, without the time in other modules):')
+	modules = sorted(report['modules'].items(), key=lambda item: item[1]['time'], reverse=True)
+	for (owner, stats) in modules[:n]:
+		print(f"   {owner}: {stats['time']:.2f} s ({stats['dwellings_per_second'] or 0:,.0f} dwellings/s), {stats['statements_per_dwelling'] or 0:.3f} statements per dwelling, {stats['db_time']:.2f} s in database")
+
+def print_missing_statements(connection, n=5):
+	missing = connection.get_missing_report()
+	if len(missing) == 0:
+		return
+	print(f'\n{sum([statement["count"] for statement in missing]):,} executions of statements that were not recorded (without results), e.g.:')
+	for statement in missing[:n]:
+		print(f"   {statement['count']:,} times: {statement['statement'][:100]} with parameters {statement['parameters']}")
+
+def main(*args):
+	'''
+	Benchmark the modules and the pipeline on a synthetic
+	dataset, against an in-process stand-in of the database
+	or (with --postgres) a local Postgres database, or on a
+	recording of a pipeline run (with --replay).
+
+	Options:
+		--dwellings {n}: number of dwellings in the synthetic
+		dataset (default: 100000, the real BAG has about 8 million)
+		--data_seed {seed}: seed of the synthetic dataset (default: 0)
+		--N {N}: process at most N dwellings of the dataset
+		--postgres: load the dataset into the database
+		'{POSTGRES_DBNAME}_benchmark' (if it is not there yet)
+		and run against it instead of the stand-in
+		--replay {path}: replay the statements recorded with
+		`pipeline.py --record {path}` instead, e.g. with the
+		same --N and options as the recorded run
+		--output {path}: save the report to 'path' as JSON
+		--flush_size, --batch, --pc6_stats, --insulation_table,
+		--convolution_resolution, --region_cache_size, --seed,
+		--realizations: as for pipeline.py
+	'''
+	if len(args) == 0:
+		args = sys.argv
+
+	n_dwellings = 100000
+	if '--dwellings' in args:
+		index = args.index('--dwellings')
+		n_dwellings = int(args[index + 1])
+
+	data_seed = 0
+	if '--data_seed' in args:
+		index = args.index('--data_seed')
+		data_seed = int(args[index + 1])
+
+	N = None
+	if '--N' in args:
+		index = args.index('--N')
+		N = int(args[index + 1])
+
+	flush_size = 10000
+	if '--flush_size' in args:
+		index = args.index('--flush_size')
+		flush_size = int(args[index + 1])
+
+	module_kwargs = {}
+	if '--pc6_stats' in args:
+		module_kwargs['pc6_stats'] = True
+
+	if '--convolution_resolution' in args:
+		index = args.index('--convolution_resolution')
+		module_kwargs['convolution_resolution'] = float(args[index + 1])
+
+	if '--insulation_table' in args:
+		module_kwargs['insulation_table'] = True
+
+	if '--region_cache_size' in args:
+		index = args.index('--region_cache_size')
+		module_kwargs['region_cache_size'] = int(args[index + 1])
+
+	if '--seed' in args:
+		index = args.index('--seed')
+		module_kwargs['seed'] = int(args[index + 1])
+
+	batch = '--batch' in args
+
+	if '--realizations' in args:
+		index = args.index('--realizations')
+		module_kwargs['realizations'] = int(args[index + 1])
+		batch = True
+
+	output_path = None
+	if '--output' in args:
+		index = args.index('--output')
+		output_path = args[index + 1]
+
+	summary = None
+	if '--replay' in args:
+		index = args.index('--replay')
+		replay_path = args[index + 1]
+		print(f'\nLoading recording {replay_path}...')
+		recording = load_recording(replay_path)
+		print(f'   {len(recording):,} executions of {len(recording.statements):,} statements')
+		connection = ReplayConnection(recording)
+		database = replay_path
+	else:
+		print(f'\nGenerating synthetic dataset of {n_dwellings:,} dwellings...')
+		dataset = SyntheticDataset(n_dwellings, seed=data_seed)
+		summary = dataset.get_summary()
+		print(f"   {summary['buurten']:,} buurten, {summary['pc6s']:,} pc6s, {summary['energy_labels']:,} energy labels ({summary['generation_time']:.2f} s)")
+
+		if '--postgres' in args:
+			# Only imported here, since it needs
+			# the settings of the database.
+			from load_postgres import BENCHMARK_DBNAME, get_benchmark_connection, load_dataset
+			print(f"\nLoading synthetic dataset into database '{BENCHMARK_DBNAME}'...")
+			connection = get_benchmark_connection()
+			load_dataset(connection, dataset)
+			database = BENCHMARK_DBNAME
+		else:
+			connection = StandInConnection(dataset)
+			database = 'stand-in'
+
+	print(f'\nRunning benchmark against {database}...')
+	report = run_benchmark(connection, N=N, module_kwargs=module_kwargs, batch=batch, flush_size=flush_size)
+	connection.close()
+	print_report(report)
+	if isinstance(connection, ReplayConnection):
+		print_missing_statements(connection)
+
+	if output_path is not None:
+		report = {
+			'database': database,
+			'dataset': summary,
+			'options': {'N': N, 'batch': batch, 'flush_size': flush_size, **module_kwargs},
+			**report
+		}
+		with open(output_path, 'w') as file:
+			json.dump(report, file, indent='\t')
+		print(f'\nSaved the report to {output_path}.')
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,301 @@
+from collections import Counter
+import os
+import sys
+import types
+
+import numpy as np
+from psycopg2 import sql
+from psycopg2.extras import Range
+
+# Necessary to import modules from parent folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import buurt_dwellings_query, buurten_query
+from modules.base_bag_data_module import region_bag_data_query
+from modules.energy_label_module import region_energy_labels_query
+from utils.pipeline_progress import insert_progress_statement
+from utils.energy_label_index import ENERGY_LABEL_CLASSES
+from utils.record_replay import RowsCursor, normalize_statement, render_query
+from modules.regional_tables import get_heating_shares_query, get_pc6_stats_query
+
+sys.path.append(os.path.dirname(__file__))
+from synthetic_data import decode, to_float_list
+
+# Statements that change the database without results, by the
+# start of their text. They are counted, but don't do anything.
+NO_OP_STATEMENTS = [
+	# Added columns (BaseModule.create_required_columns())
+	'ALTER TABLE',
+	# The counts of SamplingModule.save_realization_counts()
+	'INSERT INTO realization_counts'
+]
+
+def register_range(pgrange, pyrange, conn_or_curs, globally=False):
+	'''
+	Stand-in for psycopg2.extras.register_range(), which reads
+	the type from the catalog of the database. Like the
+	RangeCaster that it returns, the result has the Range
+	class as 'range'.
+	'''
+	return types.SimpleNamespace(range=type(pyrange, (Range,), {}))
+
+class StandInConnection:
+	'''
+	An in-process stand-in for a connection to a database with
+	the tables of a SyntheticDataset (see synthetic_data.py). It
+	answers the statements of the modules and the pipeline from
+	the arrays of the dataset, so they can be benchmarked
+	without Postgres. Statements that it does not know raise
+	a NotImplementedError, like the mock connection of the tests.
+
+	The table 'results' is treated as empty, as after --fresh:
+	the rows that are copied into it are counted, not kept.
+	Finished buurten are kept, so buurten_query leaves them out.
+
+	Every statement is counted in statement_counts, by its
+	normalized text. Like a psycopg2 connection, the class of
+	its cursors is 'cursor_factory', so the statements can be
+	observed (see observe_statements() in utils/database_utils.py).
+	'''
+
+	def __init__(self, dataset):
+		self.dataset = dataset
+		self.cursor_factory = StandInCursor
+		self.encoding = 'UTF8'
+		self.autocommit = False
+		self.closed = 0
+
+		self.statement_counts = Counter()
+		self.n_commits = 0
+		self.n_copied_rows = 0
+		self.finished_buurten = set()
+		self.pc6_stats_rows = None
+
+		self.handlers = {
+			normalize_statement(render_query(query)): handler
+			for (query, handler) in [
+				(buurten_query, self.get_buurten),
+				(buurt_dwellings_query, self.get_buurt_dwellings),
+				(insert_progress_statement, self.insert_progress),
+				("SELECT reltuples::int FROM pg_class WHERE relname=%s", lambda parameters: [(0,)]),
+				("SELECT vbo_id FROM bag WHERE pc6 = %s", self.get_pc6_vbo_ids),
+				("SELECT vbo_id FROM bag WHERE buurt_id = %s", self.get_buurt_vbo_ids),
+				("SELECT oppervlakte, woningtype, bouwjaar FROM bag WHERE vbo_id = %s", self.get_bag_data),
+				(region_bag_data_query.format(region_key=sql.Identifier('pc6')), self.get_pc6_bag_data),
+				(region_bag_data_query.format(region_key=sql.Identifier('buurt_id')), self.get_buurt_bag_data),
+				("SELECT energieklasse, epi_imputed FROM energy_labels WHERE energieklasse IS NOT null AND epi_imputed > 0 AND vbo_id = %s", self.get_energy_label),
+				(region_energy_labels_query.format(region_key=sql.Identifier('pc6')), self.get_pc6_energy_labels),
+				(region_energy_labels_query.format(region_key=sql.Identifier('buurt_id')), self.get_buurt_energy_labels),
+				("SELECT AVG(LN(epi_imputed)) FROM energy_labels WHERE pc6 = %s AND epi_imputed > 0", self.get_pc6_epi_log_avg),
+				("SELECT COUNT(vbo_id) FROM bag", lambda parameters: [(len(self.dataset),)]),
+				("SELECT COUNT(energieklasse) FROM energy_labels WHERE energieklasse >= 'C'", self.get_c_plus_labels_count),
+				("SELECT COUNT(vbo_id) FROM bag WHERE pc6 = %s", self.get_pc6_dwellings_count),
+				("SELECT SUM(oppervlakte) FROM bag WHERE oppervlakte IS NOT NULL AND pc6 = %s", self.get_pc6_floor_space),
+				("SELECT gemiddelde_aardgaslevering_woningen FROM cbs_pc6_2019_energy_use WHERE gemiddelde_elektriciteitslevering_woningen IS NOT NULL AND pc6 = %s", self.get_pc6_gas_use),
+				("SELECT gemiddelde_elektriciteitslevering_woningen FROM cbs_pc6_2019_energy_use WHERE gemiddelde_elektriciteitslevering_woningen IS NOT NULL AND pc6 = %s", self.get_pc6_elec_use),
+				("SELECT gem_hh_gr FROM cbs_pc6_2017_kerncijfers WHERE gem_hh_gr IS NOT null AND pc6 = %s", self.get_pc6_household_size),
+				("SELECT energielabelklasse, woningkenmerken, gebruiks_oppervlakteklasse, bouwjaarklasse, aardgasleveringen_openbare_net FROM cbs_83878ned_aardgaslevering_woningkenmerken WHERE perioden = '2019' AND percentielen != 'Gemiddelde'", self.get_gas_benchmark),
+				("SELECT woningkenmerken, gebruiks_oppervlakteklasse, bewonersklasse_woningen, elektriciteitsleveringen_openbare_net FROM cbs_83882ned_elektriciteitslevering_woningkenmerken WHERE perioden = '2019' AND percentielen NOT LIKE 'Gemiddelde'", self.get_electricity_benchmark),
+				(get_heating_shares_query(), self.get_heating_shares),
+				(get_pc6_stats_query(), self.get_pc6_stats)
+			]
+		}
+
+	def cursor(self, name=None, cursor_factory=None):
+		# Named (server-side) cursors are
+		# the same as other cursors here.
+		return (cursor_factory or self.cursor_factory)(self)
+
+	def commit(self):
+		self.n_commits += 1
+
+	def rollback(self):
+		pass
+
+	def close(self):
+		self.closed = 1
+
+	def get_n_statements(self):
+		return sum(self.statement_counts.values())
+
+	def run(self, query, parameters=None):
+		'''
+		Run the statement and get its rows, or None
+		for a statement without results.
+		'''
+		statement = normalize_statement(render_query(query))
+		for no_op_statement in NO_OP_STATEMENTS:
+			if statement.startswith(no_op_statement):
+				self.statement_counts[f'{no_op_statement} ...'] += 1
+				return None
+
+		if statement not in self.handlers:
+			raise NotImplementedError(f'The stand-in database has no results for the statement: {statement}')
+		self.statement_counts[statement] += 1
+		return self.handlers[statement](parameters)
+
+	def copy(self, query, file):
+		'''
+		COPY ... FROM STDIN: read the rows from 'file'.
+		'''
+		statement = normalize_statement(render_query(query))
+		self.statement_counts[statement] += 1
+		self.n_copied_rows += file.read().count('\n')
+
+	def get_pc6_slice(self, pc6):
+		index = find(self.dataset.pc6s, pc6)
+		if index is None:
+			return slice(0, 0)
+		return slice(self.dataset.pc6_offsets[index], self.dataset.pc6_offsets[index + 1])
+
+	def get_buurt_slice(self, buurt_id):
+		index = find(self.dataset.buurt_ids, buurt_id)
+		if index is None:
+			return slice(0, 0)
+		return slice(self.dataset.buurt_offsets[index], self.dataset.buurt_offsets[index + 1])
+
+	def get_label_slice(self, dwellings):
+		'''
+		Get the slice of the energy labels of the dwellings
+		in the slice 'dwellings', of which only the labels
+		with an EPI count, like the queries of the modules.
+		'''
+		(start, stop) = np.searchsorted(self.dataset.label_dwellings, [dwellings.start, dwellings.stop])
+		return slice(start, stop)
+
+	def get_buurten(self, parameters):
+		return [(buurt_id,) for buurt_id in decode(self.dataset.buurt_ids) if buurt_id not in self.finished_buurten]
+
+	def get_buurt_dwellings(self, parameters):
+		dwellings = self.get_buurt_slice(parameters[0])
+		return self.dataset.get_bag_rows(dwellings.start, dwellings.stop)
+
+	def insert_progress(self, parameters):
+		self.finished_buurten.add(parameters[0])
+		return None
+
+	def get_pc6_vbo_ids(self, parameters):
+		return [(vbo_id,) for vbo_id in decode(self.dataset.vbo_ids[self.get_pc6_slice(parameters[0])])]
+
+	def get_buurt_vbo_ids(self, parameters):
+		return [(vbo_id,) for vbo_id in decode(self.dataset.vbo_ids[self.get_buurt_slice(parameters[0])])]
+
+	def get_bag_data(self, parameters):
+		index = find(self.dataset.vbo_ids, parameters[0])
+		if index is None:
+			return []
+		[(_, _, oppervlakte, bouwjaar, woningtype, _)] = self.dataset.get_bag_rows(index, index + 1)
+		return [(oppervlakte, woningtype, bouwjaar)]
+
+	def get_region_bag_data(self, dwellings):
+		return [
+			(vbo_id, oppervlakte, woningtype, bouwjaar)
+			for (vbo_id, _, oppervlakte, bouwjaar, woningtype, _)
+			in self.dataset.get_bag_rows(dwellings.start, dwellings.stop)
+		]
+
+	def get_pc6_bag_data(self, parameters):
+		return self.get_region_bag_data(self.get_pc6_slice(parameters[0]))
+
+	def get_buurt_bag_data(self, parameters):
+		return self.get_region_bag_data(self.get_buurt_slice(parameters[0]))
+
+	def get_energy_label(self, parameters):
+		index = find(self.dataset.vbo_ids, parameters[0])
+		if index is None:
+			return []
+		rows = self.get_region_energy_labels(slice(index, index + 1))
+		return [(energy_label_class, energy_label_epi) for (_, energy_label_class, energy_label_epi) in rows[:1]]
+
+	def get_region_energy_labels(self, dwellings):
+		labels = self.get_label_slice(dwellings)
+		epis = self.dataset.label_epis[labels]
+		valid = epis > 0
+		return list(zip(
+			decode(self.dataset.vbo_ids[self.dataset.label_dwellings[labels][valid]]),
+			[ENERGY_LABEL_CLASSES[code] for code in self.dataset.label_codes[labels][valid].tolist()],
+			to_float_list(epis[valid])
+		))
+
+	def get_pc6_energy_labels(self, parameters):
+		return self.get_region_energy_labels(self.get_pc6_slice(parameters[0]))
+
+	def get_buurt_energy_labels(self, parameters):
+		return self.get_region_energy_labels(self.get_buurt_slice(parameters[0]))
+
+	def get_pc6_epi_log_avg(self, parameters):
+		epis = self.dataset.label_epis[self.get_label_slice(self.get_pc6_slice(parameters[0]))]
+		epis = epis[epis > 0]
+		if len(epis) == 0:
+			return [(None,)]
+		return [(float(np.mean(np.log(epis.astype(float)))),)]
+
+	def get_c_plus_labels_count(self, parameters):
+		return [(int((self.dataset.label_codes >= ENERGY_LABEL_CLASSES.index('C')).sum()),)]
+
+	def get_pc6_dwellings_count(self, parameters):
+		dwellings = self.get_pc6_slice(parameters[0])
+		return [(int(dwellings.stop - dwellings.start),)]
+
+	def get_pc6_floor_space(self, parameters):
+		oppervlaktes = self.dataset.oppervlaktes[self.get_pc6_slice(parameters[0])]
+		return [(int(oppervlaktes.sum()) if len(oppervlaktes) > 0 else None,)]
+
+	def get_pc6_value(self, pc6, values, known):
+		index = find(self.dataset.pc6s, pc6)
+		if index is None or not known[index]:
+			return []
+		return [(values[index].item(),)]
+
+	def get_pc6_gas_use(self, parameters):
+		return self.get_pc6_value(parameters[0], self.dataset.pc6_gas_use, self.dataset.pc6_energy_use_known)
+
+	def get_pc6_elec_use(self, parameters):
+		return self.get_pc6_value(parameters[0], self.dataset.pc6_elec_use, self.dataset.pc6_energy_use_known)
+
+	def get_pc6_household_size(self, parameters):
+		return self.get_pc6_value(parameters[0], self.dataset.pc6_household_sizes, self.dataset.pc6_household_size_known)
+
+	def get_gas_benchmark(self, parameters):
+		# Without the column 'percentielen'
+		return [row[:4] + row[5:] for row in self.dataset.get_gas_benchmark_rows()]
+
+	def get_electricity_benchmark(self, parameters):
+		return [row[:3] + row[4:] for row in self.dataset.get_electricity_benchmark_rows()]
+
+	def get_heating_shares(self, parameters):
+		known = self.dataset.heating_shares_known
+		shares = self.dataset.heating_shares[known]
+		return [
+			(buurt_id, sum(row), *row)
+			for (buurt_id, row) in zip(decode(self.dataset.buurt_ids[known]), shares.tolist())
+		]
+
+	def get_pc6_stats(self, parameters):
+		if self.pc6_stats_rows is None:
+			self.pc6_stats_rows = self.dataset.get_pc6_stats_rows()
+		return self.pc6_stats_rows
+
+class StandInCursor(RowsCursor):
+	'''
+	A cursor of a StandInConnection.
+	'''
+
+	def execute(self, query, vars=None):
+		self.set_rows(self.connection.run(query, vars))
+
+	def copy_expert(self, sql, file, size=8192):
+		self.connection.copy(sql, file)
+
+def find(values, value):
+	'''
+	Get the index of 'value' (a string) in the sorted
+	array of bytes 'values', or None. Trailing spaces
+	are ignored, as with character(n) in Postgres.
+	'''
+	if value is None:
+		return None
+	value = value.rstrip().encode()
+	index = int(np.searchsorted(values, value))
+	if index < len(values) and values[index] == value:
+		return index
+	return None
@@ -0,0 +1,343 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+# Necessary to import modules from parent folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.energy_label_index import ENERGY_LABEL_CLASSES
+from utils.energy_label_utils import epis_to_labels
+from modules.regional_tables import HeatingSharesTable
+
+# The dwelling types of the BAG, with their share of the
+# national stock and the median floor area (m²).
+DWELLING_TYPES = [
+	'tussenwoning',
+	'hoekwoning',
+	'twee_onder_1_kap',
+	'vrijstaand',
+	'meergezinspand_laag_midden',
+	'meergezinspand_hoog'
+]
+DWELLING_TYPE_SHARES = [0.26, 0.11, 0.10, 0.11, 0.29, 0.13]
+DWELLING_TYPE_AREAS = [110, 115, 140, 170, 75, 70]
+
+# Construction periods of the national stock: (first year, last year, share).
+CONSTRUCTION_PERIODS = [
+	(1800, 1905, 0.05),
+	(1906, 1930, 0.08),
+	(1931, 1944, 0.06),
+	(1945, 1959, 0.09),
+	(1960, 1970, 0.13),
+	(1971, 1980, 0.15),
+	(1981, 1990, 0.13),
+	(1991, 2000, 0.11),
+	(2001, 2010, 0.11),
+	(2011, 2020, 0.09)
+]
+
+# Sizes (number of dwellings) of the buurten and pc6s are
+# lognormal: (median, sigma, minimum, maximum). With these,
+# 8 million dwellings give about 14,000 buurten and
+# 480,000 pc6s, like the real BAG.
+BUURT_SIZES = (300, 1.1, 5, 15000)
+PC6_SIZES = (10, 1.0, 1, 400)
+
+# Median log EPI by construction year, interpolated.
+EPI_LOG_YEARS = [1900, 1945, 1975, 1992, 2005, 2015, 2020]
+EPI_LOG_VALUES = np.log([2.8, 2.6, 2.0, 1.5, 1.2, 0.8, 0.45])
+
+# The heating installations of HeatingSharesTable,
+# with their mean share in a buurt.
+HEATING_SHARES = [0.86, 0.03, 0.02, 0.03, 0.02, 0.01, 0.01, 0.02]
+
+# Characteristics of the CBS benchmark tables,
+# see the comparison modules.
+BENCHMARK_PERCENTILES = ['P5', 'P25', 'P50', 'P75', 'P95']
+BENCHMARK_Z_SCORES = [-1.645, -0.674, 0, 0.674, 1.645]
+CBS_DWELLING_TYPES = ['Appartement', 'Tussenwoning', 'Hoekwoning', '2-onder-1-kapwoning', 'Vrijstaande woning']
+CBS_FLOOR_SPACE_CLASSES = ['15 tot 50 m²', '50 tot 75 m²', '75 tot 100 m²', '100 tot 150 m²', '150 tot 250 m²', '250 tot 500 m²']
+CBS_CONSTRUCTION_YEAR_CLASSES = ['1000 tot 1946', '1946 tot 1965', '1965 tot 1975', '1975 tot 1992', '1992 tot 2000', '2000 tot 2014', 'Vanaf 2014']
+CBS_HOUSEHOLD_SIZES = ['1 persoon', '2 personen', '3 personen', '4 personen', '5 personen of meer']
+
+class SyntheticDataset:
+	'''
+	A synthetic version of the tables that the modules
+	read, for benchmarks without the real data: the
+	dwellings of the BAG, their energy labels, the heating
+	shares per buurt, the energy use and household size per
+	pc6 and the CBS benchmark tables.
+
+	The dwellings are stored as NumPy arrays, ordered by
+	buurt and pc6, so every buurt and pc6 is a slice of the
+	arrays. pc6s are consecutive, so some span two buurten,
+	as in reality. The energy labels are ordered by dwelling.
+	'''
+
+	def __init__(self, n_dwellings, seed=0):
+		start_time = time.time()
+		rng = np.random.default_rng(seed)
+		self.n_dwellings = n_dwellings
+		self.seed = seed
+
+		self.generate_regions(rng)
+		self.generate_dwellings(rng)
+		self.generate_energy_labels(rng)
+		self.generate_regional_data(rng)
+
+		self.generation_time = time.time() - start_time
+
+	def generate_regions(self, rng):
+		buurt_sizes = draw_sizes(rng, self.n_dwellings, *BUURT_SIZES)
+		pc6_sizes = draw_sizes(rng, self.n_dwellings, *PC6_SIZES)
+
+		self.buurt_ids = np.char.add(b'BU', np.char.zfill(np.arange(len(buurt_sizes)).astype('S8'), 8))
+		self.buurt_offsets = np.concatenate([[0], np.cumsum(buurt_sizes)])
+		self.dwelling_buurts = np.repeat(np.arange(len(buurt_sizes), dtype=np.int32), buurt_sizes)
+
+		self.pc6s = get_pc6_codes(len(pc6_sizes))
+		self.pc6_offsets = np.concatenate([[0], np.cumsum(pc6_sizes)])
+		self.dwelling_pc6s = np.repeat(np.arange(len(pc6_sizes), dtype=np.int32), pc6_sizes)
+
+	def generate_dwellings(self, rng):
+		n = self.n_dwellings
+		# vbo_ids are 16 digits, in order.
+		self.vbo_ids = np.char.zfill(np.arange(1, n + 1).astype('S16'), 16)
+
+		# The dwelling types are mixed per buurt, so
+		# some buurten have mostly apartments, and
+		# others mostly terraced houses.
+		self.woningtypes = np.empty(n, dtype=np.int8)
+		for (start, stop) in zip(self.buurt_offsets[:-1], self.buurt_offsets[1:]):
+			shares = rng.dirichlet(np.array(DWELLING_TYPE_SHARES) * 5)
+			counts = rng.multinomial(stop - start, shares)
+			self.woningtypes[start:stop] = rng.permutation(np.repeat(np.arange(len(DWELLING_TYPES), dtype=np.int8), counts))
+
+		median_areas = np.array(DWELLING_TYPE_AREAS, dtype=float)[self.woningtypes]
+		self.oppervlaktes = np.clip(np.round(median_areas * rng.lognormal(0, 0.3, n)), 15, 499).astype(np.int32)
+
+		# Most dwellings of a buurt are built in the same
+		# period, the others in any period.
+		buurt_years = draw_construction_years(rng, len(self.buurt_ids))
+		years = buurt_years[self.dwelling_buurts] + np.round(rng.normal(0, 8, n))
+		other_period = rng.random(n) < 0.2
+		years[other_period] = draw_construction_years(rng, int(other_period.sum()))
+		self.bouwjaren = np.clip(years, 1800, 2020).astype(np.int32)
+
+	def generate_energy_labels(self, rng):
+		n = self.n_dwellings
+		epi_logs = np.interp(self.bouwjaren, EPI_LOG_YEARS, EPI_LOG_VALUES) + rng.normal(0, 0.25, n)
+		# Apartments need less energy per m².
+		epi_logs[self.woningtypes >= 4] -= 0.1
+
+		# About 55% of the dwellings has a label, more of
+		# the recent ones, and 3% of those has two.
+		has_label = rng.random(n) < np.where(self.bouwjaren >= 2010, 0.8, 0.5)
+		labelled = np.flatnonzero(has_label)
+		relabelled = labelled[rng.random(len(labelled)) < 0.03]
+		label_dwellings = np.concatenate([labelled, relabelled])
+		epis = np.exp(np.concatenate([epi_logs[labelled], epi_logs[relabelled] + rng.normal(0, 0.2, len(relabelled))]))
+
+		order = np.argsort(label_dwellings, kind='stable')
+		self.label_dwellings = label_dwellings[order].astype(np.int32)
+		self.label_epis = epis[order].astype(np.float32)
+		label_codes = {label: code for (code, label) in enumerate(ENERGY_LABEL_CLASSES)}
+		self.label_codes = np.array([label_codes[label] for label in epis_to_labels(self.label_epis)], dtype=np.int8)
+		# The EPI of some labels cannot be imputed.
+		self.label_epis[rng.random(len(self.label_epis)) < 0.01] = np.nan
+
+	def generate_regional_data(self, rng):
+		n_pc6s = len(self.pc6s)
+		pc6_sizes = np.diff(self.pc6_offsets)
+
+		# Heating shares per buurt, in %, as the CBS
+		# publishes them. Some buurten are not in the table.
+		shares = rng.dirichlet(np.array(HEATING_SHARES) * 50, size=len(self.buurt_ids))
+		self.heating_shares = np.round(shares * 100)
+		self.heating_shares_known = rng.random(len(self.buurt_ids)) < 0.98
+
+		# Energy use and household size per pc6, the
+		# CBS does not publish them for some pc6s.
+		self.pc6_gas_use = np.round(rng.lognormal(np.log(1200), 0.35, n_pc6s))
+		self.pc6_elec_use = np.round(rng.lognormal(np.log(2700), 0.25, n_pc6s))
+		self.pc6_energy_use_known = (pc6_sizes >= 3) & (rng.random(n_pc6s) < 0.95)
+		self.pc6_household_sizes = np.round(np.clip(rng.normal(2.2, 0.4, n_pc6s), 1, 5), 1)
+		self.pc6_household_size_known = (pc6_sizes >= 3) & (rng.random(n_pc6s) < 0.95)
+
+	def __len__(self):
+		return self.n_dwellings
+
+	def get_bag_rows(self, start=0, stop=None):
+		'''
+		Get the rows (vbo_id, pc6, oppervlakte, bouwjaar, woningtype,
+		buurt_id) of the dwellings in [start, stop).
+		'''
+		stop = self.n_dwellings if stop is None else stop
+		return list(zip(
+			decode(self.vbo_ids[start:stop]),
+			decode(self.pc6s[self.dwelling_pc6s[start:stop]]),
+			self.oppervlaktes[start:stop].tolist(),
+			self.bouwjaren[start:stop].tolist(),
+			[DWELLING_TYPES[woningtype] for woningtype in self.woningtypes[start:stop].tolist()],
+			decode(self.buurt_ids[self.dwelling_buurts[start:stop]])
+		))
+
+	def get_energy_label_rows(self, start=0, stop=None):
+		'''
+		Get the rows (vbo_id, pc6, energieklasse, epi_imputed)
+		of the labels in [start, stop).
+		'''
+		stop = len(self.label_dwellings) if stop is None else stop
+		dwellings = self.label_dwellings[start:stop]
+		return list(zip(
+			decode(self.vbo_ids[dwellings]),
+			decode(self.pc6s[self.dwelling_pc6s[dwellings]]),
+			[ENERGY_LABEL_CLASSES[code] for code in self.label_codes[start:stop].tolist()],
+			to_float_list(self.label_epis[start:stop])
+		))
+
+	def get_heating_shares_rows(self):
+		'''
+		Get the rows (area_code, type_verwarmingsinstallatie,
+		woningen) of the CBS heating shares table.
+		'''
+		return [
+			(buurt_id, installation_type, share)
+			for (buurt_id, shares) in zip(decode(self.buurt_ids[self.heating_shares_known]), self.heating_shares[self.heating_shares_known].tolist())
+			for (installation_type, share) in zip(HeatingSharesTable.installation_types, shares)
+		]
+
+	def get_energy_use_rows(self):
+		'''
+		Get the rows (pc6, gemiddelde_aardgaslevering_woningen,
+		gemiddelde_elektriciteitslevering_woningen).
+		'''
+		known = self.pc6_energy_use_known
+		return list(zip(decode(self.pc6s[known]), self.pc6_gas_use[known].tolist(), self.pc6_elec_use[known].tolist()))
+
+	def get_kerncijfers_rows(self):
+		'''
+		Get the rows (pc6, gem_hh_gr).
+		'''
+		known = self.pc6_household_size_known
+		return list(zip(decode(self.pc6s[known]), self.pc6_household_sizes[known].tolist()))
+
+	def get_pc6_stats_rows(self):
+		'''
+		Get the rows of the table pc6_stats, see
+		utils/pc6_stats_create_table.sql.
+		'''
+		pc6_sizes = np.diff(self.pc6_offsets)
+		total_floor_spaces = np.add.reduceat(self.oppervlaktes.astype(np.int64), self.pc6_offsets[:-1])
+
+		label_pc6s = self.dwelling_pc6s[self.label_dwellings]
+		valid = self.label_epis > 0
+		epi_log_sums = np.bincount(label_pc6s[valid], weights=np.log(self.label_epis[valid].astype(float)), minlength=len(self.pc6s))
+		epi_counts = np.bincount(label_pc6s[valid], minlength=len(self.pc6s))
+		epi_log_avgs = np.full(len(self.pc6s), np.nan)
+		np.divide(epi_log_sums, epi_counts, out=epi_log_avgs, where=epi_counts > 0)
+
+		return list(zip(
+			decode(self.pc6s),
+			pc6_sizes.tolist(),
+			total_floor_spaces.tolist(),
+			to_float_list(np.where(self.pc6_energy_use_known, self.pc6_gas_use, np.nan)),
+			to_float_list(np.where(self.pc6_energy_use_known, self.pc6_elec_use, np.nan)),
+			to_float_list(np.where(self.pc6_household_size_known, self.pc6_household_sizes, np.nan)),
+			to_float_list(epi_log_avgs)
+		))
+
+	def get_gas_benchmark_rows(self):
+		'''
+		Get the rows (energielabelklasse, woningkenmerken,
+		gebruiks_oppervlakteklasse, bouwjaarklasse, percentielen,
+		aardgasleveringen_openbare_net) of CBS table 83878, the
+		gas use per m² by dwelling characteristics.
+		'''
+		rows = []
+		for (label_index, label) in enumerate(['A', 'B', 'C', 'D', 'E', 'F', 'G']):
+			for (type_index, dwelling_type) in enumerate(CBS_DWELLING_TYPES):
+				for floor_space_class in CBS_FLOOR_SPACE_CLASSES:
+					for (year_index, construction_year_class) in enumerate(CBS_CONSTRUCTION_YEAR_CLASSES):
+						median = 6 * 1.15 ** label_index * 1.05 ** type_index * 0.95 ** year_index
+						for (percentile, z_score) in zip(BENCHMARK_PERCENTILES, BENCHMARK_Z_SCORES):
+							rows.append((label, dwelling_type, floor_space_class, construction_year_class, percentile, round(float(median * np.exp(0.4 * z_score)), 1)))
+		return rows
+
+	def get_electricity_benchmark_rows(self):
+		'''
+		Get the rows (woningkenmerken, gebruiks_oppervlakteklasse,
+		bewonersklasse_woningen, percentielen,
+		elektriciteitsleveringen_openbare_net) of CBS table
+		83882, the electricity use per person by dwelling
+		characteristics.
+		'''
+		rows = []
+		for (type_index, dwelling_type) in enumerate(CBS_DWELLING_TYPES):
+			for (floor_space_index, floor_space_class) in enumerate(CBS_FLOOR_SPACE_CLASSES):
+				for (household_index, household_size) in enumerate(CBS_HOUSEHOLD_SIZES):
+					median = 1800 * 1.05 ** type_index * 1.1 ** floor_space_index / (household_index + 1) ** 0.6
+					for (percentile, z_score) in zip(BENCHMARK_PERCENTILES, BENCHMARK_Z_SCORES):
+						rows.append((dwelling_type, floor_space_class, household_size, percentile, round(float(median * np.exp(0.5 * z_score)))))
+		return rows
+
+	def get_summary(self):
+		pc6_sizes = np.diff(self.pc6_offsets)
+		buurt_sizes = np.diff(self.buurt_offsets)
+		return {
+			'dwellings': self.n_dwellings,
+			'buurten': len(self.buurt_ids),
+			'pc6s': len(self.pc6s),
+			'energy_labels': len(self.label_dwellings),
+			'median_buurt_size': float(np.median(buurt_sizes)),
+			'max_buurt_size': int(buurt_sizes.max()),
+			'median_pc6_size': float(np.median(pc6_sizes)),
+			'seed': self.seed,
+			'generation_time': self.generation_time
+		}
+
+def draw_sizes(rng, total, median, sigma, minimum, maximum):
+	'''
+	Draw lognormal sizes, clipped to [minimum, maximum],
+	until they add up to 'total' (the last one is cut short).
+	'''
+	sizes = np.zeros(0, dtype=np.int64)
+	while sizes.sum() < total:
+		n = max(16, int(1.2 * (total - sizes.sum()) / (median * np.exp(sigma ** 2 / 2))))
+		sizes = np.concatenate([sizes, np.clip(np.round(rng.lognormal(np.log(median), sigma, n)), minimum, maximum).astype(np.int64)])
+	cumulative_sizes = np.cumsum(sizes)
+	n_regions = int(np.searchsorted(cumulative_sizes, total)) + 1
+	sizes = sizes[:n_regions]
+	sizes[-1] -= cumulative_sizes[n_regions - 1] - total
+	return sizes
+
+def draw_construction_years(rng, n):
+	periods = rng.choice(len(CONSTRUCTION_PERIODS), size=n, p=[share for (_, _, share) in CONSTRUCTION_PERIODS])
+	firsts = np.array([first for (first, _, _) in CONSTRUCTION_PERIODS])[periods]
+	lasts = np.array([last for (_, last, _) in CONSTRUCTION_PERIODS])[periods]
+	return rng.integers(firsts, lasts + 1).astype(float)
+
+def get_pc6_codes(n):
+	'''
+	Get 'n' pc6s in order: '1000AA', '1000AB', ...
+	'''
+	indexes = np.arange(n)
+	letters = np.array([chr(ord('A') + i).encode() for i in range(26)])
+	return np.char.add(
+		np.char.add((1000 + indexes // 676).astype('S4'), letters[indexes // 26 % 26]),
+		letters[indexes % 26]
+	)
+
+def decode(values):
+	return [value.decode() for value in values.tolist()]
+
+def to_float_list(values):
+	'''
+	Convert 'values' to a list of floats, with None
+	for NaN, as NULLs come out of the database. float32s
+	are converted like Postgres returns a real.
+	'''
+	if values.dtype == np.float32:
+		return [None if np.isnan(value) else float(str(value)) for value in values]
+	return [None if value != value else value for value in values.tolist()]
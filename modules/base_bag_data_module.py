@@ -1,21 +1,55 @@
 import os
 import sys
 
+from psycopg2 import sql
+
 # Required for relative imports to also work when called
 # from project root directory.
 sys.path.append(os.path.dirname(__file__))
 from base_module import BaseModule
 
+# The BAG data of all dwellings in a region,
+# format with the region_key as sql.Identifier.
+region_bag_data_query = sql.SQL('SELECT vbo_id, oppervlakte, woningtype, bouwjaar FROM bag WHERE {region_key} = %s')
+
 class BaseBagDataModule(BaseModule):
 
+	def __init__(self, connection, **kwargs):
+		super().__init__(connection, **kwargs)
+		# BAG data of the region that is being
+		# processed by process_region(), by vbo_id.
+		self.region_bag_data = None
+
 	def get_bag_data(self, vbo_id):
+		if self.region_bag_data is not None:
+			return self.region_bag_data[vbo_id]
+
 		cursor = self.connection.cursor()
-		# Get energy label of dwelling
+		# Get BAG data of dwelling
 		query = "SELECT oppervlakte, woningtype, bouwjaar FROM bag WHERE vbo_id = %s"
 		cursor.execute(query, (vbo_id,))
 		results = cursor.fetchone()
+		cursor.close()
 		return results
+
+	def get_region_bag_data(self, region):
+		'''
+		Get the BAG data of all dwellings in the
+		region with a single query.
+		'''
+		cursor = self.connection.cursor()
+		query = region_bag_data_query.format(region_key=sql.Identifier(region.region_key))
+		cursor.execute(query, (region.attributes[region.region_key],))
+		bag_data = {vbo_id: (area, building_type, construction_year) for (vbo_id, area, building_type, construction_year) in cursor.fetchall()}
 		cursor.close()
+		return bag_data
+
+	def process_region(self, region):
+		self.region_bag_data = self.get_region_bag_data(region)
+		try:
+			super().process_region(region)
+		finally:
+			self.region_bag_data = None
 
 	def process(self, dwelling):
 		continue_processing = super().process(dwelling)
@@ -24,9 +58,7 @@ class BaseBagDataModule(BaseModule):
 			return
 
 		vbo_id = dwelling.attributes['vbo_id']
-		area = self.get_bag_data(vbo_id)[0]
-		building_type = self.get_bag_data(vbo_id)[1]
-		construction_year = self.get_bag_data(vbo_id)[2]
+		area, building_type, construction_year = self.get_bag_data(vbo_id)
 		dwelling.attributes['oppervlakte'] = area
 		dwelling.attributes['woningtype'] = building_type
 		dwelling.attributes['bouwjaar'] = construction_year
@@ -1,6 +1,8 @@
 import os
 import sys
 
+import numpy as np
+
 # Necessary to import modules from parent folder
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.database_utils import add_column
@@ -43,6 +45,39 @@ class BaseModule:
 			probability = probability - 2 * (probability) * (percentile - 0.5)
 		return probability
 
+	def modify_probabilities_up(self, probabilities, percentiles):
+		'''
+		modify_probability_up() for arrays.
+		'''
+		return np.where(
+			probabilities > 0.5,
+			probabilities + 2 * (1 - probabilities) * (percentiles - 0.5),
+			probabilities + 2 * (probabilities) * (percentiles - 0.5)
+		)
+
+	def modify_probabilities_down(self, probabilities, percentiles):
+		'''
+		modify_probability_down() for arrays.
+		'''
+		return np.where(
+			probabilities > 0.5,
+			probabilities - 2 * (1 - probabilities) * (percentiles - 0.5),
+			probabilities - 2 * (probabilities) * (percentiles - 0.5)
+		)
+
+	def get_percentile_ranks(self, values):
+		'''
+		Rank the values of the dict 'values' (e.g. vbo_id: gas use)
+		and return a dict with the same keys and the rank of the
+		value as fraction of the number of values, in (0, 1].
+		Equal values are ranked in the order of the dict.
+		'''
+		keys = list(values.keys())
+		order = np.argsort(np.array(list(values.values()), dtype=float), kind='stable')
+		ranks = np.empty(len(keys))
+		ranks[order] = np.arange(1, len(keys) + 1)
+		return dict(zip(keys, (ranks / len(keys)).tolist()))
+
 	def handle_null_data(self, variable):
 		if variable is None:
 			variable = 0
@@ -64,6 +99,29 @@ class BaseModule:
 		else:
 			return False
 
+	def process_batch(self, frame):
+		'''
+		Process the dwellings of a DwellingFrame (see
+		modules/classes.py), e.g. a buurt. Modules can override
+		this to process the columns of the frame with array
+		operations, by default the dwellings are processed
+		one by one.
+		'''
+		frame.write_back()
+		for dwelling in frame.dwellings:
+			self.process(dwelling)
+		frame.clear()
+
+	def process_region(self, region):
+		'''
+		Process all the (placeholder) dwellings of a region.
+		Modules that need data from the database can override
+		this to fetch the data for the whole region at once,
+		instead of doing a query per dwelling.
+		'''
+		for dwelling in region.dwellings:
+			self.process(dwelling)
+
 	# Outputs need to be a dict, where:
 	# - the keys are valid PostgreSQL identifiers
 	# - the values are dicts:
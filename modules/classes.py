@@ -1,6 +1,9 @@
 import os
 import sys
 import pprint
+
+import numpy as np
+
 from utils.database_utils import insert_dict
 from modules.base_module import BaseModule
 
@@ -30,20 +33,24 @@ class Dwelling:
 		'''
 		return {key: val for (key, val) in self.attributes.items() if key in self.outputs.keys() and self.outputs[key].get('report', True) is True}
 
-	def save(self):
+	def save(self, results_writer=None):
 		'''
 		INSERT the generated Dwelling object
-		into the 'results' database.
+		into the 'results' database. When a
+		'results_writer' (utils.results_writer.ResultsWriter)
+		is given, the row is buffered and written in bulk instead.
 		'''
-		cursor = self.connection.cursor()
 		row_dict = self.get_output_attributes()
-		insert_dict(
-			table_name='results',
-			row_dict = row_dict,
-			cursor = cursor
-		)
-
-		cursor.close()
+		if results_writer is not None:
+			results_writer.add(row_dict)
+		else:
+			cursor = self.connection.cursor()
+			insert_dict(
+				table_name='results',
+				row_dict = row_dict,
+				cursor = cursor
+			)
+			cursor.close()
 
 		for region in self.regions.values():
 			region.check_for_deletion()
@@ -61,6 +68,84 @@ class Dwelling:
 	# so only use BAG column_names here.
 	default_outputs = {'vbo_id': {}}
 
+class DwellingFrame:
+	'''
+	The dwellings of a batch (e.g. a buurt) as columns: NumPy
+	arrays with an attribute of every dwelling, for modules
+	that process the whole batch at once (see
+	BaseModule.process_batch). Columns that are set are
+	written back to the attributes of the dwellings with
+	write_back().
+	'''
+
+	def __init__(self, dwellings):
+		self.dwellings = dwellings
+		self.columns = {}
+		self.region_columns = {}
+		self.changed = set()
+
+	def __len__(self):
+		return len(self.dwellings)
+
+	def __getitem__(self, name):
+		return self.get_column(name)
+
+	def __setitem__(self, name, values):
+		self.columns[name] = np.broadcast_to(values, (len(self.dwellings),)).copy()
+		self.changed.add(name)
+
+	def get_column(self, name, dtype=float):
+		'''
+		Get the attribute 'name' of all dwellings, as an
+		array of 'dtype' (use object for e.g. strings).
+		'''
+		if name not in self.columns:
+			self.columns[name] = np.array([dwelling.attributes[name] for dwelling in self.dwellings], dtype=dtype)
+		return self.columns[name]
+
+	def get_region_column(self, region_type, name, dtype=float):
+		'''
+		Get the attribute 'name' of the region of type
+		'region_type' (e.g. 'buurt') of all dwellings.
+		'''
+		key = (region_type, name)
+		if key not in self.region_columns:
+			self.region_columns[key] = np.array([dwelling.regions[region_type].attributes[name] for dwelling in self.dwellings], dtype=dtype)
+		return self.region_columns[key]
+
+	def start_processing(self, module):
+		'''
+		Like BaseModule.process() for every dwelling: register
+		the outputs of 'module' with the dwellings. Returns False
+		(and does nothing) when the module has already
+		processed some of the dwellings.
+		'''
+		module_name = module.__class__.__name__
+		if any(module_name in dwelling.processed_by for dwelling in self.dwellings):
+			return False
+		for dwelling in self.dwellings:
+			dwelling.outputs.update(module.outputs)
+			dwelling.processed_by.append(module_name)
+		return True
+
+	def write_back(self):
+		'''
+		Set the changed columns as attributes of the dwellings.
+		'''
+		for name in self.changed:
+			for (dwelling, value) in zip(self.dwellings, self.columns[name].tolist()):
+				dwelling.attributes[name] = value
+		self.changed = set()
+
+	def clear(self):
+		'''
+		Write back the changed columns, and forget all columns,
+		e.g. after the dwellings were processed one by one.
+		'''
+		self.write_back()
+		self.columns = {}
+		self.region_columns = {}
+
 class PlaceholderDwelling(Dwelling):
 
 	pass
@@ -70,6 +155,9 @@ class Region:
 	def __init__(self):
 		self.dwellings = []
 		self.n_placeholders = len(self.dwellings)
+		# Index from vbo_id to the indexes in self.dwellings,
+		# see index_dwellings().
+		self.dwelling_index = {}
 
 	def add_dwelling(self, dwelling):
 		'''
@@ -100,15 +188,19 @@ class Region:
 		self.n_placeholders -= 1
 
 	def check_for_deletion(self):
-		if self.n_placeholders == 0:
+		# With a batch, every dwelling of the region is saved
+		# after all of them have been added, so the dwellings
+		# can already have been released (self.dwellings is None).
+		if self.n_placeholders == 0 and self.dwellings is not None:
 			# They dwellings have had their purpose,
 			# and won't be used inside the Region.
-			# We can thus delete the references to the dwellings,
+			# We can thus release the references to the dwellings,
 			# which will allow for garbage collecting
 			# and thus lower memory usage.
 			# Reference to the dwelling can only be freed after all types
-			# of Regions (e.g.: PC6, Buurt) have deleted the reference.
-			del self.dwellings
+			# of Regions (e.g.: PC6, Buurt) have released the reference.
+			self.dwellings = None
+			self.dwelling_index = None
 
 	def get_index_of_placeholder_dwelling(self, vbo_id):
 		'''
@@ -117,13 +209,7 @@ class Region:
 		that matches (there should be), and whether this is indeed
 		of the type PlaceholderDwelling.
 		'''
-		indexes = [
-			index
-			for index, dwelling
-			in enumerate(self.dwellings)
-			if dwelling.attributes['vbo_id'] == vbo_id
-		]
-
+		indexes = self.dwelling_index.get(vbo_id, [])
 		if len(indexes) != 1:
 			raise ValueError(f'Expected exactly 1 placeholder dwelling for vbo_id {vbo_id} but got {len(indexes)}.')
 
@@ -135,8 +221,23 @@ class Region:
 		else:
 			raise ValueError(f'Expected dwelling at index {index} to be a placeholder dwelling, but it is of type {type(dwelling)}')
 
+	def index_dwellings(self):
+		'''
+		Build a dict from vbo_id to the indexes in self.dwellings
+		with that vbo_id, so we don't have to search through all
+		dwellings of the region for every dwelling that is added.
+		Called once the placeholders have been loaded: add_dwelling()
+		keeps the positions and vbo_ids of the dwellings the same.
+		'''
+		self.dwelling_index = {}
+		for index, dwelling in enumerate(self.dwellings):
+			self.dwelling_index.setdefault(dwelling.attributes['vbo_id'], []).append(index)
+
 class PC6(Region):
 
+	# Column in 'bag' that identifies the region.
+	region_key = 'pc6'
+
 	def __init__(self, pc6, connection, **kwargs):
 		super().__init__()
 
@@ -144,13 +245,13 @@ class PC6(Region):
 		self.connection = connection
 		self.dwellings = self.get_placeholder_dwellings()
 		self.n_placeholders = len(self.dwellings)
+		self.index_dwellings()
 
 		pc6_dwelling_modules = kwargs.get('pc6_dwelling_modules', [])
 		pc6_modules = kwargs.get('pc6_modules', [])
 
 		for module in pc6_dwelling_modules:
-			for dwelling in self.dwellings:
-				module.process(dwelling)
+			module.process_region(self)
 
 		for module in pc6_modules:
 			module.process_pc6(self)
@@ -168,6 +269,9 @@ class PC6(Region):
 
 class Buurt(Region):
 
+	# Column in 'bag' that identifies the region.
+	region_key = 'buurt_id'
+
 	def __init__(self, buurt_id, connection, **kwargs):
 		super().__init__()
 
@@ -175,15 +279,18 @@ class Buurt(Region):
 		self.connection = connection
 		self.dwellings = self.get_placeholder_dwellings()
 		self.n_placeholders = len(self.dwellings)
+		self.index_dwellings()
 		self.gas_use = {}
 		self.elec_use = {}
+		# Rank of gas_use and elec_use within the buurt.
+		self.gas_use_percentiles = {}
+		self.elec_use_percentiles = {}
 
 		buurt_dwelling_modules = kwargs.get('buurt_dwelling_modules', [])
 		buurt_modules = kwargs.get('buurt_modules', [])
 
 		for module in buurt_dwelling_modules:
-			for dwelling in self.dwellings:
-				module.process(dwelling)
+			module.process_region(self)
 
 		for module in buurt_modules:
 			module.process_buurt(self)
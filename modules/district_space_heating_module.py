@@ -5,6 +5,7 @@ import sys
 # from project root directory.
 sys.path.append(os.path.dirname(__file__))
 from base_module import BaseModule, BaseRegionalModule
+from modules.regional_tables import get_heating_shares_table
 
 class DistrictSpaceHeatingModule(BaseModule):
 
@@ -32,6 +33,19 @@ class DistrictSpaceHeatingModule(BaseModule):
 		dwelling.attributes['district_no_gas_p'] = district_no_gas_p
 		dwelling.attributes['district_heating_space_p'] = district_high_gas_p + district_low_gas_p + district_no_gas_p
 
+	def process_batch(self, frame):
+		if not frame.start_processing(self):
+			return super().process_batch(frame)
+
+		district_high_gas_p = frame.get_region_column('buurt', 'district_high_gas_share')
+		district_low_gas_p = frame.get_region_column('buurt', 'district_low_gas_share')
+		district_no_gas_p = frame.get_region_column('buurt', 'district_no_gas_share')
+
+		frame['district_high_gas_p'] = district_high_gas_p
+		frame['district_low_gas_p'] = district_low_gas_p
+		frame['district_no_gas_p'] = district_no_gas_p
+		frame['district_heating_space_p'] = district_high_gas_p + district_low_gas_p + district_no_gas_p
+
 	outputs = {
 		'district_heating_space': {
 			'type': 'boolean',
@@ -48,6 +62,10 @@ class DistrictSpaceHeatingModule(BaseModule):
 
 class DistrictSpaceHeatingRegionalModule(BaseRegionalModule):
 
+	def __init__(self, connection, **kwargs):
+		super().__init__(connection, **kwargs)
+		self.heating_shares = get_heating_shares_table(connection)
+
 	def process_buurt(self, buurt):
 		self.calculate_probability_modifier(buurt)
 		self.add_installation_type_shares(buurt)
@@ -57,72 +75,17 @@ class DistrictSpaceHeatingRegionalModule(BaseRegionalModule):
 		Calculates probability modifier needed to correct for unknown installations.
 		'''
 		buurt_id = buurt.attributes['buurt_id']
-		cursor = self.connection.cursor()
-		total_percentage_query='''
-		SELECT SUM(woningen)
-		FROM cbs_84983ned_woningen_hoofdverwarmings_buurt_2019_typed
-		WHERE area_code = %s
-		'''
-		cursor.execute(total_percentage_query, (buurt_id,))
-		total_percentage = cursor.fetchone()
-		total_percentage = self.handle_null_data(total_percentage)
-		if total_percentage != 0:
-			probability_modifier = 99 / total_percentage
-		else:
-			probability_modifier = 1
-		buurt.attributes['probability_modifier'] = probability_modifier
+		buurt.attributes['probability_modifier'] = self.heating_shares.get_probability_modifier(buurt_id)
 
 	def add_installation_type_shares(self, buurt):
 
 		buurt_id = buurt.attributes['buurt_id']
-		cursor = self.connection.cursor()
 		probability_modifier = buurt.attributes['probability_modifier']
-		# Add percentage of dwellings with gas boiler in neighbourhood to dict
 		# A050114 is the code for district heating with high gas use
-		query_district_high_gas='''
-		SELECT woningen::float / 100
-		FROM cbs_84983ned_woningen_hoofdverwarmings_buurt_2019_typed
-		WHERE
-			area_code = %s
-			AND type_verwarmingsinstallatie = 'A050114'
-			AND woningen IS NOT null'''
-		cursor.execute(query_district_high_gas, (buurt_id,))
-
-		district_high_gas_share = cursor.fetchone()
-		district_high_gas_share = self.handle_null_data(district_high_gas_share)
-
-		buurt.attributes['district_high_gas_share'] = district_high_gas_share * probability_modifier
-		# Add percentage of dwellings with block heating in neighbourhood to dict
+		buurt.attributes['district_high_gas_share'] = self.heating_shares.get_share(buurt_id, 'A050114') * probability_modifier
 		# A050115 is the code for district heating with low gas use
-		query_district_low_gas ='''
-		SELECT woningen::float / 100
-		FROM cbs_84983ned_woningen_hoofdverwarmings_buurt_2019_typed
-		WHERE
-			area_code = %s
-			AND type_verwarmingsinstallatie = 'A050115'
-			AND woningen IS NOT null'''
-		cursor.execute(query_district_low_gas, (buurt_id,))
-
-		district_low_gas_share = cursor.fetchone()
-		district_low_gas_share = self.handle_null_data(district_low_gas_share)
-
-		buurt.attributes['district_low_gas_share'] = district_low_gas_share * probability_modifier
-
-		# Add percentage of dwellings with block heating in neighbourhood to dict
+		buurt.attributes['district_low_gas_share'] = self.heating_shares.get_share(buurt_id, 'A050115') * probability_modifier
 		# A050116 is the code for district heating with no gas use
-		query_district_no_gas ='''
-		SELECT woningen::float / 100
-		FROM cbs_84983ned_woningen_hoofdverwarmings_buurt_2019_typed
-		WHERE
-			area_code = %s
-			AND type_verwarmingsinstallatie = 'A050116'
-			AND woningen IS NOT null'''
-		cursor.execute(query_district_no_gas, (buurt_id,))
-		district_no_gas_share = cursor.fetchone()
-		district_no_gas_share = self.handle_null_data(district_no_gas_share)
-
-		buurt.attributes['district_no_gas_share'] = district_no_gas_share  * probability_modifier
-
-		cursor.close()
+		buurt.attributes['district_no_gas_share'] = self.heating_shares.get_share(buurt_id, 'A050116') * probability_modifier
 
 	supports = ['buurt']
@@ -28,6 +28,16 @@ class DistrictWaterHeatingModule(BaseModule):
 
 		dwelling.attributes['district_heating_water_p'] = district_heating_water_p
 
+	def process_batch(self, frame):
+		if not frame.start_processing(self):
+			return super().process_batch(frame)
+
+		district_heating_water_p = 0.5 * frame['district_high_gas_p'] + 0.5 * 0.5 * frame['district_low_gas_p'] + 0.5 * frame['district_no_gas_p']
+		district_heating_water_p = self.modify_probabilities_down(district_heating_water_p, frame['gas_use_percentile_neighbourhood'])
+		district_heating_water_p = self.modify_probabilities_down(district_heating_water_p, frame['elec_use_percentile_neighbourhood'])
+
+		frame['district_heating_water_p'] = district_heating_water_p
+
 	outputs = {
 		'district_heating_water': {
 			'type': 'boolean',
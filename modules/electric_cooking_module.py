@@ -24,6 +24,12 @@ class ElectricCookingModule(BaseModule):
 
 		dwelling.attributes['electric_cooking_p'] = electric_cooking_p
 
+	def process_batch(self, frame):
+		if not frame.start_processing(self):
+			return super().process_batch(frame)
+
+		frame['electric_cooking_p'] = frame['district_no_gas_p'] + frame['elec_no_gas_p']
+
 	outputs = {
 		'electric_cooking': {
 			'type': 'boolean',
@@ -1,10 +1,13 @@
 import os
 import sys
 
+import numpy as np
+
 # Required for relative imports to also work when called
 # from project root directory.
 sys.path.append(os.path.dirname(__file__))
 from base_module import BaseModule
+from modules.regional_tables import get_heating_shares_table
 
 
 class ElectricSpaceHeatingModule(BaseModule):
@@ -82,6 +85,43 @@ class ElectricSpaceHeatingModule(BaseModule):
 		dwelling.attributes['elec_low_gas_p'] = elec_low_gas_p
 		dwelling.attributes['elec_no_gas_p'] = elec_no_gas_p
 
+	def process_batch(self, frame):
+		if not frame.start_processing(self):
+			return super().process_batch(frame)
+
+		energy_label = frame.get_column('energy_label_class', dtype=object)
+		gas_use_percentile_national = frame['gas_use_percentile_national']
+		gas_use_percentile_neighbourhood = frame['gas_use_percentile_neighbourhood']
+		elec_use_percentile_national = frame['elec_use_percentile_national']
+		elec_use_percentile_neighbourhood = frame['elec_use_percentile_neighbourhood']
+
+		elec_high_gas_p = frame.get_region_column('buurt', 'elec_high_gas_share')
+		elec_low_gas_p = frame.get_region_column('buurt', 'elec_low_gas_share')
+		elec_no_gas_p = frame.get_region_column('buurt', 'elec_no_gas_share')
+
+		electric_heat_pump_p = np.where(
+			np.isin(energy_label, ['A+++++', 'A++++', 'A+++', 'A++', 'A+', 'A', 'B', 'C']),
+			self.electric_heat_pump_base_p,
+			0.
+		)
+
+		hybrid_heat_pump_p = np.where(
+			elec_use_percentile_national > 0.7,
+			self.modify_probabilities_up(elec_high_gas_p, gas_use_percentile_national),
+			elec_high_gas_p
+		)
+
+		elec_boiler_space_p = elec_low_gas_p + elec_no_gas_p
+		elec_boiler_space_p = self.modify_probabilities_up(elec_boiler_space_p, elec_use_percentile_neighbourhood)
+		elec_boiler_space_p = self.modify_probabilities_down(elec_boiler_space_p, gas_use_percentile_neighbourhood)
+
+		frame['hybrid_heat_pump_p'] = hybrid_heat_pump_p
+		frame['electric_heat_pump_p'] = electric_heat_pump_p
+		frame['elec_boiler_space_p'] = elec_boiler_space_p
+		frame['elec_high_gas_p'] = elec_high_gas_p
+		frame['elec_low_gas_p'] = elec_low_gas_p
+		frame['elec_no_gas_p'] = elec_no_gas_p
+
 	outputs = {
 		'hybrid_heat_pump_space': {
 			'type': 'boolean',
@@ -120,63 +160,22 @@ class ElectricSpaceHeatingModule(BaseModule):
 
 class ElectricSpaceHeatingRegionalModule(BaseModule):
 
+	def __init__(self, connection, **kwargs):
+		super().__init__(connection, **kwargs)
+		self.heating_shares = get_heating_shares_table(connection)
+
 	def process_buurt(self, buurt):
 		self.add_installation_type_shares(buurt)
 
 	def add_installation_type_shares(self, buurt):
 
 		buurt_id = buurt.attributes['buurt_id']
-		cursor = self.connection.cursor()
 		probability_modifier = buurt.attributes['probability_modifier']
-		# Add share of dwellings with hybrid heat pump
-		# A050117 is the code for a gas boiler
-		query_hybrid_heat_pumps = '''
-		SELECT woningen::float / 100
-		FROM cbs_84983ned_woningen_hoofdverwarmings_buurt_2019_typed
-		WHERE
-			area_code = %s
-			AND type_verwarmingsinstallatie = 'A050117'
-			AND woningen IS NOT null'''
-		cursor.execute(query_hybrid_heat_pumps, (buurt_id,))
-
-		elec_high_gas_share = cursor.fetchone()
-		elec_high_gas_share = self.handle_null_data(elec_high_gas_share)
-
-		buurt.attributes['elec_high_gas_share'] = elec_high_gas_share * probability_modifier
-
-		# Add share of dwellings with electric heating and low gas use
+		# A050117 is the code for a hybrid heat pump
+		buurt.attributes['elec_high_gas_share'] = self.heating_shares.get_share(buurt_id, 'A050117') * probability_modifier
 		# A050118 is the code for electric heating with low gas use
-		query_low_gas = '''
-		SELECT woningen::float / 100
-		FROM cbs_84983ned_woningen_hoofdverwarmings_buurt_2019_typed
-		WHERE
-			area_code = %s
-			AND type_verwarmingsinstallatie = 'A050118'
-			AND woningen IS NOT null'''
-		cursor.execute(query_low_gas, (buurt_id,))
-
-		elec_low_gas_share = cursor.fetchone()
-		elec_low_gas_share = self.handle_null_data(elec_low_gas_share)
-
-		buurt.attributes['elec_low_gas_share'] = elec_low_gas_share * probability_modifier
-
-
-		# Add share of dwellings with electric heating and no gas use
+		buurt.attributes['elec_low_gas_share'] = self.heating_shares.get_share(buurt_id, 'A050118') * probability_modifier
 		# A050119 is the code for electric heating with no gas use
-		query_no_gas = '''
-		SELECT woningen::float / 100
-		FROM cbs_84983ned_woningen_hoofdverwarmings_buurt_2019_typed
-		WHERE
-			area_code = %s
-			AND type_verwarmingsinstallatie = 'A050119'
-			AND woningen IS NOT null'''
-		cursor.execute(query_no_gas, (buurt_id,))
-
-		elec_no_gas_share = cursor.fetchone()
-		elec_no_gas_share = self.handle_null_data(elec_no_gas_share)
-
-		buurt.attributes['elec_no_gas_share'] = elec_no_gas_share * probability_modifier
-
-		cursor.close()
+		buurt.attributes['elec_no_gas_share'] = self.heating_shares.get_share(buurt_id, 'A050119') * probability_modifier
 
 	supports = ['buurt']
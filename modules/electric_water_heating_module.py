@@ -31,6 +31,16 @@ class ElectricWaterHeatingModule(BaseModule):
 		dwelling.attributes['elec_boiler_water_p'] = elec_boiler_water_p
 		dwelling.attributes['electric_heat_pump_water_p'] = electric_heat_pump_water_p
 
+	def process_batch(self, frame):
+		if not frame.start_processing(self):
+			return super().process_batch(frame)
+
+		elec_boiler_water_p = 0.5 * frame['district_no_gas_p'] + 0.5 * frame['elec_no_gas_p']
+		elec_boiler_water_p = self.modify_probabilities_up(elec_boiler_water_p, frame['elec_use_percentile_neighbourhood'])
+
+		frame['elec_boiler_water_p'] = elec_boiler_water_p
+		frame['electric_heat_pump_water_p'] = frame['electric_heat_pump_p']
+
 	outputs = {
 		'elec_boiler_water': {
 			'type': 'boolean',
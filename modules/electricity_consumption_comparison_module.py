@@ -1,26 +1,27 @@
 import os
 import sys
 import bisect
-from scipy.interpolate import interp1d
+
+import numpy as np
 
 # Required for relative imports to also work when called
 # from project root directory.
 sys.path.append(os.path.dirname(__file__))
 from base_module import BaseModule, BaseRegionalModule
 from classes import Dwelling
+from modules.regional_tables import get_pc6_stats_table
+from utils.benchmark_utils import BenchmarkTable
 
 class ElectricityConsumptionComparisonModule(BaseModule):
 
 	def __init__(self, connection, **kwargs):
 		super().__init__(connection, **kwargs)
-		self.elec_benchmark_dict = {}
+		self.elec_benchmark = self.load_benchmark()
 
 	def neighbourhood_elec_use_comparison(self, buurt, pc6):
 		'''
 		Compares electricity consumption of all dwellings in a neighbourhood to benchmark based on dwelling characteristics.
 		'''
-		# Create dictionary with vbo_ids : percentile of gas users
-		percentile_elec_use_dict = {}
 		# Get dwellings in neighbourhood
 		dwellings_in_neighbourhood = buurt.dwellings
 		# Total electricity use in postal code
@@ -34,47 +35,31 @@ class ElectricityConsumptionComparisonModule(BaseModule):
 		if avg_household_size <= 0:
 			avg_household_size = 1
 
-		# Comparison process
+		vbo_ids = [dwelling.attributes['vbo_id'] for dwelling in dwellings_in_neighbourhood]
+		floor_spaces = []
 		for dwelling in dwellings_in_neighbourhood:
-			# Get basic attributes
-			vbo_id = dwelling.attributes['vbo_id']
-			floor_space = dwelling.attributes['oppervlakte']
+			floor_spaces.append(dwelling.attributes['oppervlakte'])
 			dwelling.attributes['household_size'] = avg_household_size
 
-			# Electricity use of a dwelling
-			elec_use_dwelling = elec_use_floor_space * floor_space
-			# Get electricity use per person for comparison with benchmark
-			dwelling_elec_use_per_person = elec_use_dwelling / avg_household_size
-			dwelling_elec_use_percentile = 0
-
-			# Create tuple for looking up benchmark
-			dwelling_characteristics_tuple = self.create_characteristics_tuple(dwelling)
-			# Check if benchmark for combination of characteristics is already made
-			if dwelling_characteristics_tuple not in self.elec_benchmark_dict:
-				# If not, calculate the benchmark function
-				self.elec_benchmark_dict[dwelling_characteristics_tuple] = self.create_benchmark(dwelling_characteristics_tuple)
-
-			# Comparison with benchmark
-			benchmark = self.elec_benchmark_dict[dwelling_characteristics_tuple]
-
-			# If there is not electricity use, we cannot compare
-			if postal_code_elec_use == 0:
-				pass
-			# If there is not benchmark data, we cannot compare
-			elif benchmark == None:
-				pass
-			else:
-				# See where electricity use compares against the interpolated benchmark
-				dwelling_elec_use_percentile = float(benchmark(dwelling_elec_use_per_person))/100
-				# Extrapolation can give values outside of the domain
-				if dwelling_elec_use_percentile < 0:
-					dwelling_elec_use_percentile = 0
-				elif dwelling_elec_use_percentile > 1:
-					dwelling_elec_use_percentile = 1
-				else:
-					pass
-			# Add percentile compared to national data to dict
-			percentile_elec_use_dict[vbo_id] = dwelling_elec_use_percentile
+		# If there is not electricity use, we cannot compare
+		if postal_code_elec_use == 0:
+			return {vbo_id: 0 for vbo_id in vbo_ids}
+
+		# Electricity use of the dwellings
+		elec_use_dwellings = elec_use_floor_space * np.array(floor_spaces, dtype=float)
+		# Get electricity use per person for comparison with benchmark
+		dwelling_elec_use_per_person = elec_use_dwellings / avg_household_size
+
+		# Comparison with benchmark, for all dwellings at once
+		dwelling_characteristics_tuples = [self.create_characteristics_tuple(dwelling) for dwelling in dwellings_in_neighbourhood]
+		dwelling_elec_use_percentiles, has_benchmark = self.elec_benchmark.compare(dwelling_characteristics_tuples, dwelling_elec_use_per_person)
+		# Extrapolation can give values outside of the domain
+		dwelling_elec_use_percentiles = np.clip(dwelling_elec_use_percentiles / 100, 0, 1)
+		# If there is not benchmark data, we cannot compare
+		dwelling_elec_use_percentiles[~has_benchmark] = 0
+
+		# Dict with vbo_ids : percentile compared to national data
+		percentile_elec_use_dict = dict(zip(vbo_ids, dwelling_elec_use_percentiles.tolist()))
 
 		return(percentile_elec_use_dict)
 
@@ -120,34 +105,24 @@ class ElectricityConsumptionComparisonModule(BaseModule):
 
 		return dwelling_characteristics_tuple
 
-	def create_benchmark(self, dwelling_characteristics_tuple):
+	def load_benchmark(self):
 		'''
-		Creates benchmark function based on dwelling characteristics.
+		Loads the benchmark of electricity use for all
+		combinations of dwelling characteristics.
 		'''
-		# Look up electricity use data for dwellings characteristics
+		# Look up electricity use data for all dwelling characteristics
 		cursor = self.connection.cursor()
 		query_statement = """
-		SELECT elektriciteitsleveringen_openbare_net
+		SELECT woningkenmerken, gebruiks_oppervlakteklasse, bewonersklasse_woningen, elektriciteitsleveringen_openbare_net
 		FROM cbs_83882ned_elektriciteitslevering_woningkenmerken
 		WHERE perioden = '2019'
-		AND woningkenmerken LIKE %s
-		AND gebruiks_oppervlakteklasse LIKE %s
-		AND bewonersklasse_woningen LIKE %s
 		AND percentielen NOT LIKE 'Gemiddelde'
-		ORDER BY elektriciteitsleveringen_openbare_net
 		;"""
-		cursor.execute(query_statement, dwelling_characteristics_tuple)
-		# Interpolate the data, with extrapolation for <5 and >95 percentile
+		cursor.execute(query_statement)
 		results = cursor.fetchall()
-		benchmark_y_data = [5, 25, 50, 75, 95]
-		benchmark_x_data = [x for x in results]
-		benchmark_x_data = list(sum(benchmark_x_data, ()))
-		if None in benchmark_x_data or benchmark_x_data == []:
-			# Need to find a way to make this have results. Query for totaal? How to find the characteristic that is the culprit?
-			interpolated_function = 0
-		else:
-			interpolated_function = interp1d(benchmark_x_data, benchmark_y_data, fill_value='extrapolate')
-		return interpolated_function
+		cursor.close()
+		# Interpolation of the data, with extrapolation for <5 and >95 percentile
+		return BenchmarkTable(results, percentiles=[5, 25, 50, 75, 95])
 
 	def process(self, dwelling):
 		continue_processing = super().process(dwelling)
@@ -164,22 +139,40 @@ class ElectricityConsumptionComparisonModule(BaseModule):
 		if vbo_id not in buurt.elec_use:
 			# If not, add to the dictionary
 			buurt.elec_use = self.neighbourhood_elec_use_comparison(buurt, pc6)
+			# Rank all dwellings in the neighbourhood at once
+			buurt.elec_use_percentiles = self.get_percentile_ranks(buurt.elec_use)
 
-		# Check electricty consumption percentile ranking within neighbourhood
-		sorted_usage = list({k: v for k, v in sorted(buurt.elec_use.items(), key=lambda item: item[1])}.items())
-		# Find the index of the dwelling in question
-		index = [i for i, tupl in enumerate(sorted_usage) if tupl[0] == vbo_id].pop()
-		# Calculate the ranking of the dwelling [0,1]
-		elec_use_percentile_neighbourhood = (index+1)/len(sorted_usage)
+		# Percentile ranking within neighbourhood [0,1]
+		elec_use_percentile_neighbourhood = buurt.elec_use_percentiles[vbo_id]
 
 		dwelling.attributes['elec_use_percentile_national'] = buurt.elec_use[vbo_id]
 		dwelling.attributes['elec_use_percentile_neighbourhood'] = elec_use_percentile_neighbourhood
 
 class ElectricityConsumptionComparisonRegionalModule(BaseRegionalModule):
 
+	def __init__(self, connection, **kwargs):
+		super().__init__(connection, **kwargs)
+		# With pc6_stats=True, the data is taken from the table
+		# pc6_stats (see utils/pc6_stats_create_table.py)
+		# instead of queried for every pc6.
+		self.pc6_stats = get_pc6_stats_table(connection) if kwargs.get('pc6_stats', False) else None
+
 	def process_pc6(self, pc6):
-		self.load_elec_use_data(pc6)
-		self.load_cbs_kerncijfers_data(pc6)
+		if self.pc6_stats is not None:
+			self.load_pc6_stats(pc6)
+		else:
+			self.load_elec_use_data(pc6)
+			self.load_cbs_kerncijfers_data(pc6)
+
+	def load_pc6_stats(self, pc6):
+		'''
+		Sets total electricity use and average household size in pc6 from pc6_stats
+		'''
+		stats = self.pc6_stats.get_stats(pc6.attributes['pc6'])
+		avg_electricity_use = self.handle_null_data((stats['avg_elec_use'],))
+		number_of_dwellings = pc6.attributes['number_of_dwellings']
+		pc6.attributes['total_elec_use'] = avg_electricity_use * number_of_dwellings
+		pc6.attributes['household_size'] = self.handle_null_data((stats['household_size'],))
 
 	def load_elec_use_data(self, pc6):
 		'''
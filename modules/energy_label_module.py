@@ -2,6 +2,7 @@ import os
 import sys
 
 import numpy as np
+from psycopg2 import sql
 from psycopg2.extras import NumericRange, register_range
 
 # Required for relative imports to also work when called
@@ -9,11 +10,47 @@ from psycopg2.extras import NumericRange, register_range
 sys.path.append(os.path.dirname(__file__))
 
 from base_module import BaseModule, BaseRegionalModule
-from utils.energy_label_utils import epi_to_label
+from modules.regional_tables import get_pc6_stats_table
+from utils.energy_label_index import load_energy_label_index
+from utils.energy_label_utils import epi_to_label, epis_to_labels
+
+# The energy labels of all dwellings in a region,
+# format with the region_key as sql.Identifier.
+region_energy_labels_query = sql.SQL('SELECT bag.vbo_id, energieklasse, epi_imputed FROM bag JOIN energy_labels ON energy_labels.vbo_id = bag.vbo_id WHERE energieklasse IS NOT null AND epi_imputed > 0 AND bag.{region_key} = %s')
+
+def get_object_array(values):
+	'''
+	Put 'values' (e.g. ranges) in an array of dtype object,
+	without NumPy trying to look inside them.
+	'''
+	array = np.empty(len(values), dtype=object)
+	for (index, value) in enumerate(values):
+		array[index] = value
+	return array
 
 class EnergyLabelModule(BaseModule):
 
+	def __init__(self, connection, **kwargs):
+		super().__init__(connection, **kwargs)
+		# Energy labels of the region that is being
+		# processed by process_region(), by vbo_id.
+		self.region_energy_labels = None
+
+		# With energy_label_index=True, the labels are looked up
+		# in the index built by utils/energy_label_index_create.py.
+		self.energy_label_index = None
+		if kwargs.get('energy_label_index', False):
+			self.energy_label_index = load_energy_label_index()
+			if self.energy_label_index is None:
+				print('      Energy label index not found, build it with `python utils/energy_label_index_create.py`.')
+
 	def get_energy_label(self, vbo_id):
+		if self.energy_label_index is not None:
+			return self.energy_label_index.get_energy_label(vbo_id)
+
+		if self.region_energy_labels is not None:
+			return self.region_energy_labels.get(vbo_id, (None, None))
+
 		cursor = self.connection.cursor()
 		# Get energy label of dwelling
 		query = "SELECT energieklasse, epi_imputed FROM energy_labels WHERE energieklasse IS NOT null AND epi_imputed > 0 AND vbo_id = %s"
@@ -25,6 +62,33 @@ class EnergyLabelModule(BaseModule):
 		else:
 			return results
 
+	def get_region_energy_labels(self, region):
+		'''
+		Get the energy labels of all dwellings in the
+		region with a single query.
+		'''
+		cursor = self.connection.cursor()
+		query = region_energy_labels_query.format(region_key=sql.Identifier(region.region_key))
+		cursor.execute(query, (region.attributes[region.region_key],))
+		energy_labels = {}
+		for (vbo_id, energy_label_class, energy_label_epi) in cursor.fetchall():
+			# Like get_energy_label(), use the first label
+			# when a dwelling has multiple.
+			energy_labels.setdefault(vbo_id, (energy_label_class, energy_label_epi))
+		cursor.close()
+		return energy_labels
+
+	def process_region(self, region):
+		if self.energy_label_index is not None:
+			# The index is faster than a query.
+			return super().process_region(region)
+
+		self.region_energy_labels = self.get_region_energy_labels(region)
+		try:
+			super().process_region(region)
+		finally:
+			self.region_energy_labels = None
+
 	def process(self, dwelling):
 		continue_processing = super().process(dwelling)
 		# Dwelling has already been processed by this module
@@ -36,6 +100,14 @@ class EnergyLabelModule(BaseModule):
 		dwelling.attributes['energy_label_class'] = energy_label_class
 		dwelling.attributes['energy_label_epi'] = energy_label_epi
 
+	def process_batch(self, frame):
+		if self.energy_label_index is None or not frame.start_processing(self):
+			return super().process_batch(frame)
+
+		energy_labels = self.energy_label_index.get_energy_labels([dwelling.attributes['vbo_id'] for dwelling in frame.dwellings])
+		frame['energy_label_class'] = get_object_array([energy_label_class for (energy_label_class, _) in energy_labels])
+		frame['energy_label_epi'] = get_object_array([energy_label_epi for (_, energy_label_epi) in energy_labels])
+
 class EnergyLabelPredictionModule(BaseModule):
 
 	def __init__(self, connection, **kwargs):
@@ -46,55 +118,107 @@ class EnergyLabelPredictionModule(BaseModule):
 		# 'energy_label_class_range'.
 		self.EnergyLabelClassRange = register_range('energy_label_class_range', 'EnergyLabelClassRange', self.connection).range
 
-	def predict_epi(self, dwelling):
-		'''
-		Predict the EPI (EnergiePrestatieIndex)
-		of the dwelling using multiple linear
-		regression, on the basis of dwelling type,
-		construction year, and the average log(epi)
-		in the pc6.
-		'''
+	# Dwelling types with a dummy variable in the
+	# regression, in the order of 'beta'.
+	dwelling_types = [
+		'meergezinspand_hoog',
+		'meergezinspand_laag_midden',
+		'tussenwoning',
+		'twee_onder_1_kap',
+		'vrijstaand'
+	]
 
-		beta = self.regression_values['beta']
-		S = self.regression_values['S']
-		s_2 = self.regression_values['s_2']
-		t_multiplier = self.regression_values['t_multiplier']
-		calibration_factor = self.regression_values['calibration_factor']
+	# Average of log(epi) for the whole country.
+	national_epi_log_avg = 0.33275039659462347
 
-		dwelling_type = dwelling.attributes['woningtype']
-		construction_year = dwelling.attributes['bouwjaar']
+	def get_epi_log_avg(self, dwelling):
+		'''
+		Get the average log(epi) of the pc6 of the dwelling,
+		or of the buurt if the pc6 has no average (because there
+		are no labels), or else the national average.
+		'''
 		pc6_log_avg = dwelling.regions['pc6'].attributes['energy_label_epi_log_avg']
 		if pc6_log_avg != None:
-			energy_label_epi_log_avg = pc6_log_avg
-		else:
-			# If the PC6 has no average (because there are no labels),
-			# we take the buurt average
-			buurt_log_avg = dwelling.regions['buurt'].attributes['energy_label_epi_log_avg']
-			if buurt_log_avg != None:
-				energy_label_epi_log_avg = buurt_log_avg
-			else:
-				# Fallback: use the national average
-				energy_label_epi_log_avg = 0.33275039659462347
-
-		x = np.array([
+			return pc6_log_avg
+		buurt_log_avg = dwelling.regions['buurt'].attributes['energy_label_epi_log_avg']
+		if buurt_log_avg != None:
+			return buurt_log_avg
+		return self.national_epi_log_avg
+
+	def get_design_row(self, dwelling_type, construction_year, epi_log_avg):
+		'''
+		Get the row of the design matrix of the
+		regression for one dwelling, in the order of 'beta'.
+		'''
+		if construction_year is None:
+			raise ValueError('Cannot predict the EPI of a dwelling without a construction year (bouwjaar)')
+		return np.array([
 			1, # intercept
-			1 if dwelling_type == 'meergezinspand_hoog' else 0,
-			1 if dwelling_type == 'meergezinspand_laag_midden' else 0,
-			1 if dwelling_type == 'tussenwoning' else 0,
-			1 if dwelling_type == 'twee_onder_1_kap' else 0,
-			1 if dwelling_type == 'vrijstaand' else 0,
+			*[1 if dwelling_type == regression_dwelling_type else 0 for regression_dwelling_type in self.dwelling_types],
 			max(construction_year, 1900),
-			energy_label_epi_log_avg
-		])
-		y_hat = np.dot(beta, x)
+			epi_log_avg
+		], dtype=float)
 
-		half_interval_size = calibration_factor * t_multiplier * np.sqrt(s_2 + x @ S @ x)
+	def get_prediction_interval(self, y_hat, x_S_x):
+		'''
+		Get the 95% prediction interval of the EPI from the
+		prediction y_hat of log(epi) and x @ S @ x, for one
+		dwelling or (as arrays) for many dwellings.
+		'''
+		s_2 = self.regression_values['s_2']
+		t_multiplier = self.regression_values['t_multiplier']
+		calibration_factor = self.regression_values['calibration_factor']
+
+		half_interval_size = calibration_factor * t_multiplier * np.sqrt(s_2 + x_S_x)
 		# 95% Prediction Interval for log(epi)
 		PI_min = y_hat - half_interval_size
 		PI_max = y_hat + half_interval_size
 		# 95% Prediction Interval for epi
-		PI = (np.exp(PI_min), np.exp(PI_max))
-		return np.exp(y_hat), PI
+		return np.exp(PI_min), np.exp(PI_max)
+
+	def predict_epis(self, dwelling_types, construction_years, epi_log_avgs):
+		'''
+		Predict the EPI (EnergiePrestatieIndex) of a batch of
+		dwellings at once, like predict_epi() does for one
+		dwelling. Returns arrays with the predictions and the
+		lower and upper bounds of the 95% prediction intervals.
+		'''
+		beta = self.regression_values['beta']
+		S = self.regression_values['S']
+
+		dwelling_types = np.asarray(dwelling_types, dtype=object)
+		construction_years = np.asarray(construction_years, dtype=float)
+		if np.isnan(construction_years).any():
+			raise ValueError('Cannot predict the EPI of a dwelling without a construction year (bouwjaar)')
+
+		# Design matrix, with the rows of get_design_row().
+		X = np.empty((len(dwelling_types), len(beta)))
+		X[:, 0] = 1 # intercept
+		for (index, dwelling_type) in enumerate(self.dwelling_types):
+			X[:, index + 1] = dwelling_types == dwelling_type
+		X[:, 6] = np.maximum(construction_years, 1900)
+		X[:, 7] = epi_log_avgs
+		y_hat = X @ beta
+
+		# x @ S @ x for every row x of X
+		PI_mins, PI_maxs = self.get_prediction_interval(y_hat, np.einsum('ij,jk,ik->i', X, S, X))
+		return np.exp(y_hat), PI_mins, PI_maxs
+
+	def predict_epi(self, dwelling):
+		'''
+		Predict the EPI (EnergiePrestatieIndex)
+		of the dwelling using multiple linear
+		regression, on the basis of dwelling type,
+		construction year, and the average log(epi)
+		in the pc6.
+		'''
+		beta = self.regression_values['beta']
+		S = self.regression_values['S']
+
+		x = self.get_design_row(dwelling.attributes['woningtype'], dwelling.attributes['bouwjaar'], self.get_epi_log_avg(dwelling))
+		y_hat = float(x @ beta)
+		PI_min, PI_max = self.get_prediction_interval(y_hat, float(x @ S @ x))
+		return float(np.exp(y_hat)), (float(PI_min), float(PI_max))
 
 	def process(self, dwelling):
 		continue_processing = super().process(dwelling)
@@ -108,6 +232,32 @@ class EnergyLabelPredictionModule(BaseModule):
 		dwelling.attributes['energy_label_class_mean'] = epi_to_label(prediction)
 		dwelling.attributes['energy_label_class_95'] = self.EnergyLabelClassRange(epi_to_label(prediction_interval[1]), epi_to_label(prediction_interval[0]), bounds='[]')
 
+	def process_batch(self, frame):
+		if not frame.start_processing(self):
+			return super().process_batch(frame)
+
+		predictions, PI_mins, PI_maxs = self.predict_epis(
+			frame.get_column('woningtype', dtype=object),
+			frame['bouwjaar'],
+			[self.get_epi_log_avg(dwelling) for dwelling in frame.dwellings]
+		)
+		labels_mean = epis_to_labels(predictions)
+		# A higher EPI is a worse label, so the upper
+		# bound of the EPI is the lower bound of the class.
+		labels_min = epis_to_labels(PI_maxs)
+		labels_max = epis_to_labels(PI_mins)
+
+		frame['energy_label_epi_mean'] = predictions
+		frame['energy_label_epi_95'] = get_object_array([
+			NumericRange(PI_min, PI_max, bounds='[]')
+			for (PI_min, PI_max) in zip(PI_mins.tolist(), PI_maxs.tolist())
+		])
+		frame['energy_label_class_mean'] = labels_mean
+		frame['energy_label_class_95'] = get_object_array([
+			self.EnergyLabelClassRange(label_min, label_max, bounds='[]')
+			for (label_min, label_max) in zip(labels_min, labels_max)
+		])
+
 	# Coefficients for the multiple linear regression
 	# as applied in predict_epi()
 	regression_values = {
@@ -172,7 +322,19 @@ class EnergyLabelPredictionModule(BaseModule):
 
 class EnergyLabelRegionalModule(BaseRegionalModule):
 
+	def __init__(self, connection, **kwargs):
+		super().__init__(connection, **kwargs)
+		# With pc6_stats=True, the average is taken from the table
+		# pc6_stats (see utils/pc6_stats_create_table.py)
+		# instead of queried for every pc6.
+		self.pc6_stats = get_pc6_stats_table(connection) if kwargs.get('pc6_stats', False) else None
+
 	def process_pc6(self, pc6):
+		if self.pc6_stats is not None:
+			stats = self.pc6_stats.get_stats(pc6.attributes['pc6'])
+			pc6.attributes['energy_label_epi_log_avg'] = stats['energy_label_epi_log_avg']
+			return
+
 		epi_log_pc6_average_query = "SELECT AVG(LN(epi_imputed)) FROM energy_labels WHERE pc6 = %s AND epi_imputed > 0"
 		cursor = self.connection.cursor()
 		pc6_code = pc6.attributes['pc6']
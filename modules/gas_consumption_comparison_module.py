@@ -1,26 +1,27 @@
 import os
 import sys
 import bisect
-from scipy.interpolate import interp1d
+
+import numpy as np
 
 # Required for relative imports to also work when called
 # from project root directory.
 sys.path.append(os.path.dirname(__file__))
 from base_module import BaseModule, BaseRegionalModule
 from classes import Dwelling
+from modules.regional_tables import get_pc6_stats_table
+from utils.benchmark_utils import BenchmarkTable
 
 class GasConsumptionComparisonModule(BaseModule):
 
 	def __init__(self, connection, **kwargs):
 		super().__init__(connection, **kwargs)
-		self.gas_benchmark_dict = {}
+		self.gas_benchmark = self.load_benchmark()
 
 	def neighbourhood_gas_use_comparison(self, buurt, pc6):
 		'''
 		Compares gas consumption of all dwellings in a neighbourhood to benchmark based on dwelling characteristics.
 		'''
-		# Create dictionary with vbo_ids : percentile of gas users
-		percentile_gas_use_dict = {}
 		# Get dwellings in neighbourhood
 		dwellings_in_neighbourhood = buurt.dwellings
 		# Total gas use in postal code
@@ -30,37 +31,22 @@ class GasConsumptionComparisonModule(BaseModule):
 		# Assumption: Gas use per m2 is the same for the entire pc6
 		gas_use_floor_space = postal_code_gas_use/postal_code_floor_space
 
-		# Comparison process
-		for dwelling in dwellings_in_neighbourhood:
-			vbo_id = dwelling.attributes['vbo_id']
-			dwelling_gas_use_percentile = 0
-			# Create tuple for looking up benchmark
-			dwelling_characteristics_tuple = self.create_characteristics_tuple(dwelling)
-			# Check if benchmark for combination of characteristics is already made
-			if dwelling_characteristics_tuple not in self.gas_benchmark_dict:
-				# If not, calculate the benchmark function
-				self.gas_benchmark_dict[dwelling_characteristics_tuple] = self.create_benchmark(dwelling_characteristics_tuple)
-
-			# Comparison with benchmark
-			benchmark = self.gas_benchmark_dict[dwelling_characteristics_tuple]
-			# If there is not gas use, we cannot compare
-			if gas_use_floor_space == 0:
-				pass
-			# If we do not have benchmark data, we cannot compare
-			elif benchmark == 0:
-				pass
-			else:
-				# See where gas use compares against the interpolated benchmark
-				dwelling_gas_use_percentile = float(benchmark(gas_use_floor_space))/100
-				# Extrapolation can give values outside of the domain
-				if dwelling_gas_use_percentile < 0:
-					dwelling_gas_use_percentile = 0
-				elif dwelling_gas_use_percentile > 1:
-					dwelling_gas_use_percentile = 1
-				else:
-					pass
-			# Add percentile compared to national data to dict
-			percentile_gas_use_dict[vbo_id] = dwelling_gas_use_percentile
+		vbo_ids = [dwelling.attributes['vbo_id'] for dwelling in dwellings_in_neighbourhood]
+		# If there is not gas use, we cannot compare
+		if gas_use_floor_space == 0:
+			return {vbo_id: 0 for vbo_id in vbo_ids}
+
+		# Comparison with benchmark, for all dwellings at once
+		dwelling_characteristics_tuples = [self.create_characteristics_tuple(dwelling) for dwelling in dwellings_in_neighbourhood]
+		gas_use_floor_space_array = np.full(len(vbo_ids), gas_use_floor_space, dtype=float)
+		dwelling_gas_use_percentiles, has_benchmark = self.gas_benchmark.compare(dwelling_characteristics_tuples, gas_use_floor_space_array)
+		# Extrapolation can give values outside of the domain
+		dwelling_gas_use_percentiles = np.clip(dwelling_gas_use_percentiles / 100, 0, 1)
+		# If we do not have benchmark data, we cannot compare
+		dwelling_gas_use_percentiles[~has_benchmark] = 0
+
+		# Dict with vbo_ids : percentile compared to national data
+		percentile_gas_use_dict = dict(zip(vbo_ids, dwelling_gas_use_percentiles.tolist()))
 
 		return(percentile_gas_use_dict)
 
@@ -110,38 +96,24 @@ class GasConsumptionComparisonModule(BaseModule):
 
 		return dwelling_characteristics_tuple
 
-	def create_benchmark(self, dwelling_characteristics_tuple):
+	def load_benchmark(self):
 		'''
-		Creates benchmark function based on dwelling characteristics.
+		Loads the benchmark of gas use for all
+		combinations of dwelling characteristics.
 		'''
-		# Look up gas use data for building characteristics
+		# Look up gas use data for all building characteristics
 		cursor = self.connection.cursor()
 		query_statement = """
-		SELECT aardgasleveringen_openbare_net
+		SELECT energielabelklasse, woningkenmerken, gebruiks_oppervlakteklasse, bouwjaarklasse, aardgasleveringen_openbare_net
 		FROM cbs_83878ned_aardgaslevering_woningkenmerken
 		WHERE perioden = '2019'
-		AND energielabelklasse = %s
-		AND woningkenmerken = %s
-		AND gebruiks_oppervlakteklasse = %s
-		AND bouwjaarklasse = %s
 		AND percentielen != 'Gemiddelde'
-		ORDER BY aardgasleveringen_openbare_net
 		"""
-		cursor.execute(query_statement, dwelling_characteristics_tuple)
+		cursor.execute(query_statement)
 		results = cursor.fetchall()
-		# Interpolate the data, with extrapolation for <5 and >95 percentile
-		benchmark_y_data = [5, 25, 50, 75, 95]
-		benchmark_x_data = [x for x in results]
-		benchmark_x_data = list(sum(benchmark_x_data, ()))
-		if None in benchmark_x_data or benchmark_x_data == []:
-			# Need to find a way to make this have results. Query for 'totaal'? How to find the characteristic that is the culprit?
-			interpolated_function = 0
-		else:
-			# Remove duplicate x values for interpolation
-			if benchmark_x_data[3] == benchmark_x_data[4]:
-				benchmark_x_data[4] == benchmark_x_data[4] + 0.1
-			interpolated_function = interp1d(benchmark_x_data, benchmark_y_data, fill_value='extrapolate')
-		return interpolated_function
+		cursor.close()
+		# Interpolation of the data, with extrapolation for <5 and >95 percentile
+		return BenchmarkTable(results, percentiles=[5, 25, 50, 75, 95])
 
 	def process(self, dwelling):
 		continue_processing = super().process(dwelling)
@@ -158,22 +130,42 @@ class GasConsumptionComparisonModule(BaseModule):
 		if vbo_id not in buurt.gas_use:
 			# If not, add gas use to the neighbourhood
 			buurt.gas_use = self.neighbourhood_gas_use_comparison(buurt, pc6)
+			# Rank all dwellings in the neighbourhood at once
+			buurt.gas_use_percentiles = self.get_percentile_ranks(buurt.gas_use)
 
-		# Check percentile ranking within neighbourhood
-		sorted_usage = list({k: v for k, v in sorted(buurt.gas_use.items(), key=lambda item: item[1])}.items())
-		# Find the index of the dwelling in question
-		index = [i for i, tupl in enumerate(sorted_usage) if tupl[0] == vbo_id].pop()
-		# Calculate the ranking of the dwelling [0,1]
-		gas_use_percentile_neighbourhood = (index+1)/len(sorted_usage)
+		# Percentile ranking within neighbourhood [0,1]
+		gas_use_percentile_neighbourhood = buurt.gas_use_percentiles[vbo_id]
 
 		dwelling.attributes['gas_use_percentile_national'] = buurt.gas_use[vbo_id]
 		dwelling.attributes['gas_use_percentile_neighbourhood'] = gas_use_percentile_neighbourhood
 
 class GasConsumptionComparisonRegionalModule(BaseRegionalModule):
 
+	def __init__(self, connection, **kwargs):
+		super().__init__(connection, **kwargs)
+		# With pc6_stats=True, the data is taken from the table
+		# pc6_stats (see utils/pc6_stats_create_table.py)
+		# instead of queried for every pc6.
+		self.pc6_stats = get_pc6_stats_table(connection) if kwargs.get('pc6_stats', False) else None
+
 	def process_pc6(self, pc6):
-		self.load_gas_use_data(pc6)
-		self.load_floor_space_data(pc6)
+		if self.pc6_stats is not None:
+			self.load_pc6_stats(pc6)
+		else:
+			self.load_gas_use_data(pc6)
+			self.load_floor_space_data(pc6)
+
+	def load_pc6_stats(self, pc6):
+		'''
+		Sets total gas use and floor space of postal code from pc6_stats
+		'''
+		stats = self.pc6_stats.get_stats(pc6.attributes['pc6'])
+		avg_gas_use = self.handle_null_data((stats['avg_gas_use'],))
+		number_of_dwellings = self.handle_null_data((stats['number_of_dwellings'],))
+
+		pc6.attributes['number_of_dwellings'] = number_of_dwellings
+		pc6.attributes['total_gas_use'] = avg_gas_use * number_of_dwellings
+		pc6.attributes['total_floor_space'] = stats['total_floor_space']
 
 	def load_gas_use_data(self, pc6):
 		'''
@@ -29,6 +29,12 @@ class GasCookingModule(BaseModule):
 
 		dwelling.attributes['gas_cooking_p'] = gas_cooking_p
 
+	def process_batch(self, frame):
+		if not frame.start_processing(self):
+			return super().process_batch(frame)
+
+		frame['gas_cooking_p'] = frame['boiler_heating_space_p'] + frame['district_high_gas_p'] + frame['district_low_gas_p'] + frame['elec_high_gas_p'] + frame['elec_low_gas_p'] + frame['block_heating_space_p_base']
+
 	outputs = {
 		'gas_cooking': {
 			'type': 'boolean',
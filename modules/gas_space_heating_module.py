@@ -3,6 +3,7 @@ import sys
 
 sys.path.append(os.path.dirname(__file__))
 from base_module import BaseModule
+from modules.regional_tables import get_heating_shares_table
 
 
 class GasSpaceHeatingModule(BaseModule):
@@ -32,6 +33,26 @@ class GasSpaceHeatingModule(BaseModule):
 		dwelling.attributes['block_heating_space_p'] = block_heating_space_p
 		dwelling.attributes['block_heating_space_p_base'] = block_heating_space_p_base
 
+	def process_batch(self, frame):
+		if not frame.start_processing(self):
+			return super().process_batch(frame)
+
+		gas_use_percentile_neighbourhood = frame['gas_use_percentile_neighbourhood']
+
+		boiler_heating_space_p = frame.get_region_column('buurt', 'gas_boiler_heating_share')
+		block_heating_space_p_base = frame.get_region_column('buurt', 'gas_block_heating_share')
+		district_high_space_p = frame.get_region_column('buurt', 'district_high_gas_share')
+
+		gas_boiler_space_p = boiler_heating_space_p + 0.5 * district_high_space_p
+		block_heating_space_p = block_heating_space_p_base + 0.5 * district_high_space_p
+		gas_boiler_space_p = self.modify_probabilities_up(gas_boiler_space_p, gas_use_percentile_neighbourhood)
+		block_heating_space_p = self.modify_probabilities_up(block_heating_space_p, gas_use_percentile_neighbourhood)
+
+		frame['boiler_heating_space_p'] = boiler_heating_space_p
+		frame['gas_boiler_space_p'] = gas_boiler_space_p
+		frame['block_heating_space_p'] = block_heating_space_p
+		frame['block_heating_space_p_base'] = block_heating_space_p_base
+
 	outputs = {
 		'gas_boiler_space': {
 			'type': 'boolean',
@@ -59,48 +80,20 @@ class GasSpaceHeatingModule(BaseModule):
 
 class GasSpaceHeatingRegionalModule(BaseModule):
 
+	def __init__(self, connection, **kwargs):
+		super().__init__(connection, **kwargs)
+		self.heating_shares = get_heating_shares_table(connection)
+
 	def process_buurt(self, buurt):
 		self.add_installation_type_shares(buurt)
 
 	def add_installation_type_shares(self, buurt):
 
 		buurt_id = buurt.attributes['buurt_id']
-		cursor = self.connection.cursor()
 		probability_modifier = buurt.attributes['probability_modifier']
-
-		# Add percentage of dwellings with gas boiler in neighbourhood to dict
 		# A050112 is the code for a gas boiler
-		query_boiler_heating ='''
-		SELECT woningen::float / 100
-		FROM cbs_84983ned_woningen_hoofdverwarmings_buurt_2019_typed
-		WHERE
-			area_code = %s
-			AND type_verwarmingsinstallatie = 'A050112'
-			AND woningen IS NOT null'''
-		cursor.execute(query_boiler_heating, (buurt_id,))
-
-
-		gas_boiler_heating_share = cursor.fetchone()
-		gas_boiler_heating_share = self.handle_null_data(gas_boiler_heating_share)
-
-		buurt.attributes['gas_boiler_heating_share'] = gas_boiler_heating_share * probability_modifier
-
-		# Add percentage of dwellings with block heating in neighbourhood to dict
+		buurt.attributes['gas_boiler_heating_share'] = self.heating_shares.get_share(buurt_id, 'A050112') * probability_modifier
 		# A050113 is the code for a block heating
-		query_block_heating ='''
-		SELECT woningen::float / 100
-		FROM cbs_84983ned_woningen_hoofdverwarmings_buurt_2019_typed
-		WHERE
-			area_code = %s
-			AND type_verwarmingsinstallatie = 'A050113'
-			AND woningen IS NOT null'''
-		cursor.execute(query_block_heating, (buurt_id,))
-
-		gas_block_heating_share = cursor.fetchone()
-		gas_block_heating_share = self.handle_null_data(gas_block_heating_share)
-
-		buurt.attributes['gas_block_heating_share'] = gas_block_heating_share * probability_modifier
-
-		cursor.close()
+		buurt.attributes['gas_block_heating_share'] = self.heating_shares.get_share(buurt_id, 'A050113') * probability_modifier
 
 	supports = ['buurt']
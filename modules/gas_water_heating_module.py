@@ -33,6 +33,18 @@ class GasWaterHeatingModule(BaseModule):
 		dwelling.attributes['gas_boiler_water_p'] = gas_boiler_water_p
 		dwelling.attributes['block_heating_water_p'] = block_heating_water_p
 
+	def process_batch(self, frame):
+		if not frame.start_processing(self):
+			return super().process_batch(frame)
+
+		block_heating_space_p = frame['block_heating_space_p_base']
+
+		gas_boiler_water_p = frame['boiler_heating_space_p'] + frame['elec_high_gas_p'] + frame['elec_low_gas_p'] + 0.5 * block_heating_space_p + 0.5 * frame['district_low_gas_p'] + 0.5 * frame['district_high_gas_p']
+		gas_boiler_water_p = self.modify_probabilities_up(gas_boiler_water_p, frame['gas_use_percentile_neighbourhood'])
+
+		frame['gas_boiler_water_p'] = gas_boiler_water_p
+		frame['block_heating_water_p'] = 0.5 * block_heating_space_p
+
 	outputs = {
 		'gas_boiler_water': {
 			'type': 'boolean',
@@ -8,7 +8,8 @@ import pandas as pd
 sys.path.append(os.path.dirname(__file__))
 from base_module import BaseModule
 
-from utils.probability_utils import ProbabilityDistribution
+from utils.probability_utils import ArrayProbabilityDistribution, ProbabilityDistribution
+from utils.insulation_table import get_signature, load_insulation_table
 from modules.insulation_data import INSULATION_DATA
 
 class InsulationModule(BaseModule):
@@ -23,24 +24,70 @@ class InsulationModule(BaseModule):
 	def __init__(self, connection, **kwargs):
 		super().__init__(connection, **kwargs)
 
+		# By default the distributions are ArrayProbabilityDistributions,
+		# with array_distributions=False the dict-based
+		# ProbabilityDistributions are used.
+		if kwargs.get('array_distributions', True):
+			self.ProbabilityDistribution = ArrayProbabilityDistribution
+		else:
+			self.ProbabilityDistribution = ProbabilityDistribution
+
+		# With a convolution_resolution, the sums of distributions
+		# are approximated on a grid with that spacing,
+		# see ArrayProbabilityDistribution.convolve().
+		self.convolution_resolution = kwargs.get('convolution_resolution', None)
+
 		self.dwellings_n = INSULATION_DATA['dwellings_n']
 		self.dwelling_type_multipliers = INSULATION_DATA['dwelling_type_multipliers']
 
 		self.building_code_r_values = self.year_dict_to_dataframe(INSULATION_DATA['building_code_r_values'])
 
-		self.insulation_measures_r_values = INSULATION_DATA['insulation_measures_r_values']
-		self.glazing_r_values = INSULATION_DATA['glazing_r_values']
-		self.cavity_wall_r_value = INSULATION_DATA['cavity_wall_r_value']
+		self.insulation_measures_r_values = self.convert_distributions(INSULATION_DATA['insulation_measures_r_values'])
+		self.glazing_r_values = self.convert_distributions(INSULATION_DATA['glazing_r_values'])
+		self.cavity_wall_r_value = self.convert_distributions(INSULATION_DATA['cavity_wall_r_value'])
 
 		self.insulation_measures_n = self.year_dict_to_dataframe(INSULATION_DATA['insulation_measures_n'])
 		self.insulation_measures_p = self.get_insulation_measures_p(self.insulation_measures_n)
 
-		self.base_r_values_1992_2005 = INSULATION_DATA['base_r_values_1992_2005']
-		self.base_r_values_1920_1991 = INSULATION_DATA['base_r_values_1920_1991']
-		self.base_r_values_before_1920 = INSULATION_DATA['base_r_values_before_1920']
+		self.base_r_values_1992_2005 = self.convert_distributions(INSULATION_DATA['base_r_values_1992_2005'])
+		self.base_r_values_1920_1991 = self.convert_distributions(INSULATION_DATA['base_r_values_1920_1991'])
+		self.base_r_values_before_1920 = self.convert_distributions(INSULATION_DATA['base_r_values_before_1920'])
 
 		self.cached_results = {}
 
+		# With insulation_table=True, the results are looked up in
+		# the table built by utils/insulation_table_create.py.
+		# The table has the means and 95% intervals, so these are
+		# not sampled from distributions for dwellings in the table.
+		self.insulation_table = None
+		self.table_outputs = {name: {'type': options['type']} for (name, options) in self.outputs.items()}
+		if kwargs.get('insulation_table', False):
+			self.insulation_table = load_insulation_table(get_signature(self))
+			if self.insulation_table is None:
+				print('      Insulation table not found or out of date, build it with `python utils/insulation_table_create.py`.')
+
+	def convert_distributions(self, data):
+		'''
+		Convert all ProbabilityDistributions in
+		(nested dicts of) 'data' to the type of distribution
+		that this module uses.
+		'''
+		if type(data) == dict:
+			return {key: self.convert_distributions(value) for (key, value) in data.items()}
+		elif type(data) == ProbabilityDistribution and self.ProbabilityDistribution == ArrayProbabilityDistribution:
+			return ArrayProbabilityDistribution(data)
+		else:
+			return data
+
+	def add_distributions(self, dist_1, dist_2):
+		'''
+		Get the distribution of the sum of values from
+		'dist_1' and 'dist_2'.
+		'''
+		if self.convolution_resolution is None:
+			return dist_1 & dist_2
+		return dist_1.convolve(dist_2, resolution=self.convolution_resolution)
+
 	def year_dict_to_dataframe(self, dict):
 		'''
 		Convert a dict of the form
@@ -111,15 +158,23 @@ class InsulationModule(BaseModule):
 		# so we use that as a key in our cache.
 		key = (construction_year, dwelling_type)
 		if key not in self.cached_results:
-			# Save processing results in cache.
-			self.cached_results[key] = self._process(dwelling)
+			results = None
+			if self.insulation_table is not None:
+				results = self.insulation_table.get_outputs(construction_year, dwelling_type)
+			if results is None:
+				# Save processing results in cache.
+				self.cached_results[key] = (self._process(dwelling), self.outputs)
+			else:
+				self.cached_results[key] = (results, self.table_outputs)
 
-		dwelling.attributes.update(self.cached_results[key])
+		(results, outputs) = self.cached_results[key]
+		dwelling.attributes.update(results)
+		dwelling.outputs.update(outputs)
 
 	def _process(self, dwelling):
 		# combines the R-values for the facade itself,
 		# and optional increase of cavity wall insulation.
-		insulation_facade_r_dist = self.process_insulation_type(dwelling, 'facade') & self.process_insulation_type(dwelling, 'cavity wall')
+		insulation_facade_r_dist = self.add_distributions(self.process_insulation_type(dwelling, 'facade'), self.process_insulation_type(dwelling, 'cavity wall'))
 
 		insulation_roof_r_dist = self.process_insulation_type(dwelling, 'roof')
 
@@ -144,11 +199,11 @@ class InsulationModule(BaseModule):
 		# Get the most recent version up to the the construction year.
 		building_code = df[df.year <= construction_year].iloc[-1]
 		return {
-			'facade': ProbabilityDistribution({building_code['facade']: 1}),
-			'roof': ProbabilityDistribution({building_code['roof']: 1}),
-			'wall': ProbabilityDistribution({building_code['wall']: 1}),
-			'floor': ProbabilityDistribution({building_code['floor']: 1}),
-			'window': ProbabilityDistribution({building_code['window']: 1})
+			'facade': self.ProbabilityDistribution({building_code['facade']: 1}),
+			'roof': self.ProbabilityDistribution({building_code['roof']: 1}),
+			'wall': self.ProbabilityDistribution({building_code['wall']: 1}),
+			'floor': self.ProbabilityDistribution({building_code['floor']: 1}),
+			'window': self.ProbabilityDistribution({building_code['window']: 1})
 		}
 
 	def get_base_dist(self, dwelling):
@@ -189,7 +244,7 @@ class InsulationModule(BaseModule):
 
 		# We start all distributions off, pretending there is no
 		# cavity wall insulation at all.
-		base_dist['cavity wall'] = ProbabilityDistribution({0: 1})
+		base_dist['cavity wall'] = self.ProbabilityDistribution({0: 1})
 
 		return base_dist
 
@@ -253,7 +308,7 @@ class InsulationModule(BaseModule):
 			# We need to set this case specifically,
 			# because else the sum() will return 0,
 			# which can't be .pad()-ded.
-			measures_dist = ProbabilityDistribution({
+			measures_dist = self.ProbabilityDistribution({
 					0: 1
 				})
 		else:
@@ -266,7 +321,7 @@ class InsulationModule(BaseModule):
 			measures_dist.pad()
 			# Add the increase of R-values in measures_dist
 			# to the base distribution base_dist.
-			return base_dist & measures_dist
+			return self.add_distributions(base_dist, measures_dist)
 
 		# With windows, the measure is not an addition to the
 		# existing insulation, but a replacement.
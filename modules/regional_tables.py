@@ -0,0 +1,306 @@
+from multiprocessing import shared_memory
+import weakref
+
+import numpy as np
+
+class RegionalTable:
+	'''
+	A table of regional statistics that is stored in NumPy
+	arrays (the attributes in array_names), so it can be
+	put in shared memory, see share_regional_tables().
+	'''
+
+	array_names = []
+
+	def get_arrays(self):
+		return {name: getattr(self, name) for name in self.array_names}
+
+	@classmethod
+	def from_arrays(cls, arrays):
+		'''
+		Make the table from the arrays of get_arrays(),
+		without copying them.
+		'''
+		table = cls.__new__(cls)
+		for name in cls.array_names:
+			setattr(table, name, arrays[name])
+		return table
+
+class HeatingSharesTable(RegionalTable):
+	'''
+	Shares of the main heating installation types per region,
+	from CBS table 84983 ('Woningen; hoofdverwarmingsinstallaties,
+	wijken en buurten, 2019'), loaded in one query.
+
+	The area codes are kept in a sorted array, the shares in an
+	array of shape (n_areas, n_installation_types), so a lookup
+	is a binary search instead of a query per installation type.
+	'''
+
+	installation_types = [
+		'A050112', # gas boiler
+		'A050113', # block heating
+		'A050114', # district heating with high gas use
+		'A050115', # district heating with low gas use
+		'A050116', # district heating with no gas use
+		'A050117', # hybrid heat pump
+		'A050118', # electric heating with low gas use
+		'A050119'  # electric heating with no gas use
+	]
+
+	type_indexes = {installation_type: index for (index, installation_type) in enumerate(installation_types)}
+
+	array_names = ['area_codes', 'shares', 'probability_modifiers']
+
+	def __init__(self, rows):
+		'''
+		'rows' are tuples (area_code, total, woningen_1, ..., woningen_n),
+		with the number of dwellings for every installation type
+		in the order of installation_types.
+		'''
+		# The collation of the database can order the area codes
+		# differently than NumPy, which searchsorted() relies on.
+		# Postgres ignores trailing spaces when comparing
+		# character(n) values, we do the same.
+		rows = sorted([row for row in rows if row[0] is not None], key=lambda row: row[0].rstrip())
+		self.area_codes = np.array([row[0].rstrip() for row in rows], dtype=str)
+		totals = np.array([row[1] if row[1] is not None else 0 for row in rows], dtype=float)
+		self.shares = np.array([
+			[float(woningen) / 100 if woningen is not None else 0 for woningen in row[2:]]
+			for row in rows
+		], dtype=float).reshape(len(rows), len(self.installation_types))
+
+		# Correct for the unknown installations, see
+		# DistrictSpaceHeatingRegionalModule.
+		self.probability_modifiers = np.ones(len(rows))
+		np.divide(99, totals, out=self.probability_modifiers, where=totals != 0)
+
+	def get_index(self, area_code):
+		'''
+		Get the row of the area, or None when the
+		area is not in the table.
+		'''
+		area_code = area_code.rstrip()
+		index = int(np.searchsorted(self.area_codes, area_code))
+		if index < len(self.area_codes) and self.area_codes[index] == area_code:
+			return index
+		return None
+
+	def get_probability_modifier(self, area_code):
+		index = self.get_index(area_code)
+		if index is None:
+			return 1
+		return float(self.probability_modifiers[index])
+
+	def get_share(self, area_code, installation_type):
+		'''
+		Get the share of dwellings in the area with
+		the installation type, uncorrected for the
+		unknown installations.
+		'''
+		index = self.get_index(area_code)
+		if index is None:
+			return 0
+		return float(self.shares[index, self.type_indexes[installation_type]])
+
+def get_heating_shares_query():
+	# Pivot to one row per area, with a column
+	# for every installation type.
+	columns = ',\n\t\t'.join([
+		f"MIN(woningen) FILTER (WHERE type_verwarmingsinstallatie = '{installation_type}')"
+		for installation_type in HeatingSharesTable.installation_types
+	])
+	return f'''
+	SELECT
+		area_code,
+		SUM(woningen),
+		{columns}
+	FROM cbs_84983ned_woningen_hoofdverwarmings_buurt_2019_typed
+	GROUP BY area_code
+	'''
+
+# Tables that are attached from shared memory (see
+# attach_regional_tables()), by name. These are used
+# instead of the tables of the connection.
+shared_tables = {}
+
+# Tables that have already been loaded, per connection,
+# so the regional modules can share them.
+heating_shares_tables = weakref.WeakKeyDictionary()
+
+def get_heating_shares_table(connection):
+	'''
+	Get the HeatingSharesTable, loading it from
+	the database if that has not been done yet
+	for this connection.
+	'''
+	if 'heating_shares' in shared_tables:
+		return shared_tables['heating_shares']
+	if connection not in heating_shares_tables:
+		cursor = connection.cursor()
+		cursor.execute(get_heating_shares_query())
+		rows = cursor.fetchall()
+		cursor.close()
+		heating_shares_tables[connection] = HeatingSharesTable(rows)
+	return heating_shares_tables[connection]
+
+class PC6StatsTable(RegionalTable):
+	'''
+	The statistics per pc6 from the table 'pc6_stats' (see
+	utils/pc6_stats_create_table.py), loaded into memory at
+	once so the regional modules don't need to query for
+	every pc6.
+	'''
+
+	columns = [
+		'number_of_dwellings',
+		'total_floor_space',
+		'avg_gas_use',
+		'avg_elec_use',
+		'household_size',
+		'energy_label_epi_log_avg'
+	]
+
+	array_names = ['pc6s', 'values']
+
+	def __init__(self, rows):
+		'''
+		'rows' are tuples (pc6, value_1, ..., value_n), with
+		the values in the order of columns.
+		'''
+		rows = sorted([row for row in rows if row[0] is not None], key=lambda row: row[0].rstrip())
+		self.pc6s = np.array([row[0].rstrip() for row in rows], dtype=str)
+		# NULLs become NaN
+		self.values = np.array([
+			[float(value) if value is not None else np.nan for value in row[1:]]
+			for row in rows
+		], dtype=float).reshape(len(rows), len(self.columns))
+
+	def get_stats(self, pc6):
+		'''
+		Get a dict with the statistics of the pc6, with
+		None for unknown values. These are the same values
+		the regional modules get with their queries; a pc6
+		that is not in the table has no dwellings.
+		'''
+		index = None
+		if pc6 is not None:
+			pc6 = pc6.rstrip()
+			index = int(np.searchsorted(self.pc6s, pc6))
+			if index >= len(self.pc6s) or self.pc6s[index] != pc6:
+				index = None
+
+		if index is None:
+			stats = {column: None for column in self.columns}
+			stats['number_of_dwellings'] = 0
+			return stats
+
+		return {
+			column: (None if np.isnan(value) else float(value))
+			for (column, value) in zip(self.columns, self.values[index])
+		}
+
+def get_pc6_stats_query():
+	return f'''
+	SELECT
+		pc6, {', '.join(PC6StatsTable.columns)}
+	FROM pc6_stats
+	'''
+
+pc6_stats_tables = weakref.WeakKeyDictionary()
+
+def get_pc6_stats_table(connection):
+	'''
+	Get the PC6StatsTable, loading it from the database
+	if that has not been done yet for this connection.
+	'''
+	if 'pc6_stats' in shared_tables:
+		return shared_tables['pc6_stats']
+	if connection not in pc6_stats_tables:
+		cursor = connection.cursor()
+		cursor.execute(get_pc6_stats_query())
+		rows = cursor.fetchall()
+		cursor.close()
+		pc6_stats_tables[connection] = PC6StatsTable(rows)
+	return pc6_stats_tables[connection]
+
+regional_table_classes = {
+	'heating_shares': HeatingSharesTable,
+	'pc6_stats': PC6StatsTable
+}
+
+def share_arrays(arrays):
+	'''
+	Copy the NumPy arrays in the dict 'arrays' to blocks of
+	shared memory. Returns the SharedMemory blocks and
+	a description of the arrays for attach_arrays().
+	'''
+	blocks = []
+	descriptions = {}
+	for (name, array) in arrays.items():
+		# A block of shared memory cannot be empty.
+		block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+		np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+		blocks.append(block)
+		descriptions[name] = (block.name, array.shape, array.dtype.str)
+	return blocks, descriptions
+
+def attach_arrays(descriptions):
+	'''
+	Get the arrays described by 'descriptions' (from
+	share_arrays()), without copying them. Returns the
+	SharedMemory blocks, which have to be kept as long
+	as the arrays are used, and the (read-only) arrays.
+	'''
+	blocks = []
+	arrays = {}
+	for (name, (block_name, shape, dtype)) in descriptions.items():
+		block = shared_memory.SharedMemory(name=block_name)
+		array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+		array.flags.writeable = False
+		blocks.append(block)
+		arrays[name] = array
+	return blocks, arrays
+
+def share_regional_tables(connection, pc6_stats=False):
+	'''
+	Put the regional tables (and with pc6_stats=True,
+	the PC6StatsTable) in shared memory, so the workers of
+	the pipeline can attach to them with
+	attach_regional_tables() instead of each loading
+	their own copy. Returns the SharedMemory blocks, to
+	unlink() when the workers are done, and a description
+	of the tables to pass to the workers.
+	'''
+	tables = {'heating_shares': get_heating_shares_table(connection)}
+	if pc6_stats:
+		tables['pc6_stats'] = get_pc6_stats_table(connection)
+
+	blocks = []
+	descriptions = {}
+	for (name, table) in tables.items():
+		table_blocks, descriptions[name] = share_arrays(table.get_arrays())
+		blocks += table_blocks
+	return blocks, descriptions
+
+def attach_regional_tables(descriptions):
+	'''
+	Use the tables in shared memory described by
+	'descriptions' (from share_regional_tables()) for
+	every connection in this process.
+	'''
+	for (name, table_descriptions) in descriptions.items():
+		blocks, arrays = attach_arrays(table_descriptions)
+		table = regional_table_classes[name].from_arrays(arrays)
+		# The arrays are only valid as
+		# long as the blocks are open.
+		table.shared_memory_blocks = blocks
+		shared_tables[name] = table
+
+def release_shared_memory(blocks):
+	'''
+	Free the SharedMemory blocks of share_regional_tables().
+	'''
+	for block in blocks:
+		block.close()
+		block.unlink()
@@ -1,3 +1,4 @@
+from collections import OrderedDict
 import os
 import sys
 
@@ -7,6 +8,69 @@ sys.path.append(os.path.dirname(__file__))
 from base_module import BaseModule
 from classes import PC6, Buurt
 
+class RegionCache:
+	'''
+	The regions of one type (e.g. PC6) by their code. A region
+	is evicted once all its dwellings have been added (when
+	'evict_on_complete'), since no dwelling will need it
+	anymore. With a 'max_size', the least recently used regions
+	are evicted when there are more, e.g. regions of which
+	some dwellings are not processed in this run.
+	'''
+
+	def __init__(self, max_size=None, evict_on_complete=True):
+		self.regions = OrderedDict()
+		self.max_size = max_size
+		self.evict_on_complete = evict_on_complete
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def __len__(self):
+		return len(self.regions)
+
+	def __contains__(self, key):
+		return key in self.regions
+
+	def __getitem__(self, key):
+		return self.regions[key]
+
+	def get(self, key):
+		'''
+		Get the region, or None (a miss)
+		if it is not in the cache.
+		'''
+		region = self.regions.get(key)
+		if region is None:
+			self.misses += 1
+			return None
+		self.hits += 1
+		self.regions.move_to_end(key)
+		return region
+
+	def add(self, key, region):
+		self.regions[key] = region
+		if self.max_size is not None:
+			while len(self.regions) > self.max_size:
+				self.regions.popitem(last=False)
+				self.evictions += 1
+
+	def dwelling_added(self, key):
+		'''
+		Evict the region if all its dwellings have been added.
+		'''
+		if self.evict_on_complete and key in self.regions and self.regions[key].n_placeholders == 0:
+			del self.regions[key]
+			self.evictions += 1
+
+	def get_stats(self):
+		return {
+			'size': len(self.regions),
+			'hits': self.hits,
+			'misses': self.misses,
+			'evictions': self.evictions
+		}
+
 class RegionsModule(BaseModule):
 	'''
 	Adds the different regional spatial levels to
@@ -16,8 +80,16 @@ class RegionsModule(BaseModule):
 	def __init__(self, connection, **kwargs):
 		super().__init__(connection, **kwargs)
 		regional_modules = kwargs.get('regional_modules', [])
-		self.pc6s = {}
-		self.buurten = {}
+		# With region_cache_size, at most that many regions of
+		# every type are kept (with the least recently used evicted
+		# first). Regions of which all dwellings have been processed
+		# are evicted anyway, unless evict_completed_regions=False.
+		cache_kwargs = {
+			'max_size': kwargs.get('region_cache_size', None),
+			'evict_on_complete': kwargs.get('evict_completed_regions', True)
+		}
+		self.pc6s = RegionCache(**cache_kwargs)
+		self.buurten = RegionCache(**cache_kwargs)
 		self.regional_modules = {
 			'pc6': [module for module in regional_modules if 'pc6' in module.supports],
 			'buurt': [module for module in regional_modules if 'buurt' in module.supports]
@@ -36,31 +108,41 @@ class RegionsModule(BaseModule):
 	def add_pc6(self, dwelling):
 		pc6 = dwelling.attributes['pc6']
 
-		if pc6 in self.pc6s:
-			pc6_instance = self.pc6s[pc6]
-		else:
+		pc6_instance = self.pc6s.get(pc6)
+		if pc6_instance is None:
 			kwargs = {
 				'pc6_modules': self.regional_modules['pc6'],
 				'pc6_dwelling_modules': self.pc6_dwelling_modules
 			}
 			pc6_instance = PC6(pc6, self.connection, **kwargs)
-			self.pc6s[pc6] = pc6_instance
+			self.pc6s.add(pc6, pc6_instance)
 
 		dwelling.regions['pc6'] = pc6_instance
 		pc6_instance.add_dwelling(dwelling)
+		self.pc6s.dwelling_added(pc6)
 
 	def add_buurt(self, dwelling):
 		buurt_id = dwelling.attributes['buurt_id']
 
-		if buurt_id in self.buurten:
-			buurt_instance = self.buurten[buurt_id]
-		else:
+		buurt_instance = self.buurten.get(buurt_id)
+		if buurt_instance is None:
 			kwargs = {
 				'buurt_modules': self.regional_modules['buurt'],
 				'buurt_dwelling_modules': self.buurt_dwelling_modules
 			}
 			buurt_instance = Buurt(buurt_id, self.connection, **kwargs)
-			self.buurten[buurt_id] = buurt_instance
+			self.buurten.add(buurt_id, buurt_instance)
 
 		dwelling.regions['buurt'] = buurt_instance
 		buurt_instance.add_dwelling(dwelling)
+		self.buurten.dwelling_added(buurt_id)
+
+	def get_cache_stats(self):
+		'''
+		Get the size, hits, misses and evictions
+		of the caches of the regions.
+		'''
+		return {
+			'pc6': self.pc6s.get_stats(),
+			'buurt': self.buurten.get_stats()
+		}
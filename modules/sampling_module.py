@@ -3,13 +3,20 @@ import random
 import sys
 import collections
 
-from psycopg2.extras import NumericRange
+import numpy as np
+from psycopg2.extras import NumericRange, execute_values
 
 # Required for relative imports to also work when called
 # from project root directory.
 sys.path.append(os.path.dirname(__file__))
 from base_module import BaseModule
-from utils.probability_utils import ProbabilityDistribution
+from utils.probability_utils import ArrayProbabilityDistribution, ProbabilityDistribution
+from utils.random_utils import get_uniforms
+
+insert_realization_counts_statement = '''
+INSERT INTO realization_counts (buurt_id, pc6, installation, counts)
+VALUES %s
+'''
 
 class SamplingModule(BaseModule):
 
@@ -31,8 +38,25 @@ class SamplingModule(BaseModule):
 		'electric_cooking' : 'co02'
 		}
 		self.functions = ('space', 'water', 'cooking')
+		# Used by process_batch()
+		self.random_generator = np.random.default_rng()
+		# With a seed, the random numbers only depend on the seed,
+		# the vbo_id, the output and the attempt, so the samples of
+		# a dwelling are the same in every run with that seed,
+		# in process() and process_batch().
+		self.seed = kwargs.get('seed', None)
+		# With realizations, process_batch() samples every
+		# dwelling that many times, and saves the number of
+		# installations per realization in 'realization_counts'.
+		# The first realization is the one in 'results'.
+		# The counts are inserted once per batch, so realizations
+		# are not supported when processing dwelling by dwelling.
+		self.realizations = kwargs.get('realizations', None)
 
 	def process(self, dwelling):
+		if self.realizations is not None:
+			raise ValueError('realizations are only sampled in process_batch(), use batch mode')
+
 		continue_processing = super().process(dwelling)
 		# Dwelling has already been processed by this module
 		if not continue_processing:
@@ -43,7 +67,7 @@ class SamplingModule(BaseModule):
 			if options.get('sampling', False) == True:
 				distribution_value = dwelling.attributes[options['distribution']]
 
-				dwelling.attributes[name] = self.sample(distribution_value, options['type'], name)
+				dwelling.attributes[name] = self.sample(distribution_value, options['type'], name, dwelling)
 				self.check_water_space_dependency(dwelling, name)
 
 		# Minimum of one installation each for space heating, water heating and cooking
@@ -51,6 +75,202 @@ class SamplingModule(BaseModule):
 		# Produce more convenient output
 		self.produce_output_code(dwelling)
 
+	def process_batch(self, frame):
+		'''
+		Sample the dwellings of a DwellingFrame at once: the
+		same as process() for every dwelling, but with all
+		booleans drawn in one call and the dependencies, retries
+		and output codes done with array operations.
+		'''
+		# The probabilities and distributions are
+		# read from the attributes of the dwellings.
+		frame.write_back()
+		dwellings = []
+		for dwelling in frame.dwellings:
+			if super().process(dwelling):
+				dwellings.append(dwelling)
+
+		# Dwellings normally all have the same outputs,
+		# but group them to be sure.
+		groups = collections.defaultdict(list)
+		for dwelling in dwellings:
+			sampling_names = tuple(name for (name, options) in dwelling.outputs.items() if options.get('sampling', False) == True)
+			groups[sampling_names].append(dwelling)
+
+		for (sampling_names, group) in groups.items():
+			self.sample_batch(group, sampling_names)
+		frame.clear()
+
+	def sample_batch(self, dwellings, sampling_names):
+		outputs = dwellings[0].outputs
+		boolean_names = [name for name in sampling_names if outputs[name]['type'] == 'boolean']
+		column_indexes = {name: index for (index, name) in enumerate(boolean_names)}
+
+		# Distributions are not sampled randomly, only booleans.
+		for name in sampling_names:
+			if name not in column_indexes:
+				for dwelling in dwellings:
+					distribution_value = dwelling.attributes[outputs[name]['distribution']]
+					dwelling.attributes[name] = self.sample(distribution_value, outputs[name]['type'], name)
+
+		if len(boolean_names) > 0:
+			probabilities = np.array([
+				[dwelling.attributes[outputs[name]['distribution']] for name in boolean_names]
+				for dwelling in dwellings
+			], dtype=float)
+			for (name, column) in zip(boolean_names, probabilities.T):
+				if ((column < 0) | (column > 1) | np.isnan(column)).any():
+					raise ValueError(f"Expected value between 0-1 while sampling for boolean, but got: {column[(column < 0) | (column > 1) | np.isnan(column)][0]}, for distribution: {name}")
+
+			# All realizations are sampled together, as rows
+			# of the same arrays, realization by realization.
+			n_realizations = self.realizations or 1
+			n_dwellings = len(dwellings)
+			realizations = np.repeat(np.arange(n_realizations), n_dwellings)
+			dwellings = dwellings * n_realizations
+			probabilities = np.tile(probabilities, (n_realizations, 1))
+
+			# First sampling
+			samples = self.get_batch_uniforms(dwellings, boolean_names, realizations=realizations) <= probabilities
+			self.apply_water_space_dependencies(samples, dwellings, column_indexes, boolean_names)
+
+			# Minimum of one installation each for space heating, water
+			# heating and cooking, see check_minimum_installations().
+			# Dwellings that get a gas installation assigned are
+			# not checked for the remaining functions.
+			checked = np.ones(len(dwellings), dtype=bool)
+			for function in self.functions:
+				function_columns = [column_indexes[name] for name in boolean_names if outputs[name].get('function', False) == function]
+				for tries in range(1, 5):
+					missing = checked & ~samples[:, function_columns].any(axis=1)
+					if not missing.any():
+						break
+					function_names = [boolean_names[column] for column in function_columns]
+					resampled = self.get_batch_uniforms(dwellings, function_names, attempt=tries, rows=missing, realizations=realizations) <= probabilities[np.ix_(missing, function_columns)]
+					samples[np.ix_(missing, function_columns)] = resampled
+					if function == 'water':
+						self.apply_water_space_dependencies(samples, dwellings, column_indexes, boolean_names, rows=missing)
+					if tries >= 4:
+						gas_name = self.gas_installations[function]
+						if gas_name in column_indexes:
+							samples[missing, column_indexes[gas_name]] = True
+						else:
+							for index in np.flatnonzero(missing[:n_dwellings]):
+								dwellings[index].attributes[gas_name] = True
+						checked &= ~missing
+
+			dwellings = dwellings[:n_dwellings]
+			for (name, column) in zip(boolean_names, samples[:n_dwellings].T.tolist()):
+				for (dwelling, sample) in zip(dwellings, column):
+					dwelling.attributes[name] = sample
+
+			if self.realizations is not None:
+				self.save_realization_counts(dwellings, boolean_names, samples.reshape(n_realizations, n_dwellings, len(boolean_names)))
+
+		# Produce more convenient output
+		self.produce_output_codes(dwellings, sampling_names)
+
+	def get_batch_uniforms(self, dwellings, names, attempt=0, rows=None, realizations=0):
+		'''
+		Get uniform random numbers in [0, 1) for the outputs
+		'names' of the dwellings (or a boolean mask of 'rows'
+		of them), as an array of shape (n_dwellings, n_names).
+		'realizations' is the realization of every dwelling.
+		'''
+		realizations = np.broadcast_to(realizations, (len(dwellings),))
+		if rows is not None:
+			dwellings = [dwelling for (dwelling, row) in zip(dwellings, rows) if row]
+			realizations = realizations[rows]
+		if self.seed is None:
+			return self.random_generator.random((len(dwellings), len(names)))
+		vbo_ids = [dwelling.attributes['vbo_id'] for dwelling in dwellings]
+		return get_uniforms(self.seed, vbo_ids, names, attempt, realizations)
+
+	def save_realization_counts(self, dwellings, boolean_names, samples):
+		'''
+		Count the installations per realization for every
+		combination of buurt and pc6 in the dwellings, and save
+		them in 'realization_counts'. 'samples' has the shape
+		(n_realizations, n_dwellings, n_installations).
+		'''
+		region_indexes = {}
+		dwelling_regions = [
+			region_indexes.setdefault((dwelling.attributes['buurt_id'], dwelling.attributes['pc6']), len(region_indexes))
+			for dwelling in dwellings
+		]
+		counts = np.zeros((len(samples), len(region_indexes), len(boolean_names)), dtype=int)
+		np.add.at(counts, (slice(None), np.array(dwelling_regions, dtype=int)), samples.astype(int))
+
+		rows = [
+			(buurt_id, pc6, name, counts[:, region_index, column].tolist())
+			for ((buurt_id, pc6), region_index) in region_indexes.items()
+			for (column, name) in enumerate(boolean_names)
+		]
+		cursor = self.connection.cursor()
+		execute_values(cursor, insert_realization_counts_statement, rows)
+		cursor.close()
+
+	def apply_water_space_dependencies(self, samples, dwellings, column_indexes, boolean_names, rows=None):
+		'''
+		check_water_space_dependency() for the array of samples,
+		optionally only for a boolean mask of 'rows'.
+		'''
+		if rows is None:
+			rows = np.ones(len(dwellings), dtype=bool)
+		for (water_name, space_name) in self.water_space_dependencies.items():
+			if water_name not in column_indexes:
+				continue
+			if space_name in column_indexes:
+				space = samples[:, column_indexes[space_name]]
+			else:
+				space = np.array([dwelling.attributes[space_name] != False for dwelling in dwellings])
+			samples[rows & ~space, column_indexes[water_name]] = False
+
+	def produce_output_codes(self, dwellings, sampling_names):
+		'''
+		produce_output_code() for a batch of dwellings, with
+		the installations of every function as a bitmask.
+		'''
+		outputs = dwellings[0].outputs
+		for function in self.functions:
+			function_names = [name for name in sampling_names if outputs[name].get('function', False) == function]
+			installed = np.array([
+				[dwelling.attributes[name] == True for name in function_names]
+				for dwelling in dwellings
+			], dtype=bool).reshape(len(dwellings), len(function_names))
+			bitmasks = installed.astype(np.int64) @ (1 << np.arange(len(function_names), dtype=np.int64))
+
+			unique_bitmasks, inverse = np.unique(bitmasks, return_inverse=True)
+			codes = [
+				'_'.join(self.code_dict[name] for (bit, name) in enumerate(function_names) if bitmask & (1 << bit))
+				for bitmask in unique_bitmasks.tolist()
+			]
+			output_name = self.output_names[function]
+			for (dwelling, code_index) in zip(dwellings, inverse.ravel().tolist()):
+				dwelling.attributes[output_name] = codes[code_index]
+
+	# Installation that is assigned when sampling
+	# fails to assign an installation.
+	gas_installations = {
+		'space': 'gas_boiler_space',
+		'water': 'gas_boiler_water',
+		'cooking': 'gas_cooking'
+	}
+
+	# Water heating installations that are
+	# only possible with the space heating installation.
+	water_space_dependencies = {
+		'district_heating_water': 'district_heating_space',
+		'electric_heat_pump_water': 'electric_heat_pump_space',
+		'block_heating_water': 'block_heating_space'
+	}
+
+	output_names = {
+		'space': 'space_heating',
+		'water': 'water_heating',
+		'cooking': 'cooking'
+	}
+
 	outputs = {
 		'space_heating': {
 			'type': 'varchar'
@@ -63,9 +283,9 @@ class SamplingModule(BaseModule):
 		}
 	}
 
-	def sample(self, value, output_type, name):
+	def sample(self, value, output_type, name, dwelling=None, attempt=0):
 		if output_type == 'boolean':
-			return self.sample_boolean(value, name)
+			return self.sample_boolean(value, name, dwelling, attempt)
 		elif output_type == 'double precision':
 			return self.sample_double_precision(value, name)
 		elif output_type == 'numrange':
@@ -73,13 +293,16 @@ class SamplingModule(BaseModule):
 		else:
 			raise NotImplementedError(f'SamplingModule has no sample method for output_type {output_type} yet')
 
-	def sample_boolean(self, value, name):
+	def sample_boolean(self, value, name, dwelling=None, attempt=0):
 		if type(value) not in [float, int]:
 			raise ValueError(f"Expected type 'float' while sampling for boolean, but got: {type(value)}, for distribution: {name}")
 		if (value < 0) or (value > 1):
 			raise ValueError(f"Expected value between 0-1 while sampling for boolean, but got: {value}, for distribution: {name}")
 
-		cutoff = random.random()
+		if self.seed is None or dwelling is None:
+			cutoff = random.random()
+		else:
+			cutoff = get_uniforms(self.seed, [dwelling.attributes['vbo_id']], [name], attempt)[0, 0]
 		if value < cutoff:
 			return False
 		else:
@@ -89,7 +312,7 @@ class SamplingModule(BaseModule):
 		'''
 		Gets the mean from a ProbabilityDistribution.
 		'''
-		if type(value) is not ProbabilityDistribution:
+		if not isinstance(value, (ProbabilityDistribution, ArrayProbabilityDistribution)):
 			raise NotImplementedError(f'sample_double_precision() has not been implemented for type {type(value)}')
 		return value.mean
 
@@ -97,7 +320,7 @@ class SamplingModule(BaseModule):
 		'''
 		Gets the 95% interval from a ProbabilityDistribution.
 		'''
-		if type(value) is not ProbabilityDistribution:
+		if not isinstance(value, (ProbabilityDistribution, ArrayProbabilityDistribution)):
 			raise NotImplementedError(f'sample_numrange() has not been implemented for type {type(value)}')
 
 		interval = value.interval(0.95)
@@ -125,7 +348,7 @@ class SamplingModule(BaseModule):
 			tries = 0
 			# Sample until installation is assigned or assign gas after five failed attempts as it is the most common
 			while installations_amount == 0:
-				self.get_sampling_outputs_per_function(dwelling, function)
+				self.get_sampling_outputs_per_function(dwelling, function, attempt=tries + 1)
 				tries += 1
 				if tries >= 4:
 					if function == 'space':
@@ -137,23 +360,20 @@ class SamplingModule(BaseModule):
 					return
 				installations_amount = self.count_installations(dwelling, function)
 
-	def get_sampling_outputs_per_function(self, dwelling, function):
+	def get_sampling_outputs_per_function(self, dwelling, function, attempt=0):
 		'''
 		Sample probabilities per energy function.
 		'''
 		for name, options in dwelling.outputs.items():
 			if options.get('sampling', False) == True and options.get('function', False) == function:
 					distribution_value = dwelling.attributes[options['distribution']]
-					dwelling.attributes[name] = self.sample(distribution_value, options['type'], name)
+					dwelling.attributes[name] = self.sample(distribution_value, options['type'], name, dwelling, attempt)
 					self.check_water_space_dependency(dwelling, name)
 
 	def check_water_space_dependency(self, dwelling, name):
-		if name == 'district_heating_water' and dwelling.attributes['district_heating_space'] == False:
-			dwelling.attributes['district_heating_water'] = False
-		elif name == 'electric_heat_pump_water' and dwelling.attributes['electric_heat_pump_space'] == False:
-			dwelling.attributes['electric_heat_pump_water'] = False
-		elif name == 'block_heating_water' and dwelling.attributes['block_heating_space'] == False:
-			dwelling.attributes['block_heating_water'] = False
+		space_name = self.water_space_dependencies.get(name)
+		if space_name is not None and dwelling.attributes[space_name] == False:
+			dwelling.attributes[name] = False
 
 	def produce_output_code(self, dwelling):
 		'''
@@ -1,13 +1,25 @@
+from functools import partial
+import multiprocessing
+import multiprocessing.util
+import os
 import sys
 import time
 
 from psycopg2 import sql
 from psycopg2.extras import DictCursor
 
-from utils.database_utils import get_connection, make_primary_key
+from utils.database_utils import StatementStats, get_connection, make_primary_key, merge_statement_reports, track_statements
 from utils.create_results_table import main as create_results_table
+from utils.results_writer import ResultsWriter
+from utils.pipeline_progress import Checkpointer
+from utils.pc6_stats_create_table import main as create_pc6_stats_table
+from utils.insulation_table_create import main as create_insulation_table
+from utils.energy_label_index_create import main as create_energy_label_index
+from utils.profiling import Profiler
+from utils.record_replay import Recording, record_statements
+from utils.instrumentation import Instrumentation, format_summary, get_worker_report_path, merge_worker_reports
 
-from modules.classes import Dwelling, PlaceholderDwelling
+from modules.classes import Dwelling, DwellingFrame, PlaceholderDwelling
 
 from modules.base_bag_data_module import BaseBagDataModule
 
@@ -31,6 +43,7 @@ from modules.electric_cooking_module import ElectricCookingModule
 
 from modules.sampling_module import SamplingModule
 
+from modules.regional_tables import attach_regional_tables, release_shared_memory, share_regional_tables
 
 # Modules that will run on the Regions.
 RegionalModules = [
@@ -78,18 +91,135 @@ Modules = [
 	SamplingModule
 ]
 
-def get_regional_modules(connection):
-	return [RegionalModule(connection) for RegionalModule in RegionalModules]
-
-def get_modules(connection, regional_modules):
+# Selects all the dwellings in one buurt that have not
+# been processed yet.
+buurt_dwellings_query = '''
+	SELECT
+		vbo_id, pc6, oppervlakte, bouwjaar, woningtype, buurt_id
+	FROM
+		bag
+	WHERE
+		buurt_id = %s
+		AND
+		NOT EXISTS
+		(SELECT vbo_id
+		FROM results
+		WHERE results.vbo_id = bag.vbo_id
+		)
+'''
+
+# Selects all the buurten that have not been finished
+# yet, see utils/pipeline_progress.py. This is a lot
+# cheaper than checking every dwelling in the BAG
+# against 'results'.
+buurten_query = '''
+	SELECT
+		buurt_id
+	FROM
+		(SELECT DISTINCT buurt_id FROM bag) AS buurten
+	WHERE
+		NOT EXISTS
+		(SELECT buurt_id
+		FROM pipeline_progress
+		WHERE pipeline_progress.buurt_id = buurten.buurt_id
+		)
+	ORDER BY
+		buurt_id
+'''
+
+def get_regional_modules(connection, **kwargs):
+	return [RegionalModule(connection, **kwargs) for RegionalModule in RegionalModules]
+
+def get_modules(connection, regional_modules, **kwargs):
 	# Optional variables that only some modules require.
 	kwargs = {
+		**kwargs,
 		'regional_modules': regional_modules,
-		'pc6_dwelling_modules': [Module(connection) for Module in PC6DwellingModules],
-		'buurt_dwelling_modules': [Module(connection) for Module in BuurtDwellingModules]
+		'pc6_dwelling_modules': [Module(connection, **kwargs) for Module in PC6DwellingModules],
+		'buurt_dwelling_modules': [Module(connection, **kwargs) for Module in BuurtDwellingModules]
 	}
 	return [Module(connection, **kwargs) for Module in Modules]
 
+def check_module_kwargs(module_kwargs, batch):
+	'''
+	Raise a ValueError for options of the modules
+	that are not supported without batch mode.
+	'''
+	if module_kwargs.get('realizations', None) is not None and not batch:
+		# The SamplingModule only samples realizations (and
+		# inserts their counts) per batch, not per dwelling.
+		raise ValueError('realizations are only supported with batch=True')
+
+def prepare_modules(module_kwargs):
+	'''
+	Make sure the tables that the modules
+	need for their options are in place.
+	'''
+	if module_kwargs.get('pc6_stats', False):
+		print("\nChecking table 'pc6_stats'...")
+		create_pc6_stats_table()
+
+	if module_kwargs.get('insulation_table', False):
+		print("\nChecking insulation table...")
+		create_insulation_table(convolution_resolution=module_kwargs.get('convolution_resolution', None))
+
+	if module_kwargs.get('energy_label_index', False):
+		print("\nChecking energy label index...")
+		create_energy_label_index()
+
+# Seconds between the summaries of the
+# instrumentation (with --report).
+REPORT_INTERVAL = 60
+
+def instrument(instrumentation, connection, modules, regional_modules):
+	'''
+	Record the statements of 'connection' and time all
+	modules, including the modules that the RegionsModule
+	runs on the regions.
+	'''
+	instrumentation.instrument_connection(connection)
+	all_modules = modules + regional_modules
+	for module in modules:
+		if isinstance(module, RegionsModule):
+			all_modules += module.pc6_dwelling_modules + module.buurt_dwelling_modules
+	instrumented = set()
+	for module in all_modules:
+		if id(module) not in instrumented:
+			instrumentation.instrument_module(module)
+			instrumented.add(id(module))
+
+def create_dwelling(row, connection):
+	(vbo_id, pc6, oppervlakte, bouwjaar, woningtype, buurt_id) = row
+
+	attributes = {
+		'vbo_id': vbo_id,
+		'pc6': pc6,
+		'oppervlakte': oppervlakte,
+		'bouwjaar': bouwjaar,
+		'woningtype': woningtype,
+		'buurt_id': buurt_id
+	}
+
+	return Dwelling(attributes, connection)
+
+def process_dwelling(dwelling, modules, results_writer):
+	for module in modules:
+		module.process(dwelling)
+	dwelling.save(results_writer)
+
+def process_dwellings(dwellings, modules, results_writer):
+	'''
+	Process the dwellings module by module instead of
+	dwelling by dwelling, so modules can process them
+	as a batch (see BaseModule.process_batch).
+	'''
+	frame = DwellingFrame(dwellings)
+	for module in modules:
+		module.process_batch(frame)
+	frame.write_back()
+	for dwelling in dwellings:
+		dwelling.save(results_writer)
+
 def get_rowcount_estimate(table_name, connection):
 	# adapted from https://stackoverflow.com/a/2611745/7770056
 	rowcount_estimate_query = '''
@@ -106,38 +236,151 @@ def get_rowcount_estimate(table_name, connection):
 	cursor.close()
 	return result
 
-def pipeline(query, connection, fresh=False, N=None):
+def get_buurt_ids(connection):
+	cursor = connection.cursor()
+	cursor.execute(buurten_query)
+	buurt_ids = [buurt_id for (buurt_id,) in cursor.fetchall()]
+	cursor.close()
+	return buurt_ids
+
+def process_buurt(buurt_id, connection, modules, results_writer, limit=None, batch=False, profiler=None):
+	'''
+	Process the unprocessed dwellings in the buurt, but
+	no more than 'limit'. With 'batch', the dwellings of the
+	buurt are processed as a batch. With a 'profiler', the
+	dwellings (or batches) are processed through it. Returns
+	the number of processed dwellings and whether the buurt
+	has been finished.
+	'''
+	cursor = connection.cursor()
+	cursor.execute(buurt_dwellings_query, (buurt_id,))
+	rows = cursor.fetchall()
+	cursor.close()
+
+	finished = limit is None or len(rows) <= limit
+	if not finished:
+		rows = rows[:limit]
+
+	if batch:
+		dwellings = [create_dwelling(row, connection) for row in rows]
+		if profiler is not None:
+			profiler.profile(process_dwellings, dwellings, modules, results_writer)
+		else:
+			process_dwellings(dwellings, modules, results_writer)
+	else:
+		for row in rows:
+			dwelling = create_dwelling(row, connection)
+			if profiler is not None:
+				profiler.profile(process_dwelling, dwelling, modules, results_writer)
+			else:
+				process_dwelling(dwelling, modules, results_writer)
+
+	return len(rows), finished
+
+def process_buurten(buurt_ids, connection, modules, checkpointer, N=None, batch=False, profiler=None, progress=None):
+	'''
+	Process the buurten one after another, until N dwellings
+	have been processed (or all of them, with N = None), and
+	record the finished buurten with the checkpointer. After
+	every buurt, progress(n_buurten, n_dwellings) is called.
+	Returns the number of processed dwellings.
+	'''
+	n_dwellings = 0
+	for j, buurt_id in enumerate(buurt_ids):
+		limit = None if N is None else N - n_dwellings
+		n_processed, finished = process_buurt(buurt_id, connection, modules, checkpointer.results_writer, limit, batch, profiler)
+		n_dwellings += n_processed
+
+		# A buurt that was cut short by N is not recorded, so the
+		# next run continues with its remaining dwellings.
+		if finished:
+			checkpointer.buurt_finished(buurt_id, n_processed)
+
+		if progress is not None:
+			progress(j + 1, n_dwellings)
+
+		if n_dwellings == N:
+			break
+	return n_dwellings
+
+class ReportingOptions:
+	'''
+	Options to measure or record a run of the pipeline,
+	which don't change its results (see main()).
+	report_path: record the time and statements per module,
+	and save them there as JSON.
+	statement_report_path: record the latencies per statement,
+	and save them there as JSON. Statements that take longer
+	than explain_threshold seconds are explained.
+	profile_path: profile the run (or with profile_every = k,
+	every k-th dwelling) and save the profiles there. The
+	stacks are sampled every interval of wall time, or of CPU
+	time with profile_timer = 'cpu' (see utils/profiling.py).
+	record_path: record the statements and their results,
+	and save them there (see utils/record_replay.py).
+	'''
+
+	def __init__(self, report_path=None, statement_report_path=None, explain_threshold=None, profile_path=None, profile_every=1, profile_timer='real', record_path=None):
+		self.report_path = report_path
+		self.statement_report_path = statement_report_path
+		self.explain_threshold = explain_threshold
+		self.profile_path = profile_path
+		self.profile_every = profile_every
+		self.profile_timer = profile_timer
+		self.record_path = record_path
+
+def pipeline(connection, buurt_ids=None, fresh=False, N=None, flush_size=10000, commit_every=50000, commit_interval=300, module_kwargs=None, batch=False, reporting=None):
+	# set buurt_ids = None to process all unfinished buurten.
 	# set N = None to process full BAG.
 	# set fresh = True to delete previous results.
+	# flush_size: number of results to buffer before writing them.
+	# commit_every, commit_interval: commit (at the end of a buurt)
+	# after this many dwellings or seconds.
+	# module_kwargs: options for the modules, e.g. pc6_stats.
+	# set batch = True to process the dwellings of a buurt as a batch.
+	# reporting: ReportingOptions, e.g. to profile the run.
+	if module_kwargs is None:
+		module_kwargs = {}
+	if reporting is None:
+		reporting = ReportingOptions()
+	check_module_kwargs(module_kwargs, batch)
 
 	start_time = time.time()
 
 	print(f'fresh: {fresh} (if True, previous results will be deleted)')
 
-	# Also deletes existing `results' table
+	# Also deletes existing `results' and `pipeline_progress' tables
 	print("\nCreating table 'results'...")
 	create_results_table(fresh)
 
 	print("Adding primary key on vbo_id...")
 	make_primary_key('results', 'vbo_id')
 
+	prepare_modules(module_kwargs)
+
+	recording = None
+	if reporting.record_path is not None:
+		recording = Recording()
+		record_statements(connection, recording)
+
+	statement_stats = None
+	if reporting.statement_report_path is not None:
+		statement_stats = StatementStats(reporting.explain_threshold)
+		track_statements(connection, statement_stats)
+
 	print("\nInitiating modules...")
-	regional_modules = get_regional_modules(connection)
-	modules = get_modules(connection, regional_modules)
-
-	print("\nGetting dwellings...")
-	# We create a named server-side cursor:
-	# https://www.psycopg.org/docs/usage.html#server-side-cursors
-	# This keeps the memory usage down
-	# since it will only fetch about 2000 (see cursor.itersize)
-	# rows at a time into the Python memory.
-	# You don't need to close() this cursor afterwards (in fact
-	# the cursor disappears after a commit).
-	cursor = connection.cursor(name='pipeline-cursor')
-	cursor.execute(query)
-
-	# import pdb
-	# pdb.set_trace()
+	regional_modules = get_regional_modules(connection, **module_kwargs)
+	modules = get_modules(connection, regional_modules, **module_kwargs)
+
+	instrumentation = None
+	if reporting.report_path is not None:
+		instrumentation = Instrumentation()
+		instrument(instrumentation, connection, modules, regional_modules)
+	last_report_time = time.time()
+
+	if buurt_ids is None:
+		print("\nGetting buurten...")
+		buurt_ids = get_buurt_ids(connection)
 
 	bag_count = 7892928
 	results_count_estimate = get_rowcount_estimate('results', connection)
@@ -145,40 +388,210 @@ def pipeline(query, connection, fresh=False, N=None):
 	print(f'Batch statistics:')
 	print(f'   BAG entries: {bag_count}')
 	print(f'   estimate of current number of results (might be outdated): {results_count_estimate} ({results_count_estimate/bag_count*100:.2f}%)')
+	print(f'   buurten to process: {len(buurt_ids)}')
 	print(f'   this batch: {"no number specified" if N is None else N}')
 
 	print('\nStarting processing...')
 
-	i = 0
-	for (vbo_id, pc6, oppervlakte, bouwjaar, woningtype, buurt_id) in cursor:
+	results_writer = ResultsWriter(connection, flush_size=flush_size)
+	checkpointer = Checkpointer(connection, results_writer, commit_every, commit_interval)
 
-		attributes = {
-			'vbo_id': vbo_id,
-			'pc6': pc6,
-			'oppervlakte': oppervlakte,
-			'bouwjaar': bouwjaar,
-			'woningtype': woningtype,
-			'buurt_id': buurt_id
-		}
+	profiler = None
+	if reporting.profile_path is not None:
+		profiler = Profiler(every=reporting.profile_every, timer=reporting.profile_timer)
+		profiler.start()
 
-		dwelling = Dwelling(attributes, connection)
+	def print_progress(n_buurten, n_dwellings):
+		nonlocal last_report_time
+		print(f'   processed buurten: {n_buurten}/{len(buurt_ids)}, dwellings: {n_dwellings}, commits: {checkpointer.n_commits}', end='\r')
 
-		for module in modules:
-			module.process(dwelling)
-		dwelling.save()
+		if instrumentation is not None and time.time() - last_report_time >= REPORT_INTERVAL:
+			print('\n   slowest modules:')
+			for line in instrumentation.get_summary():
+				print(f'      {line}')
+			last_report_time = time.time()
 
-		i += 1
-		if i % 100 == 0:
-			print(f'   processed dwelling: {i}', end='\r')
+	i = process_buurten(buurt_ids, connection, modules, checkpointer, N, batch, profiler, progress=print_progress)
 
-		if i == N:
-			break
+	print("\n\nWriting remaining results...")
+	print("Commiting and closing...")
+	checkpointer.commit()
+	connection.close()
+
+	if profiler is not None:
+		profiler.stop()
+		pstats_path, collapsed_path = profiler.save(reporting.profile_path)
+		print(f'\nSaved the profile to {pstats_path} (view with `python -m pstats {pstats_path}`) and the sampled stacks to {collapsed_path} (for e.g. flamegraph.pl or speedscope).')
 
-	print("\n\nCommiting and closing...")
+	print(f'Processed {i:,} records in {(time.time() - start_time):.2f} seconds.')
+
+	print_region_cache_stats(modules)
+
+	if recording is not None:
+		recording.save(reporting.record_path)
+		print(f'\nSaved {len(recording):,} executions of {len(recording.statements):,} statements to {reporting.record_path}.')
+
+	if instrumentation is not None:
+		instrumentation.save_report(reporting.report_path)
+		print(f'\nSlowest modules (full report in {reporting.report_path}):')
+		for line in instrumentation.get_summary():
+			print(f'   {line}')
+
+	if statement_stats is not None:
+		statement_stats.save_report(reporting.statement_report_path)
+		print_statement_summary(statement_stats.get_report(), reporting.statement_report_path)
+
+def print_statement_summary(statement_report, statement_report_path, n=5):
+	print(f'\nStatements with the most time (full report in {statement_report_path}):')
+	for statement in statement_report[:n]:
+		text = ' '.join(statement['statement'].split())
+		print(f"   {statement['total_time']:.2f} s, {statement['count']:,} times, p95 {statement['p95_time'] * 1000:.1f} ms: {text[:100]}")
+
+def print_region_cache_stats(modules):
+	for module in modules:
+		if isinstance(module, RegionsModule):
+			for (region_type, stats) in module.get_cache_stats().items():
+				print(f"   {region_type} cache: {stats['hits']:,} hits, {stats['misses']:,} misses, {stats['evictions']:,} evictions, {stats['size']:,} regions left")
+
+# State of a worker process of the multi-process
+# pipeline, set by init_worker(). Every worker has its
+# own connection, modules (and thus region cache),
+# results writer and checkpointer.
+worker = {}
+
+def init_worker(flush_size, commit_every, commit_interval, module_kwargs, batch=False, shared_tables=None, reporting=None):
+	if reporting is None:
+		reporting = ReportingOptions()
+
+	# Use the regional tables that the main process
+	# put in shared memory, instead of loading them again.
+	if shared_tables is not None:
+		attach_regional_tables(shared_tables)
+
+	connection = get_connection()
+	if reporting.statement_report_path is not None:
+		statement_stats = StatementStats(reporting.explain_threshold)
+		track_statements(connection, statement_stats)
+		# With the samples, so the main process can
+		# compute the percentiles over all workers.
+		multiprocessing.util.Finalize(None, statement_stats.save_report, args=(get_worker_report_path(reporting.statement_report_path, os.getpid()), True), exitpriority=5)
+
+	regional_modules = get_regional_modules(connection, silent=True, **module_kwargs)
+	modules = get_modules(connection, regional_modules, silent=True, **module_kwargs)
+	# Initiating the modules makes sure the columns of
+	# 'results' exist, which locks the table: commit so
+	# the other workers are not blocked.
 	connection.commit()
+
+	results_writer = ResultsWriter(connection, flush_size=flush_size)
+	checkpointer = Checkpointer(connection, results_writer, commit_every, commit_interval)
+
+	worker['connection'] = connection
+	worker['modules'] = modules
+	worker['results_writer'] = results_writer
+	worker['checkpointer'] = checkpointer
+	worker['batch'] = batch
+
+	# The worker only commits every so many dwellings, so it
+	# has to commit the remainder when the pool shuts down.
+	multiprocessing.util.Finalize(None, checkpointer.commit, exitpriority=10)
+
+	if reporting.report_path is not None:
+		instrumentation = Instrumentation()
+		instrument(instrumentation, connection, modules, regional_modules)
+		# Saved after the final commit, the main
+		# process merges the reports of the workers.
+		multiprocessing.util.Finalize(None, instrumentation.save_report, args=(get_worker_report_path(reporting.report_path, os.getpid()),), exitpriority=5)
+
+def process_buurt_in_worker(buurt_id):
+	'''
+	Process all unprocessed dwellings in the buurt
+	within a worker process. Returns the number of
+	processed dwellings.
+	'''
+	n_processed, _ = process_buurt(buurt_id, worker['connection'], worker['modules'], worker['results_writer'], batch=worker['batch'])
+	worker['checkpointer'].buurt_finished(buurt_id, n_processed)
+	return n_processed
+
+def pipeline_parallel(connection, workers, fresh=False, flush_size=10000, commit_every=50000, commit_interval=300, module_kwargs=None, batch=False, reporting=None):
+	'''
+	Process the BAG with 'workers' processes. The
+	work is split by buurt: every buurt is handed in its
+	entirety to one of the workers, so the regional
+	statistics of a buurt are the same as when running
+	the pipeline in a single process.
+	'''
+	if module_kwargs is None:
+		module_kwargs = {}
+	if reporting is None:
+		reporting = ReportingOptions()
+	check_module_kwargs(module_kwargs, batch)
+
+	start_time = time.time()
+
+	print(f'fresh: {fresh} (if True, previous results will be deleted)')
+	print(f'workers: {workers}')
+
+	print("\nCreating table 'results'...")
+	create_results_table(fresh)
+
+	print("Adding primary key on vbo_id...")
+	make_primary_key('results', 'vbo_id')
+
+	prepare_modules(module_kwargs)
+
+	print("\nInitiating modules...")
+	# We initiate the modules once before starting the workers,
+	# so the columns in 'results' are created only once.
+	regional_modules = get_regional_modules(connection, **module_kwargs)
+	get_modules(connection, regional_modules, **module_kwargs)
+	connection.commit()
+
+	print("\nSharing regional tables with the workers...")
+	try:
+		shared_memory_blocks, shared_tables = share_regional_tables(connection, pc6_stats=module_kwargs.get('pc6_stats', False))
+	except OSError as e:
+		# E.g. when /dev/shm is too small: every
+		# worker then loads its own tables.
+		print(f'   could not put the tables in shared memory: {e}')
+		shared_memory_blocks, shared_tables = [], None
+
+	print("\nGetting buurten...")
+	buurt_ids = get_buurt_ids(connection)
+	# Every worker makes its own connection, we don't
+	# want to share this one with the forked processes.
 	connection.close()
 
-	print(f'Processed {i:,} records in {(time.time() - start_time):.2f} seconds.')
+	print(f'   buurten to process: {len(buurt_ids)}')
+
+	print('\nStarting processing...')
+
+	i = 0
+	try:
+		pool = multiprocessing.Pool(workers, initializer=partial(init_worker, flush_size=flush_size, commit_every=commit_every, commit_interval=commit_interval, module_kwargs=module_kwargs, batch=batch, shared_tables=shared_tables, reporting=reporting))
+		for j, n_processed in enumerate(pool.imap_unordered(process_buurt_in_worker, buurt_ids)):
+			i += n_processed
+			print(f'   processed buurten: {j + 1}/{len(buurt_ids)}, dwellings: {i}', end='\r')
+
+		print("\n\nCommiting and closing workers...")
+		# Don't use the pool as a context manager: it terminates
+		# the workers, which would skip their final commit.
+		pool.close()
+		pool.join()
+	finally:
+		release_shared_memory(shared_memory_blocks)
+
+	if reporting.report_path is not None:
+		report = merge_worker_reports(reporting.report_path)
+		print(f'\nSlowest modules, over all workers (full report in {reporting.report_path}):')
+		for line in format_summary(report):
+			print(f'   {line}')
+
+	if reporting.statement_report_path is not None:
+		statement_report = merge_worker_reports(reporting.statement_report_path, merge_statement_reports)
+		print_statement_summary(statement_report, reporting.statement_report_path)
+
+	print(f'\nProcessed {i:,} records in {(time.time() - start_time):.2f} seconds.')
 
 def main(*args):
 	'''
@@ -188,6 +601,60 @@ def main(*args):
 		same buurt as 'vbo_id'
 		--N {N}: limit pipeline to N dwellings (won't work
 		if --vbo_id also specified)
+		--flush_size {flush_size}: number of results to buffer
+		in memory before writing them with COPY (default: 10000)
+		--workers {workers}: process the buurten in parallel
+		with 'workers' processes (won't work if --vbo_id or
+		--N also specified)
+		--commit_every {commit_every}: commit after this many
+		dwellings, at the end of a buurt (default: 50000)
+		--commit_interval {commit_interval}: commit after this
+		many seconds, at the end of a buurt (default: 300)
+		--pc6_stats: take the statistics of the pc6s from the
+		table pc6_stats (rebuilt first if the source tables
+		have changed) instead of querying them per pc6
+		--convolution_resolution {resolution}: add up the
+		insulation distributions on a grid with this spacing
+		--insulation_table: take the insulation distributions
+		from the insulation table (rebuilt first if out of date)
+		--energy_label_index: look up the energy labels in the
+		energy label index (rebuilt first if energy_labels has
+		changed) instead of querying them
+		--region_cache_size {n}: keep at most n pc6s and n
+		buurten in memory (regions of which all dwellings have
+		been processed are always evicted)
+		--report {path}: record the time, SQL statements,
+		fetched rows and database time per module, print a
+		summary every minute and save them to 'path' as JSON
+		--statement_report {path}: record the number of
+		executions and the latencies of every SQL statement,
+		and save them to 'path' as JSON
+		--explain_threshold {ms}: with --statement_report, run
+		EXPLAIN (ANALYZE, BUFFERS) on the first execution of
+		a SELECT statement that takes longer than this
+		--profile {path}: profile the run with cProfile and a
+		sampling profiler, and save the profiles to
+		'{path}.pstats' and '{path}.collapsed' (use e.g. with
+		--N 50000, not supported with --workers)
+		--profile_every {k}: with --profile, only profile the
+		modules of every k-th dwelling (or buurt, with --batch)
+		--profile_timer {real|cpu}: with --profile, sample the
+		stacks every interval of wall time, including the time
+		waiting for the database (real, the default), or of
+		CPU time (cpu)
+		--record {path}: record every SQL statement with its
+		parameters and results, and save them to 'path' (a
+		gzipped JSON file) to replay them without a database,
+		see benchmarks/run_benchmarks.py --replay (use e.g.
+		with --N 1000, not supported with --workers)
+		--batch: process the dwellings of a buurt as a batch,
+		module by module, e.g. sampling them all at once
+		--seed {seed}: sample with random numbers that only
+		depend on the seed and the dwelling, so every run
+		with the same seed gives the same results
+		--realizations {K}: sample every dwelling K times, and
+		save the number of installations per realization, buurt
+		and pc6 in realization_counts (implies --batch)
 	'''
 
 	print("\n=== DUTCH DWELLINGS PIPELINE ===\n")
@@ -223,38 +690,12 @@ def main(*args):
 
 		print(f'   buurt_id: {buurt_id}')
 
-		query = '''
-			SELECT
-				vbo_id, pc6, oppervlakte, bouwjaar, woningtype, buurt_id
-			FROM
-				bag
-			WHERE
-				buurt_id = %s
-				AND
-				NOT EXISTS
-				(SELECT vbo_id
-				FROM results
-				WHERE results.vbo_id = bag.vbo_id
-				)
-		'''
-		query = cursor.mogrify(query, (buurt_id,))
+		buurt_ids = [buurt_id]
 		N = None
 
 	else:
-		query = '''
-			SELECT
-				vbo_id, pc6, oppervlakte, bouwjaar, woningtype, buurt_id
-			FROM
-				bag
-			WHERE
-				NOT EXISTS
-				(SELECT vbo_id
-				FROM results
-				WHERE results.vbo_id = bag.vbo_id
-				)
-			ORDER BY
-				buurt_id
-		'''
+		# All unfinished buurten
+		buurt_ids = None
 
 		if '--N' in args:
 			index = args.index('--N')
@@ -262,7 +703,112 @@ def main(*args):
 		else:
 			N = None
 
-	pipeline(query, connection, fresh, N)
+	if '--flush_size' in args:
+		index = args.index('--flush_size')
+		flush_size = int(args[index + 1])
+	else:
+		flush_size = 10000
+
+	if '--commit_every' in args:
+		index = args.index('--commit_every')
+		commit_every = int(args[index + 1])
+	else:
+		commit_every = 50000
+
+	if '--commit_interval' in args:
+		index = args.index('--commit_interval')
+		commit_interval = float(args[index + 1])
+	else:
+		commit_interval = 300
+
+	module_kwargs = {}
+	if '--pc6_stats' in args:
+		module_kwargs['pc6_stats'] = True
+
+	if '--convolution_resolution' in args:
+		index = args.index('--convolution_resolution')
+		module_kwargs['convolution_resolution'] = float(args[index + 1])
+
+	if '--insulation_table' in args:
+		module_kwargs['insulation_table'] = True
+
+	if '--energy_label_index' in args:
+		module_kwargs['energy_label_index'] = True
+
+	if '--region_cache_size' in args:
+		index = args.index('--region_cache_size')
+		module_kwargs['region_cache_size'] = int(args[index + 1])
+
+	if '--seed' in args:
+		index = args.index('--seed')
+		module_kwargs['seed'] = int(args[index + 1])
+
+	batch = '--batch' in args
+
+	report_path = None
+	if '--report' in args:
+		index = args.index('--report')
+		report_path = args[index + 1]
+
+	statement_report_path = None
+	if '--statement_report' in args:
+		index = args.index('--statement_report')
+		statement_report_path = args[index + 1]
+
+	explain_threshold = None
+	if '--explain_threshold' in args:
+		index = args.index('--explain_threshold')
+		explain_threshold = float(args[index + 1]) / 1000
+
+	profile_path = None
+	if '--profile' in args:
+		index = args.index('--profile')
+		profile_path = args[index + 1]
+
+	profile_every = 1
+	if '--profile_every' in args:
+		index = args.index('--profile_every')
+		profile_every = int(args[index + 1])
+
+	profile_timer = 'real'
+	if '--profile_timer' in args:
+		index = args.index('--profile_timer')
+		profile_timer = args[index + 1]
+
+	if '--realizations' in args:
+		index = args.index('--realizations')
+		module_kwargs['realizations'] = int(args[index + 1])
+		batch = True
+
+	record_path = None
+	if '--record' in args:
+		index = args.index('--record')
+		record_path = args[index + 1]
+
+	reporting = ReportingOptions(
+		report_path=report_path,
+		statement_report_path=statement_report_path,
+		explain_threshold=explain_threshold,
+		profile_path=profile_path,
+		profile_every=profile_every,
+		profile_timer=profile_timer,
+		record_path=record_path
+	)
+
+	if '--workers' in args and profile_path is not None:
+		print('--profile is not supported in combination with --workers, processing in a single process.')
+
+	if '--workers' in args and record_path is not None:
+		print('--record is not supported in combination with --workers, processing in a single process.')
+
+	if '--workers' in args and '--vbo_id' not in args and profile_path is None and record_path is None:
+		index = args.index('--workers')
+		workers = int(args[index + 1])
+		if N is not None:
+			print('--N is not supported in combination with --workers, processing all buurten.')
+		pipeline_parallel(connection, workers, fresh=fresh, flush_size=flush_size, commit_every=commit_every, commit_interval=commit_interval, module_kwargs=module_kwargs, batch=batch, reporting=reporting)
+	else:
+		pipeline(connection, buurt_ids=buurt_ids, fresh=fresh, N=N, flush_size=flush_size, commit_every=commit_every, commit_interval=commit_interval, module_kwargs=module_kwargs, batch=batch, reporting=reporting)
 
 if __name__ == "__main__":
 	main()
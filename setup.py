@@ -28,6 +28,10 @@ from utils.elec_consumption_hh_load import main as load_elec_consumption_househo
 
 from utils.WoON_load import main as load_WoON
 
+from utils.pc6_stats_create_table import main as create_pc6_stats_table
+from utils.insulation_table_create import main as create_insulation_table
+from utils.energy_label_index_create import main as create_energy_label_index
+
 def bag():
 	print('Creating table for BAG...')
 	create_BAG_table()
@@ -66,6 +70,18 @@ def CBS_kerncijfers():
 	print('Creating indexes...')
 	add_index('cbs_pc6_2017_kerncijfers', 'pc6')
 
+def pc6_stats():
+	print('Creating table with statistics per pc6...')
+	create_pc6_stats_table()
+
+def insulation_table():
+	print('Creating table with insulation distributions...')
+	create_insulation_table()
+
+def energy_label_index():
+	print('Creating index of the energy labels...')
+	create_energy_label_index()
+
 def create_types():
 	print('Adding new Postgres types...')
 
@@ -239,6 +255,15 @@ def main():
 	print('\n====== WoON ======')
 	load_WoON()
 
+	print('\n====== PC6 statistics ======')
+	pc6_stats()
+
+	print('\n====== Insulation table ======')
+	insulation_table()
+
+	print('\n====== Energy label index ======')
+	energy_label_index()
+
 	print('\nFinished with the setup.')
 
 if __name__ == "__main__":
@@ -5,14 +5,19 @@ import unittest
 # Necessary to import modules from parent folder
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.database_utils import get_connection
-from modules.gas_space_heating_module import GasSpaceHeatingModule
+from benchmarks.synthetic_data import SyntheticDataset
+from benchmarks.stand_in import StandInConnection
+from benchmarks.run_benchmarks import print_report, run_benchmark
 
+# Not part of the test suite (the file name does not start
+# with 'test'), run with `python -m unittest tests.performance`.
+# For other sizes and options, or a local Postgres database,
+# use benchmarks/run_benchmarks.py.
 
 class TestPerformance(unittest.TestCase):
 
-	def test_gas_boiler_module_performance(self):
-		print('init')
-		connection = get_connection()
-		gas_boiler_module = GasBoilerModule(connection)
-		print('done')
+	def test_pipeline_performance(self):
+		connection = StandInConnection(SyntheticDataset(100000))
+		report = run_benchmark(connection, N=10000)
+		print_report(report)
+		self.assertEqual(report['pipeline']['dwellings'], 10000)
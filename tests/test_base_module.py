@@ -47,3 +47,16 @@ class TestBaseModule(unittest.TestCase):
 		self.children_module.process(self.dwelling)
 		self.assertEqual(self.dwelling.processed_by, ['ChildrenModule'])
 		self.assertNotIn('child_attribute', self.dwelling.attributes)
+
+	def test_gets_percentile_ranks(self):
+		values = {'a': 0.3, 'b': 0.1, 'c': 0.2, 'd': 0.4}
+		percentile_ranks = self.base_module.get_percentile_ranks(values)
+		self.assertEqual(percentile_ranks, {'a': 0.75, 'b': 0.25, 'c': 0.5, 'd': 1.0})
+
+	def test_ranks_equal_values_in_order(self):
+		values = {'a': 0, 'b': 0.5, 'c': 0, 'd': 0}
+		percentile_ranks = self.base_module.get_percentile_ranks(values)
+		# Same as sorting the items with a stable sort
+		sorted_keys = [key for (key, value) in sorted(values.items(), key=lambda item: item[1])]
+		expected = {key: (index + 1) / len(values) for (index, key) in enumerate(sorted_keys)}
+		self.assertEqual(percentile_ranks, expected)
@@ -0,0 +1,44 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+from scipy.interpolate import interp1d
+
+# Necessary to import modules from parent folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.benchmark_utils import BenchmarkTable
+
+class TestBenchmarkTable(unittest.TestCase):
+
+	def setUp(self):
+		self.knots = {
+			('A', 'Tussenwoning'): [8.0, 10.0, 12.0, 15.0, 20.0],
+			('B', 'Tussenwoning'): [9.0, 11.0, 14.0, 16.0, 25.0],
+			('B', 'Appartement'): [5.0, 6.0, 7.0, 9.0, 12.0],
+		}
+		rows = [(*key, value) for (key, values) in self.knots.items() for value in values]
+		# Incomplete benchmark
+		rows += [('A', 'Appartement', 4.0), ('A', 'Appartement', None)]
+		self.benchmark = BenchmarkTable(rows)
+
+	def test_only_complete_benchmarks_are_available(self):
+		self.assertEqual(len(self.benchmark), 3)
+
+	def test_equals_interp1d_with_extrapolation(self):
+		characteristics_tuples = [key for key in self.knots for _ in range(6)]
+		values = np.array([2.0, 8.0, 9.5, 13.0, 20.0, 30.0] * len(self.knots))
+		percentiles, has_benchmark = self.benchmark.compare(characteristics_tuples, values)
+
+		self.assertTrue(has_benchmark.all())
+		for (characteristics_tuple, value, percentile) in zip(characteristics_tuples, values, percentiles):
+			benchmark = interp1d(self.knots[characteristics_tuple], [5, 25, 50, 75, 95], fill_value='extrapolate')
+			self.assertAlmostEqual(percentile, float(benchmark(value)))
+
+	def test_has_no_benchmark_for_unknown_or_incomplete_characteristics(self):
+		characteristics_tuples = [('A', 'Appartement'), ('C', 'Tussenwoning'), ('A', 'Tussenwoning')]
+		percentiles, has_benchmark = self.benchmark.compare(characteristics_tuples, [10.0, 10.0, 10.0])
+		self.assertEqual(has_benchmark.tolist(), [False, False, True])
+		self.assertTrue(np.isnan(percentiles[:2]).all())
+		self.assertAlmostEqual(percentiles[2], 25)
@@ -0,0 +1,87 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# Necessary to import modules from parent folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_data import SyntheticDataset
+from benchmarks.stand_in import StandInConnection
+from benchmarks.run_benchmarks import run_benchmark
+
+class TestSyntheticDataset(unittest.TestCase):
+
+	def setUp(self):
+		self.dataset = SyntheticDataset(5000, seed=1)
+
+	def test_regions_cover_all_dwellings(self):
+		self.assertEqual(self.dataset.buurt_offsets[-1], 5000)
+		self.assertEqual(self.dataset.pc6_offsets[-1], 5000)
+		self.assertTrue((np.diff(self.dataset.buurt_offsets) > 0).all())
+		self.assertTrue((np.diff(self.dataset.pc6_offsets) > 0).all())
+		self.assertEqual(len(self.dataset.get_bag_rows()), 5000)
+
+	def test_is_the_same_for_the_same_seed(self):
+		dataset = SyntheticDataset(5000, seed=1)
+		self.assertEqual(dataset.get_bag_rows(), self.dataset.get_bag_rows())
+		self.assertEqual(dataset.get_energy_label_rows(), self.dataset.get_energy_label_rows())
+
+	def test_codes_are_sorted(self):
+		# The stand-in and the regional tables rely on it.
+		for codes in [self.dataset.vbo_ids, self.dataset.pc6s, self.dataset.buurt_ids]:
+			self.assertTrue((codes[1:] > codes[:-1]).all())
+
+class TestStandInConnection(unittest.TestCase):
+
+	def setUp(self):
+		self.dataset = SyntheticDataset(2000, seed=2)
+		self.connection = StandInConnection(self.dataset)
+
+	def execute(self, query, parameters=None):
+		cursor = self.connection.cursor()
+		cursor.execute(query, parameters)
+		rows = cursor.fetchall()
+		cursor.close()
+		return rows
+
+	def test_pc6_stats_match_the_queries_per_pc6(self):
+		(pc6, number_of_dwellings, total_floor_space, avg_gas_use, avg_elec_use, household_size, energy_label_epi_log_avg) = self.connection.get_pc6_stats(None)[3]
+
+		self.assertEqual(self.execute('SELECT COUNT(vbo_id) FROM bag WHERE pc6 = %s', (pc6,)), [(number_of_dwellings,)])
+		self.assertEqual(self.execute('SELECT SUM(oppervlakte) FROM bag WHERE oppervlakte IS NOT NULL AND pc6 = %s', (pc6,)), [(total_floor_space,)])
+		self.assertEqual(len(self.execute('SELECT vbo_id FROM bag WHERE pc6 = %s', (pc6,))), number_of_dwellings)
+		[(epi_log_avg,)] = self.execute('SELECT AVG(LN(epi_imputed)) FROM energy_labels WHERE pc6 = %s AND epi_imputed > 0', (pc6,))
+		if energy_label_epi_log_avg is None:
+			self.assertIsNone(epi_log_avg)
+		else:
+			self.assertAlmostEqual(epi_log_avg, energy_label_epi_log_avg)
+
+	def test_gets_the_first_energy_label_with_an_epi(self):
+		(vbo_id, _, energy_label_class, epi) = next(row for row in self.dataset.get_energy_label_rows() if row[3] is not None)
+		rows = self.execute('SELECT energieklasse, epi_imputed FROM energy_labels WHERE energieklasse IS NOT null AND epi_imputed > 0 AND vbo_id = %s', (vbo_id,))
+		self.assertEqual(rows, [(energy_label_class, epi)])
+
+	def test_counts_statements(self):
+		self.execute('SELECT COUNT(vbo_id) FROM bag')
+		self.execute('''
+			SELECT COUNT(vbo_id)
+			FROM bag''')
+		self.assertEqual(self.connection.statement_counts['SELECT COUNT(vbo_id) FROM bag'], 2)
+
+	def test_raises_on_unknown_statement(self):
+		with self.assertRaises(NotImplementedError):
+			self.execute('SELECT geometry FROM bag')
+
+class TestRunBenchmark(unittest.TestCase):
+
+	def test_processes_dwellings_with_all_modules(self):
+		connection = StandInConnection(SyntheticDataset(1000, seed=3))
+		report = run_benchmark(connection, N=200, batch=True)
+
+		self.assertEqual(report['pipeline']['dwellings'], 200)
+		self.assertEqual(report['pipeline']['written_results'], 200)
+		self.assertEqual(connection.n_copied_rows, 200)
+		self.assertGreater(report['pipeline']['statements_per_dwelling'], 0)
+		self.assertIn('SamplingModule', report['modules'])
@@ -0,0 +1,143 @@
+import os
+import sys
+import unittest
+from unittest.mock import Mock, patch
+
+# Necessary to import modules from parent folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.base_module import BaseModule, BaseRegionalModule
+from modules.classes import PC6, Dwelling
+from utils.database_utils import StatementObserver, StatementStats, get_observed_cursor_class, is_explainable, merge_statement_reports, observe_statements
+
+from tests.utils import get_mock_connection
+
+class FakeCursor:
+
+	def __init__(self):
+		self.connection = Mock()
+
+	def execute(self, query, vars=None):
+		pass
+
+class FailingCursor(FakeCursor):
+
+	def execute(self, query, vars=None):
+		raise ValueError('current transaction is aborted')
+
+class QueryingModule(BaseModule):
+
+	def __init__(self, connection, cursor, **kwargs):
+		super().__init__(connection, **kwargs)
+		self.cursor = cursor
+
+	def process(self, dwelling):
+		if super().process(dwelling):
+			self.cursor.execute('SELECT * FROM bag WHERE vbo_id = %s', (dwelling.attributes['vbo_id'],))
+
+class QueryingRegionalModule(BaseRegionalModule):
+
+	def __init__(self, connection, cursor, **kwargs):
+		super().__init__(connection, **kwargs)
+		self.cursor = cursor
+
+	def process_pc6(self, pc6):
+		self.cursor.execute('SELECT AVG(epi_imputed) FROM energy_labels WHERE pc6 = %s', (pc6.attributes['pc6'],))
+
+	supports = ['pc6']
+
+class TestStatementStats(unittest.TestCase):
+
+	def setUp(self):
+		self.statement_stats = StatementStats(sample_size=10)
+		self.cursor = get_observed_cursor_class([self.statement_stats], base=FakeCursor)()
+
+	def test_groups_statements_without_parameters(self):
+		module = QueryingModule(get_mock_connection(), self.cursor, silent=True)
+		for i in range(3):
+			module.process(Dwelling({'vbo_id': f'000301000000000{i}'}, None))
+		self.cursor.execute('SELECT 1')
+
+		report = self.statement_stats.get_report()
+		self.assertEqual(len(report), 2)
+		statement = [s for s in report if s['statement'].startswith('SELECT * FROM bag')][0]
+		self.assertEqual(statement['count'], 3)
+		self.assertEqual(statement['modules'], {'QueryingModule': 3})
+		self.assertLessEqual(statement['p95_time'], statement['max_time'])
+		other_statement = [s for s in report if s['statement'] == 'SELECT 1'][0]
+		self.assertEqual(other_statement['modules'], {'None': 1})
+
+	def test_attributes_statements_of_regional_modules_to_them(self):
+		module = QueryingRegionalModule(None, self.cursor, silent=True)
+		# The query of the placeholders is made on another cursor.
+		connection = get_mock_connection({('SELECT vbo_id FROM bag WHERE pc6 = %s', ('1000AA',)): []})
+		PC6('1000AA', connection, pc6_modules=[module])
+
+		(statement,) = self.statement_stats.get_report()
+		self.assertEqual(statement['modules'], {'QueryingRegionalModule': 1})
+
+	def test_keeps_a_bounded_sample(self):
+		for i in range(100):
+			self.statement_stats.record(self.cursor, 'SELECT 1', None, i / 1000)
+		(statement,) = self.statement_stats.get_report(include_samples=True)
+		self.assertEqual(statement['count'], 100)
+		self.assertEqual(len(statement['samples']), 10)
+		self.assertAlmostEqual(statement['max_time'], 0.099)
+
+	def test_explains_slow_select_statements_once(self):
+		statement_stats = StatementStats(explain_threshold=0.5)
+		with patch('utils.database_utils.explain', return_value='Seq Scan on bag') as explain_mock:
+			statement_stats.record(self.cursor, 'SELECT * FROM bag', None, 0.1)
+			statement_stats.record(self.cursor, 'SELECT * FROM bag', None, 1)
+			statement_stats.record(self.cursor, 'SELECT * FROM bag', None, 2)
+			statement_stats.record(self.cursor, 'DELETE FROM bag', None, 2)
+		self.assertEqual(explain_mock.call_count, 1)
+		report = {s['statement']: s for s in statement_stats.get_report()}
+		self.assertEqual(report['SELECT * FROM bag']['explain'], 'Seq Scan on bag')
+		self.assertIsNone(report['DELETE FROM bag']['explain'])
+
+	def test_does_not_record_or_explain_failing_statements(self):
+		statement_stats = StatementStats(explain_threshold=0)
+		cursor = get_observed_cursor_class([statement_stats], base=FailingCursor)()
+		with patch('utils.database_utils.explain') as explain_mock:
+			self.assertRaises(ValueError, cursor.execute, 'SELECT * FROM bag')
+		explain_mock.assert_not_called()
+		self.assertEqual(statement_stats.get_report(), [])
+
+	def test_is_explainable(self):
+		self.assertTrue(is_explainable('\n\tSELECT vbo_id FROM bag'))
+		self.assertFalse(is_explainable('INSERT INTO results VALUES (1)'))
+
+	def test_merges_reports(self):
+		for duration in [0.1, 0.2]:
+			self.statement_stats.record(self.cursor, 'SELECT 1', None, duration)
+		report = self.statement_stats.get_report(include_samples=True)
+		(merged,) = merge_statement_reports([report, report])
+		self.assertEqual(merged['count'], 4)
+		self.assertAlmostEqual(merged['total_time'], 0.6)
+		self.assertEqual(merged['modules'], {'None': 4})
+		self.assertNotIn('samples', merged)
+
+class CountingObserver(StatementObserver):
+
+	def __init__(self):
+		self.n_statements = 0
+
+	def executed(self, cursor, query, vars, duration):
+		self.n_statements += 1
+
+class TestObserveStatements(unittest.TestCase):
+
+	def test_observers_share_one_cursor_class(self):
+		connection = Mock(cursor_factory=FakeCursor)
+		(observer_1, observer_2) = (CountingObserver(), CountingObserver())
+		observe_statements(connection, observer_1)
+		cursor_factory = connection.cursor_factory
+		observe_statements(connection, observer_2)
+
+		self.assertEqual(connection.cursor_factory.__mro__[2:], FakeCursor.__mro__)
+		connection.cursor_factory().execute('SELECT 1')
+		self.assertEqual((observer_1.n_statements, observer_2.n_statements), (1, 1))
+		# The cursor class from before observer_2 is unchanged.
+		cursor_factory().execute('SELECT 1')
+		self.assertEqual((observer_1.n_statements, observer_2.n_statements), (2, 1))
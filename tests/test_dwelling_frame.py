@@ -0,0 +1,121 @@
+import os
+import random
+import sys
+import unittest
+from unittest.mock import Mock
+
+# Necessary to import modules from parent folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.classes import Dwelling, DwellingFrame
+from modules.base_module import BaseModule
+from modules.district_space_heating_module import DistrictSpaceHeatingModule
+from modules.gas_space_heating_module import GasSpaceHeatingModule
+from modules.electric_space_heating_module import ElectricSpaceHeatingModule
+from modules.district_water_heating_module import DistrictWaterHeatingModule
+from modules.gas_water_heating_module import GasWaterHeatingModule
+from modules.electric_water_heating_module import ElectricWaterHeatingModule
+from modules.gas_cooking_module import GasCookingModule
+from modules.electric_cooking_module import ElectricCookingModule
+
+from tests.utils import get_mock_connection
+
+class ExampleModule(BaseModule):
+
+	def process(self, dwelling):
+		if super().process(dwelling):
+			dwelling.attributes['example_p'] = dwelling.attributes['a'] / 2
+
+	outputs = {
+		'example_p': {
+			'type': 'double precision'
+		}
+	}
+
+class TestDwellingFrame(unittest.TestCase):
+
+	def setUp(self):
+		self.connection = get_mock_connection(strict=False)
+		self.dwellings = [Dwelling({'a': i, 'label': 'A'}, self.connection) for i in range(3)]
+		self.frame = DwellingFrame(self.dwellings)
+
+	def test_gets_columns(self):
+		self.assertEqual(self.frame['a'].tolist(), [0, 1, 2])
+		self.assertEqual(self.frame.get_column('label', dtype=object).tolist(), ['A', 'A', 'A'])
+
+	def test_writes_back_columns(self):
+		self.frame['b'] = self.frame['a'] * 2
+		self.frame['c'] = 1
+		self.assertNotIn('b', self.dwellings[1].attributes)
+		self.frame.write_back()
+		self.assertEqual(self.dwellings[1].attributes['b'], 2)
+		self.assertEqual(self.dwellings[1].attributes['c'], 1)
+
+	def test_falls_back_to_process(self):
+		module = ExampleModule(self.connection, silent=True)
+		module.process_batch(self.frame)
+		self.assertEqual(self.dwellings[1].attributes['example_p'], 0.5)
+		self.assertIn('example_p', self.dwellings[1].outputs)
+		self.assertIn('ExampleModule', self.dwellings[1].processed_by)
+
+	def test_does_not_start_processing_twice(self):
+		module = ExampleModule(self.connection, silent=True)
+		self.assertTrue(self.frame.start_processing(module))
+		self.assertFalse(self.frame.start_processing(module))
+
+class TestProcessBatch(unittest.TestCase):
+
+	def setUp(self):
+		query_dict = {
+			'SELECT COUNT(vbo_id) FROM bag': [(100,)],
+			"SELECT COUNT(energieklasse) FROM energy_labels WHERE energieklasse >= 'C'": [(50,)]
+		}
+		self.connection = get_mock_connection(query_dict, strict=False)
+		self.modules = [
+			DistrictSpaceHeatingModule(self.connection, silent=True),
+			GasSpaceHeatingModule(self.connection, silent=True),
+			ElectricSpaceHeatingModule(self.connection, silent=True),
+			DistrictWaterHeatingModule(self.connection, silent=True),
+			GasWaterHeatingModule(self.connection, silent=True),
+			ElectricWaterHeatingModule(self.connection, silent=True),
+			GasCookingModule(self.connection, silent=True),
+			ElectricCookingModule(self.connection, silent=True)
+		]
+
+	def get_dwellings(self, seed):
+		rng = random.Random(seed)
+		buurt_shares = ['district_high_gas_share', 'district_low_gas_share', 'district_no_gas_share', 'gas_boiler_heating_share', 'gas_block_heating_share', 'elec_high_gas_share', 'elec_low_gas_share', 'elec_no_gas_share']
+		buurt = Mock()
+		buurt.attributes = {share: rng.random() / 8 for share in buurt_shares}
+
+		dwellings = []
+		for i in range(20):
+			dwelling = Dwelling({
+				'energy_label_class': rng.choice(['A++', 'B', 'D', 'G', None]),
+				'gas_use_percentile_national': rng.random(),
+				'gas_use_percentile_neighbourhood': rng.random(),
+				'elec_use_percentile_national': rng.random(),
+				'elec_use_percentile_neighbourhood': rng.random()
+			}, self.connection)
+			dwelling.regions['buurt'] = buurt
+			dwellings.append(dwelling)
+		return dwellings
+
+	def test_matches_process(self):
+		dwellings = self.get_dwellings(seed=1)
+		for dwelling in dwellings:
+			for module in self.modules:
+				module.process(dwelling)
+
+		batch_dwellings = self.get_dwellings(seed=1)
+		frame = DwellingFrame(batch_dwellings)
+		for module in self.modules:
+			module.process_batch(frame)
+		frame.write_back()
+
+		for (dwelling, batch_dwelling) in zip(dwellings, batch_dwellings):
+			self.assertEqual(dwelling.attributes.keys(), batch_dwelling.attributes.keys())
+			for (name, value) in dwelling.attributes.items():
+				self.assertAlmostEqual(batch_dwelling.attributes[name], value, msg=name)
+			self.assertEqual(dwelling.outputs, batch_dwelling.outputs)
+			self.assertEqual(dwelling.processed_by, batch_dwelling.processed_by)
@@ -0,0 +1,74 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Necessary to import modules from parent folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.classes import Dwelling, DwellingFrame
+from modules.energy_label_module import EnergyLabelModule
+from utils.energy_label_index import EnergyLabelIndex, build_energy_label_index, load_energy_label_index
+
+from tests.utils import get_mock_connection
+
+class TestEnergyLabelIndex(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		cls.directory = tempfile.TemporaryDirectory()
+		cls.path = cls.directory.name
+		rows = [
+			('0003010000000003', 'C', 1.5),
+			('0003010000000001', 'A', 0.7),
+			('0003010000000002', 'A+++++', 0.1),
+			# Second label of the same dwelling
+			('0003010000000001', 'B', 1.2),
+			(None, 'A', 0.7)
+		]
+		build_energy_label_index(rows, cls.path, signature='signature')
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.directory.cleanup()
+
+	def setUp(self):
+		self.energy_label_index = EnergyLabelIndex(self.path)
+
+	def test_gets_energy_labels(self):
+		self.assertEqual(len(self.energy_label_index), 3)
+		self.assertEqual(self.energy_label_index.get_energy_label('0003010000000001'), ('A', 0.7))
+		self.assertEqual(self.energy_label_index.get_energy_label('0003010000000002'), ('A+++++', 0.1))
+		self.assertEqual(self.energy_label_index.get_energy_label('0003010000000003'), ('C', 1.5))
+
+	def test_no_label(self):
+		self.assertEqual(self.energy_label_index.get_energy_label('0003010000000000'), (None, None))
+		self.assertEqual(self.energy_label_index.get_energy_label('0003010000000004'), (None, None))
+		self.assertEqual(self.energy_label_index.get_energy_labels(['9999999999999999', '0003010000000003']), [(None, None), ('C', 1.5)])
+
+	def test_checks_signature(self):
+		self.assertIsNotNone(load_energy_label_index('signature', self.path))
+		self.assertIsNone(load_energy_label_index('other signature', self.path))
+		self.assertIsNone(load_energy_label_index('signature', os.path.join(self.path, 'missing')))
+
+	def test_energy_label_module_uses_index(self):
+		# Without queries in the mock connection,
+		# the labels can only come from the index.
+		connection = get_mock_connection()
+		with patch('modules.energy_label_module.load_energy_label_index', return_value=self.energy_label_index):
+			energy_label_module = EnergyLabelModule(connection, silent=True, energy_label_index=True)
+
+		dwelling = Dwelling({'vbo_id': '0003010000000001'}, connection)
+		energy_label_module.process(dwelling)
+		self.assertEqual(dwelling.attributes['energy_label_class'], 'A')
+		self.assertEqual(dwelling.attributes['energy_label_epi'], 0.7)
+
+		dwellings = [Dwelling({'vbo_id': vbo_id}, connection) for vbo_id in ['0003010000000002', '0003010000000004']]
+		frame = DwellingFrame(dwellings)
+		energy_label_module.process_batch(frame)
+		frame.write_back()
+		self.assertEqual(dwellings[0].attributes['energy_label_class'], 'A+++++')
+		self.assertEqual(dwellings[0].attributes['energy_label_epi'], 0.1)
+		self.assertEqual(dwellings[1].attributes['energy_label_class'], None)
+		self.assertEqual(dwellings[1].attributes['energy_label_epi'], None)
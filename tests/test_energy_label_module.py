@@ -5,21 +5,24 @@ import unittest
 from unittest.mock import patch
 
 import numpy as np
+from psycopg2 import sql
 
 # Necessary to import modules from parent folder
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from tests.utils import get_mock_connection
 
-from modules.classes import Dwelling, PC6, Buurt
-from modules.energy_label_module import EnergyLabelModule, EnergyLabelPredictionModule, EnergyLabelRegionalModule
+from modules.classes import Dwelling, DwellingFrame, PC6, Buurt
+from modules.energy_label_module import EnergyLabelModule, EnergyLabelPredictionModule, EnergyLabelRegionalModule, region_energy_labels_query
 
 class TestEnergyLabelModule(unittest.TestCase):
 
 	def setUp(self):
 		query_dict = {
 			('SELECT energieklasse, epi_imputed FROM energy_labels WHERE energieklasse IS NOT null AND epi_imputed > 0 AND vbo_id = %s', ('0003010000000001',)): [('A', 0.7)],
-			('SELECT energieklasse, epi_imputed FROM energy_labels WHERE energieklasse IS NOT null AND epi_imputed > 0 AND vbo_id = %s', ('0003010000000002',)): []
+			('SELECT energieklasse, epi_imputed FROM energy_labels WHERE energieklasse IS NOT null AND epi_imputed > 0 AND vbo_id = %s', ('0003010000000002',)): [],
+			('SELECT vbo_id FROM bag WHERE buurt_id = %s', ('BU0000000',)): [('0003010000000001',), ('0003010000000002',)],
+			(str(region_energy_labels_query.format(region_key=sql.Identifier('buurt_id'))), ('BU0000000',)): [('0003010000000001', 'A', 0.7)]
 		}
 		self.connection = get_mock_connection(query_dict)
 		self.energy_label_module = EnergyLabelModule(self.connection, silent=True)
@@ -36,6 +39,15 @@ class TestEnergyLabelModule(unittest.TestCase):
 		self.assertEqual(dwelling.attributes['energy_label_class'], None)
 		self.assertEqual(dwelling.attributes['energy_label_epi'], None)
 
+	def test_gets_energy_labels_of_region_at_once(self):
+		buurt = Buurt('BU0000000', self.connection, buurt_dwelling_modules=[self.energy_label_module])
+		(dwelling_1, dwelling_2) = buurt.dwellings
+		self.assertEqual(dwelling_1.attributes['energy_label_class'], 'A')
+		self.assertEqual(dwelling_1.attributes['energy_label_epi'], 0.7)
+		self.assertEqual(dwelling_2.attributes['energy_label_class'], None)
+		self.assertEqual(dwelling_2.attributes['energy_label_epi'], None)
+		self.assertEqual(self.energy_label_module.region_energy_labels, None)
+
 class TestEnergyLabelPredictionModule(unittest.TestCase):
 
 	@patch('modules.energy_label_module.register_range')
@@ -120,6 +132,51 @@ class TestEnergyLabelPredictionModule(unittest.TestCase):
 		# from previous results is.
 		self.assertTrue(dwelling.attributes['energy_label_epi_mean'] > 1.12)
 
+	def test_predicts_batch_like_dwellings(self):
+		pc6 = PC6('1000AA', self.connection)
+		pc6.attributes['energy_label_epi_log_avg'] = None
+		other_pc6 = PC6('1000AA', self.connection)
+		other_pc6.attributes['energy_label_epi_log_avg'] = 0.1823215568
+		buurt = Buurt('BU0000000', self.connection)
+		buurt.attributes['energy_label_epi_log_avg'] = 0.5
+
+		def get_dwellings():
+			dwellings = []
+			for (i, (dwelling_type, construction_year)) in enumerate([('tussenwoning', 2020), ('vrijstaand', 1850), ('meergezinspand_hoog', 1975), (None, 1990)]):
+				dwelling = Dwelling({'vbo_id': str(i), 'woningtype': dwelling_type, 'bouwjaar': construction_year}, self.connection)
+				dwelling.regions['pc6'] = pc6 if i % 2 == 0 else other_pc6
+				dwelling.regions['buurt'] = buurt
+				dwellings.append(dwelling)
+			return dwellings
+
+		dwellings = get_dwellings()
+		for dwelling in dwellings:
+			self.energy_label_prediction_module.process(dwelling)
+		expected_calls = self.energy_label_class_range_mock.call_args_list
+		self.energy_label_class_range_mock.reset_mock()
+
+		batch_dwellings = get_dwellings()
+		frame = DwellingFrame(batch_dwellings)
+		self.energy_label_prediction_module.process_batch(frame)
+		frame.write_back()
+
+		self.assertEqual(self.energy_label_class_range_mock.call_args_list, expected_calls)
+		for (dwelling, batch_dwelling) in zip(dwellings, batch_dwellings):
+			self.assertAlmostEqual(batch_dwelling.attributes['energy_label_epi_mean'], dwelling.attributes['energy_label_epi_mean'])
+			self.assertAlmostEqual(batch_dwelling.attributes['energy_label_epi_95'].lower, dwelling.attributes['energy_label_epi_95'].lower)
+			self.assertAlmostEqual(batch_dwelling.attributes['energy_label_epi_95'].upper, dwelling.attributes['energy_label_epi_95'].upper)
+			self.assertEqual(batch_dwelling.attributes['energy_label_class_mean'], dwelling.attributes['energy_label_class_mean'])
+			self.assertIn('EnergyLabelPredictionModule', batch_dwelling.processed_by)
+
+	def test_raises_without_construction_year(self):
+		pc6 = PC6('1000AA', self.connection)
+		pc6.attributes['energy_label_epi_log_avg'] = 0.1823215568
+		dwelling = Dwelling({'vbo_id': '0003010000000001', 'bouwjaar': None, 'woningtype': 'tussenwoning'}, self.connection)
+		dwelling.regions['pc6'] = pc6
+
+		self.assertRaises(ValueError, self.energy_label_prediction_module.predict_epi, dwelling)
+		self.assertRaises(ValueError, self.energy_label_prediction_module.process_batch, DwellingFrame([dwelling]))
+
 class TestEnergyLabelRegionalModule(unittest.TestCase):
 
 	def setUp(self):
@@ -130,9 +187,8 @@ class TestEnergyLabelRegionalModule(unittest.TestCase):
 			('SELECT AVG(LN(epi_imputed)) FROM energy_labels WHERE pc6 = %s AND epi_imputed > 0', ('9999XX',)): [(None,)],
 			('SELECT vbo_id FROM bag WHERE buurt_id = %s', ('BU0000000',)): [('0003010000000001',), ('0003010000000002',), ('0003010000000003',)],
 			('SELECT vbo_id FROM bag WHERE buurt_id = %s', ('BU0000001',)): [],
-			('SELECT energieklasse, epi_imputed FROM energy_labels WHERE energieklasse IS NOT null AND epi_imputed > 0 AND vbo_id = %s', ('0003010000000001',)): [('A', 0.7)],
-			('SELECT energieklasse, epi_imputed FROM energy_labels WHERE energieklasse IS NOT null AND epi_imputed > 0 AND vbo_id = %s', ('0003010000000002',)): [('B', 1.2)],
-			('SELECT energieklasse, epi_imputed FROM energy_labels WHERE energieklasse IS NOT null AND epi_imputed > 0 AND vbo_id = %s', ('0003010000000003',)): []
+			(str(region_energy_labels_query.format(region_key=sql.Identifier('buurt_id'))), ('BU0000000',)): [('0003010000000001', 'A', 0.7), ('0003010000000002', 'B', 1.2)],
+			(str(region_energy_labels_query.format(region_key=sql.Identifier('buurt_id'))), ('BU0000001',)): []
 		}
 		self.connection = get_mock_connection(query_dict)
 		self.energy_label_regional_module = EnergyLabelRegionalModule(self.connection, silent=True)
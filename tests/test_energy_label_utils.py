@@ -5,7 +5,7 @@ import unittest
 # Necessary to import modules from parent folder
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.energy_label_utils import label_to_epi, epi_to_label
+from utils.energy_label_utils import label_to_epi, epi_to_label, epis_to_labels
 
 class TestEnergyLabelsUtils(unittest.TestCase):
 
@@ -25,3 +25,6 @@ class TestEnergyLabelsUtils(unittest.TestCase):
 		self.assertEqual(epi_to_label(1.3), 'B')
 		self.assertEqual(epi_to_label(1.300001), 'C')
 
+	def test_epis_to_labels(self):
+		epis = [-10, 0.281, 0.5, 0.500001, 0.938, 1.3, 1.300001, 2.9, 10]
+		self.assertEqual(epis_to_labels(epis).tolist(), [epi_to_label(epi) for epi in epis])
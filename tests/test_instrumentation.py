@@ -0,0 +1,97 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+# Necessary to import modules from parent folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.base_module import BaseModule
+from modules.classes import Dwelling
+from utils.database_utils import get_observed_cursor_class
+from utils.instrumentation import Instrumentation, get_worker_report_path, merge_reports, merge_worker_reports
+
+from tests.utils import get_mock_connection
+
+class FakeCursor:
+
+	def __init__(self, rows):
+		self.rows = rows
+
+	def execute(self, query, vars=None):
+		pass
+
+	def fetchone(self):
+		return self.rows.pop(0) if len(self.rows) > 0 else None
+
+	def fetchall(self):
+		(rows, self.rows) = (self.rows, [])
+		return rows
+
+class QueryingModule(BaseModule):
+
+	def __init__(self, connection, cursor, **kwargs):
+		super().__init__(connection, **kwargs)
+		self.cursor = cursor
+
+	def process(self, dwelling):
+		if super().process(dwelling):
+			self.cursor.execute('SELECT 1')
+			dwelling.attributes['rows'] = self.cursor.fetchall()
+
+class TestInstrumentation(unittest.TestCase):
+
+	def setUp(self):
+		self.instrumentation = Instrumentation()
+		InstrumentedCursor = get_observed_cursor_class([self.instrumentation], base=FakeCursor)
+		self.cursor = InstrumentedCursor([(1,), (2,)])
+
+	def test_records_module_statements_and_rows(self):
+		module = QueryingModule(get_mock_connection(), self.cursor, silent=True)
+		self.instrumentation.instrument_module(module)
+		module.process(Dwelling({'vbo_id': '0003010000000001'}, None))
+		module.process(Dwelling({'vbo_id': '0003010000000002'}, None))
+
+		stats = self.instrumentation.get_report()['modules']['QueryingModule']['process']
+		self.assertEqual(stats['calls'], 2)
+		self.assertEqual(stats['statements'], 2)
+		self.assertEqual(stats['rows'], 2)
+		self.assertGreaterEqual(stats['time'], stats['db_time'])
+
+	def test_attributes_to_innermost_method(self):
+		self.instrumentation.enter(('RegionsModule', 'process'))
+		self.instrumentation.enter(('ExampleRegionalModule', 'process_buurt'))
+		self.cursor.execute('SELECT 1')
+		self.cursor.fetchone()
+		self.instrumentation.exit()
+		self.instrumentation.exit()
+		# Outside of the modules
+		self.cursor.execute('SELECT 1')
+		self.cursor.fetchone()
+
+		modules = self.instrumentation.get_report()['modules']
+		self.assertEqual(modules['ExampleRegionalModule']['process_buurt']['statements'], 1)
+		self.assertEqual(modules['RegionsModule']['process']['statements'], 0)
+		self.assertEqual(modules['pipeline']['other']['rows'], 1)
+		outer = modules['RegionsModule']['process']
+		inner = modules['ExampleRegionalModule']['process_buurt']
+		self.assertAlmostEqual(outer['time'] - outer['self_time'], inner['time'])
+
+	def test_merges_worker_reports(self):
+		self.instrumentation.enter(('ExampleModule', 'process'))
+		self.cursor.execute('SELECT 1')
+		self.instrumentation.exit()
+
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, 'report.json')
+			self.instrumentation.save_report(get_worker_report_path(path, 1))
+			self.instrumentation.save_report(get_worker_report_path(path, 2))
+			report = merge_worker_reports(path)
+			self.assertEqual(os.listdir(directory), ['report.json'])
+			with open(path) as file:
+				self.assertEqual(json.load(file), report)
+
+		self.assertEqual(report['modules']['ExampleModule']['process']['calls'], 2)
+		self.assertEqual(report['modules']['ExampleModule']['process']['statements'], 2)
+		self.assertEqual(merge_reports([])['modules'], {})
@@ -222,3 +222,38 @@ class TestInsulationModule(unittest.TestCase):
 			self.insulation_module.process(dwelling2)
 		except TypeError as e:
 			self.fail(f'Should not rise TypeError "{e}"')
+
+	def test_array_distributions_match_probability_distributions(self):
+		dict_insulation_module = InsulationModule(self.mock_connection, silent=True, array_distributions=False)
+		for construction_year in [1900, 1950, 1980, 2000, 2010]:
+			attributes = {
+				'bouwjaar': construction_year,
+				'woningtype': 'tussenwoning'
+			}
+			dwelling = Dwelling(attributes, self.mock_connection)
+			self.insulation_module.process(dwelling)
+			dict_dwelling = Dwelling(attributes, self.mock_connection)
+			dict_insulation_module.process(dict_dwelling)
+
+			for insulation_type in ['facade', 'roof', 'floor', 'window']:
+				dist = dwelling.attributes[f'insulation_{insulation_type}_r_dist']
+				dict_dist = dict_dwelling.attributes[f'insulation_{insulation_type}_r_dist']
+				self.assertAlmostEqual(dist.mean, dict_dist.mean)
+				for (value, dict_value) in zip(dist.interval(0.95), dict_dist.interval(0.95)):
+					self.assertAlmostEqual(value, dict_value)
+
+	def test_convolution_keeps_mean(self):
+		convolution_insulation_module = InsulationModule(self.mock_connection, silent=True, convolution_resolution=0.01)
+		attributes = {
+			'bouwjaar': 1950,
+			'woningtype': 'vrijstaand'
+		}
+		dwelling = Dwelling(attributes, self.mock_connection)
+		self.insulation_module.process(dwelling)
+		convolution_dwelling = Dwelling(attributes, self.mock_connection)
+		convolution_insulation_module.process(convolution_dwelling)
+
+		for insulation_type in ['facade', 'roof', 'floor', 'window']:
+			dist = dwelling.attributes[f'insulation_{insulation_type}_r_dist']
+			convolution_dist = convolution_dwelling.attributes[f'insulation_{insulation_type}_r_dist']
+			self.assertAlmostEqual(convolution_dist.mean, dist.mean)
@@ -0,0 +1,95 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Necessary to import modules from parent folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.classes import Dwelling
+from modules.insulation_module import InsulationModule
+from modules.sampling_module import SamplingModule
+from utils.insulation_table import InsulationTable, get_signature, load_insulation_table
+from utils.insulation_table_create import InsulationTableModule, build_insulation_table
+
+from tests.utils import get_mock_connection
+
+class TestInsulationTable(unittest.TestCase):
+
+	@classmethod
+	def setUpClass(cls):
+		cls.directory = tempfile.TemporaryDirectory()
+		cls.path = cls.directory.name
+		cls.insulation_module = InsulationTableModule(None, silent=True)
+		build_insulation_table(cls.insulation_module, cls.path, year_min=1915, year_max=1925)
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.directory.cleanup()
+
+	def setUp(self):
+		self.insulation_table = InsulationTable(self.path)
+
+	def test_matches_insulation_module(self):
+		for construction_year in [1915, 1919, 1920, 1925]:
+			dwelling = Dwelling({'bouwjaar': construction_year, 'woningtype': 'vrijstaand'}, None)
+			expected = self.insulation_module._process(dwelling)
+			distributions = self.insulation_table.get_distributions(construction_year, 'vrijstaand')
+			self.assertEqual(distributions.keys(), expected.keys())
+			for name in expected:
+				self.assertAlmostEqual(distributions[name].mean, expected[name].mean)
+				for (value, expected_value) in zip(distributions[name].interval(0.95), expected[name].interval(0.95)):
+					self.assertAlmostEqual(value, expected_value)
+
+	def test_has_summary(self):
+		summary = self.insulation_table.get_summary(1920, 'tussenwoning')
+		distributions = self.insulation_table.get_distributions(1920, 'tussenwoning')
+		self.assertAlmostEqual(summary['roof']['mean'], distributions['insulation_roof_r_dist'].mean)
+		self.assertEqual(summary['roof']['interval'], distributions['insulation_roof_r_dist'].interval(0.95))
+
+	def test_has_outputs_like_sampling_module(self):
+		sampling_module = SamplingModule(get_mock_connection(strict=False), silent=True)
+		outputs = self.insulation_table.get_outputs(1920, 'tussenwoning')
+		distributions = self.insulation_table.get_distributions(1920, 'tussenwoning')
+		for insulation_type in InsulationTable.insulation_types:
+			distribution = distributions[f'insulation_{insulation_type}_r_dist']
+			self.assertAlmostEqual(outputs[f'insulation_{insulation_type}_r_mean'], sampling_module.sample_double_precision(distribution, insulation_type))
+			self.assertEqual(outputs[f'insulation_{insulation_type}_r_95'], sampling_module.sample_numrange(distribution, insulation_type))
+
+	def test_returns_none_outside_table(self):
+		self.assertIsNone(self.insulation_table.get_distributions(1914, 'vrijstaand'))
+		self.assertIsNone(self.insulation_table.get_distributions(1926, 'vrijstaand'))
+		self.assertIsNone(self.insulation_table.get_distributions(1920, 'onbekend'))
+
+	def test_loads_only_up_to_date_table(self):
+		self.assertIsNotNone(load_insulation_table(get_signature(self.insulation_module), self.path))
+		other_module = InsulationTableModule(None, silent=True, convolution_resolution=0.01)
+		self.assertIsNone(load_insulation_table(get_signature(other_module), self.path))
+		self.assertIsNone(load_insulation_table(get_signature(self.insulation_module), os.path.join(self.path, 'missing')))
+
+	def test_insulation_module_uses_table(self):
+		mock_connection = get_mock_connection(strict=False)
+		with patch('modules.insulation_module.load_insulation_table', return_value=self.insulation_table):
+			insulation_module = InsulationModule(mock_connection, silent=True, insulation_table=True)
+		# Fails when the module does not use the table.
+		insulation_module._process = None
+		dwelling = Dwelling({'bouwjaar': 1920, 'woningtype': 'vrijstaand'}, mock_connection)
+		insulation_module.process(dwelling)
+		self.assertAlmostEqual(
+			dwelling.attributes['insulation_roof_r_mean'],
+			self.insulation_table.get_summary(1920, 'vrijstaand')['roof']['mean']
+		)
+		# The outputs are looked up, so there
+		# is nothing to sample from.
+		self.assertNotIn('insulation_roof_r_dist', dwelling.attributes)
+		self.assertFalse(dwelling.outputs['insulation_roof_r_95'].get('sampling', False))
+
+	def test_insulation_module_processes_keys_outside_table(self):
+		mock_connection = get_mock_connection(strict=False)
+		with patch('modules.insulation_module.load_insulation_table', return_value=self.insulation_table):
+			insulation_module = InsulationModule(mock_connection, silent=True, insulation_table=True)
+		dwelling = Dwelling({'bouwjaar': 1930, 'woningtype': 'vrijstaand'}, mock_connection)
+		insulation_module.process(dwelling)
+		self.assertIn('insulation_roof_r_dist', dwelling.attributes)
+		self.assertTrue(dwelling.outputs['insulation_roof_r_95']['sampling'])
@@ -0,0 +1,158 @@
+import io
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Necessary to import modules from parent folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pipeline
+from utils.pipeline_progress import Checkpointer
+from utils.results_writer import ResultsWriter
+from benchmarks.synthetic_data import SyntheticDataset
+from benchmarks.stand_in import StandInConnection, register_range
+
+class CopyingStandInConnection(StandInConnection):
+	'''
+	A stand-in that keeps the results that are copied
+	and the buurten that are added to pipeline_progress.
+	'''
+
+	def __init__(self, dataset):
+		super().__init__(dataset)
+		self.copied = []
+		self.progress_rows = []
+
+	def copy(self, query, file):
+		text = file.read()
+		self.copied.append(text)
+		super().copy(query, io.StringIO(text))
+
+	def insert_progress(self, parameters):
+		self.progress_rows.append(tuple(parameters))
+		return super().insert_progress(parameters)
+
+class TestProcessDwellings(unittest.TestCase):
+
+	def test_processes_and_saves_all_dwellings_of_a_buurt_as_a_batch(self):
+		dataset = SyntheticDataset(600, seed=6)
+		buurt_id = dataset.get_bag_rows()[0][5]
+		connection = CopyingStandInConnection(dataset)
+		with patch('modules.energy_label_module.register_range', register_range):
+			regional_modules = pipeline.get_regional_modules(connection, silent=True)
+			modules = pipeline.get_modules(connection, regional_modules, silent=True)
+		results_writer = ResultsWriter(connection)
+
+		cursor = connection.cursor()
+		cursor.execute(pipeline.buurt_dwellings_query, (buurt_id,))
+		dwellings = [pipeline.create_dwelling(row, connection) for row in cursor.fetchall()]
+		self.assertGreaterEqual(len(dwellings), 2)
+
+		# Every dwelling of the regions is saved after all of them
+		# have been added, so the regions are complete at the first save.
+		pipeline.process_dwellings(dwellings, modules, results_writer)
+		results_writer.flush()
+
+		self.assertEqual(connection.n_copied_rows, len(dwellings))
+		for dwelling in dwellings:
+			self.assertIn('SamplingModule', dwelling.processed_by)
+			for region in dwelling.regions.values():
+				self.assertEqual(region.n_placeholders, 0)
+				self.assertIsNone(region.dwellings)
+
+	def test_realizations_need_batch_mode(self):
+		with patch('pipeline.create_results_table') as create_results_table:
+			self.assertRaises(ValueError, pipeline.pipeline, None, module_kwargs={'realizations': 3})
+		create_results_table.assert_not_called()
+
+class TestProcessBuurten(unittest.TestCase):
+
+	def test_stops_after_n_dwellings_and_records_finished_buurten(self):
+		dataset = SyntheticDataset(600, seed=7)
+		connection = CopyingStandInConnection(dataset)
+		with patch('modules.energy_label_module.register_range', register_range):
+			regional_modules = pipeline.get_regional_modules(connection, silent=True)
+			modules = pipeline.get_modules(connection, regional_modules, silent=True)
+		checkpointer = Checkpointer(connection, ResultsWriter(connection))
+		buurt_ids = pipeline.get_buurt_ids(connection)[:3]
+		n_first_buurt = len([row for row in dataset.get_bag_rows() if row[5] == buurt_ids[0]])
+
+		progress = []
+		n_dwellings = pipeline.process_buurten(buurt_ids, connection, modules, checkpointer, N=n_first_buurt + 1, progress=lambda *args: progress.append(args))
+		checkpointer.commit()
+
+		self.assertEqual(n_dwellings, n_first_buurt + 1)
+		self.assertEqual(progress, [(1, n_first_buurt), (2, n_first_buurt + 1)])
+		# The second buurt was cut short, so it is not recorded.
+		self.assertEqual(connection.progress_rows, [(buurt_ids[0], n_first_buurt)])
+		self.assertEqual(connection.n_copied_rows, n_first_buurt + 1)
+
+class TestWorker(unittest.TestCase):
+
+	def setUp(self):
+		self.dataset = SyntheticDataset(600, seed=5)
+		self.buurt_id = self.dataset.get_bag_rows()[0][5]
+		self.module_kwargs = {'seed': 1}
+		# The stand-in has no catalog to read the range type from.
+		patcher = patch('modules.energy_label_module.register_range', register_range)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		self.addCleanup(pipeline.worker.clear)
+
+	def process_buurt_serially(self):
+		connection = CopyingStandInConnection(self.dataset)
+		regional_modules = pipeline.get_regional_modules(connection, silent=True, **self.module_kwargs)
+		modules = pipeline.get_modules(connection, regional_modules, silent=True, **self.module_kwargs)
+		results_writer = ResultsWriter(connection)
+		checkpointer = Checkpointer(connection, results_writer)
+		n_processed, finished = pipeline.process_buurt(self.buurt_id, connection, modules, results_writer)
+		self.assertTrue(finished)
+		checkpointer.buurt_finished(self.buurt_id, n_processed)
+		checkpointer.commit()
+		return connection
+
+	def init_worker(self, connection, reporting=None):
+		with patch('pipeline.get_connection', return_value=connection), patch('pipeline.multiprocessing.util.Finalize') as Finalize:
+			pipeline.init_worker(flush_size=10000, commit_every=50000, commit_interval=300, module_kwargs=self.module_kwargs, reporting=reporting)
+		return Finalize
+
+	def test_init_worker_sets_up_worker_and_final_commit(self):
+		connection = CopyingStandInConnection(self.dataset)
+		Finalize = self.init_worker(connection)
+
+		self.assertIs(pipeline.worker['connection'], connection)
+		self.assertEqual(len(pipeline.worker['modules']), len(pipeline.Modules))
+		self.assertFalse(pipeline.worker['batch'])
+		# Committed after initiating the modules.
+		self.assertEqual(connection.n_commits, 1)
+
+		Finalize.assert_called_once_with(None, pipeline.worker['checkpointer'].commit, exitpriority=10)
+
+	def test_init_worker_saves_report_after_final_commit(self):
+		connection = CopyingStandInConnection(self.dataset)
+		Finalize = self.init_worker(connection, pipeline.ReportingOptions(report_path='report.json'))
+
+		self.assertEqual(Finalize.call_count, 2)
+		(_, save_report, *_), kwargs = Finalize.call_args
+		self.assertEqual(save_report.__name__, 'save_report')
+		self.assertLess(kwargs['exitpriority'], 10)
+
+	def test_worker_gives_the_same_results_as_serial_pipeline(self):
+		serial_connection = self.process_buurt_serially()
+
+		connection = CopyingStandInConnection(self.dataset)
+		Finalize = self.init_worker(connection)
+		n_processed = pipeline.process_buurt_in_worker(self.buurt_id)
+		# Nothing is written before the final commit,
+		# which runs when the pool shuts down.
+		self.assertEqual(connection.copied, [])
+		(_, final_commit), _ = Finalize.call_args
+		final_commit()
+
+		self.assertGreater(n_processed, 0)
+		self.assertEqual(connection.n_copied_rows, n_processed)
+		self.assertEqual(connection.copied, serial_connection.copied)
+		self.assertEqual(connection.progress_rows, [(self.buurt_id, n_processed)])
+		self.assertEqual(connection.progress_rows, serial_connection.progress_rows)
+		self.assertEqual(connection.n_commits, 2)
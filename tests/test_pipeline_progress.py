@@ -0,0 +1,46 @@
+import os
+import sys
+import unittest
+from unittest.mock import Mock, patch
+
+# Necessary to import modules from parent folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.pipeline_progress import Checkpointer, insert_progress_statement
+
+class TestCheckpointer(unittest.TestCase):
+
+	def setUp(self):
+		self.connection = Mock()
+		self.cursor = self.connection.cursor.return_value
+		self.results_writer = Mock()
+		self.checkpointer = Checkpointer(self.connection, self.results_writer, commit_every=100, commit_interval=60)
+
+	def test_records_finished_buurt(self):
+		self.checkpointer.buurt_finished('BU03630000', 10)
+		self.cursor.execute.assert_called_once_with(insert_progress_statement, ('BU03630000', 10))
+
+	def test_does_not_commit_before_commit_every(self):
+		self.checkpointer.buurt_finished('BU03630000', 60)
+		self.connection.commit.assert_not_called()
+		self.assertEqual(self.checkpointer.n_uncommitted, 60)
+
+	def test_commits_after_commit_every(self):
+		self.checkpointer.buurt_finished('BU03630000', 60)
+		self.checkpointer.buurt_finished('BU03630001', 60)
+		self.results_writer.flush.assert_called_once()
+		self.connection.commit.assert_called_once()
+		self.assertEqual(self.checkpointer.n_uncommitted, 0)
+		self.assertEqual(self.checkpointer.n_commits, 1)
+
+	def test_commits_after_commit_interval(self):
+		with patch('utils.pipeline_progress.time.time', return_value=self.checkpointer.last_commit_time + 61):
+			self.checkpointer.buurt_finished('BU03630000', 1)
+		self.connection.commit.assert_called_once()
+
+	def test_flushes_before_commit(self):
+		calls = Mock()
+		calls.attach_mock(self.results_writer.flush, 'flush')
+		calls.attach_mock(self.connection.commit, 'commit')
+		self.checkpointer.commit()
+		self.assertEqual([name for (name, _, _) in calls.mock_calls], ['flush', 'commit'])
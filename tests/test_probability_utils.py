@@ -1,7 +1,8 @@
+import math
 import unittest
 from functools import partial
 
-from utils.probability_utils import ProbabilityDistribution
+from utils.probability_utils import ArrayProbabilityDistribution, ProbabilityDistribution
 
 class TestProbabilityUtils(unittest.TestCase):
 
@@ -462,3 +463,116 @@ class TestProbabilityUtils(unittest.TestCase):
 		# Note that it should be sorted
 		expected_str = "ProbabilityDistribution({(0, 1): 0.2, 1: 0.3, 2: 0.5})"
 		self.assertEqual(str(p3), expected_str)
+
+class TestArrayProbabilityDistribution(unittest.TestCase):
+
+	def setUp(self):
+		self.dicts = [
+			{0: 0.1, 1: 0.2, 2: 0.3, 3: 0.3, 4: 0.1},
+			{(1, 2): 0.5, 4: 0.2, (4, 5): 0.3},
+			# overlapping ranges
+			{(0, 2): 0.4, (1, 3): 0.4, 1: 0.2}
+		]
+
+	def assertSameDistribution(self, array_pd, pd):
+		self.assertEqual(array_pd.prob_points.keys(), pd.prob_points.keys())
+		for (value, p) in pd.prob_points.items():
+			self.assertAlmostEqual(array_pd.prob_points[value], p)
+		self.assertEqual(array_pd.prob_ranges.keys(), pd.prob_ranges.keys())
+		for (value, p) in pd.prob_ranges.items():
+			self.assertAlmostEqual(array_pd.prob_ranges[value], p)
+
+	def test_matches_probability_distribution(self):
+		for prob_dict in self.dicts:
+			pd = ProbabilityDistribution(prob_dict)
+			array_pd = ArrayProbabilityDistribution(prob_dict)
+			self.assertSameDistribution(array_pd, pd)
+			self.assertAlmostEqual(array_pd.mean, pd.mean)
+			self.assertAlmostEqual(array_pd.p(1), pd.p(1))
+			self.assertAlmostEqual(array_pd.p([0.5, 4.5]), pd.p([0.5, 4.5]))
+			for confidence_value in [0.5, 0.9, 0.95, 1]:
+				for (array_value, value) in zip(array_pd.interval(confidence_value), pd.interval(confidence_value)):
+					self.assertAlmostEqual(array_value, value)
+
+	def test_splits_overlapping_ranges(self):
+		array_pd = ArrayProbabilityDistribution({(0, 2): 0.5, (1, 3): 0.5})
+		self.assertEqual(list(array_pd.prob_ranges.keys()), [(0, 1), (1, 2), (2, 3)])
+		self.assertEqual(list(array_pd.prob_ranges.values()), [0.25, 0.5, 0.25])
+
+	def test_matches_operations(self):
+		pd1, pd2, pd3 = [ProbabilityDistribution(prob_dict) for prob_dict in self.dicts]
+		array_pd1, array_pd2, array_pd3 = [ArrayProbabilityDistribution(prob_dict) for prob_dict in self.dicts]
+
+		self.assertSameDistribution(0.3 * array_pd1 + array_pd2 * 0.7, 0.3 * pd1 + pd2 * 0.7)
+		self.assertSameDistribution(sum([array_pd1, array_pd3]), sum([pd1, pd3]))
+		self.assertSameDistribution(array_pd1 & array_pd2, pd1 & pd2)
+		self.assertSameDistribution(array_pd3 & 1.5, pd3 & 1.5)
+		self.assertRaises(NotImplementedError, lambda: array_pd2 & array_pd3)
+
+	def test_pad_matches_probability_distribution(self):
+		pd = 0.5 * ProbabilityDistribution(self.dicts[1])
+		array_pd = 0.5 * ArrayProbabilityDistribution(self.dicts[1])
+		self.assertFalse(array_pd.is_normalized)
+		self.assertEqual(array_pd.mean, None)
+		pd.pad()
+		array_pd.pad()
+		self.assertTrue(array_pd.is_normalized)
+		self.assertSameDistribution(array_pd, pd)
+		self.assertAlmostEqual(array_pd.mean, pd.mean)
+
+	def test_can_be_created_from_probability_distribution(self):
+		pd = ProbabilityDistribution(self.dicts[1])
+		self.assertSameDistribution(ArrayProbabilityDistribution(pd), pd)
+
+	def test_string_representation_sorts_keys(self):
+		array_pd = ArrayProbabilityDistribution({
+			2: 0.5,
+			1: 0.25,
+			(0, 1): 0.25
+		})
+		expected_str = "ArrayProbabilityDistribution({(0.0, 1.0): 0.25, 1.0: 0.25, 2.0: 0.5})"
+		self.assertEqual(str(array_pd), expected_str)
+
+class TestConvolution(unittest.TestCase):
+
+	def test_matches_and_for_points_on_grid(self):
+		pd = ArrayProbabilityDistribution({0: 0.1, 1: 0.2, 2: 0.7})
+		convolved = pd.convolve(pd, resolution=1)
+		expected = pd & pd
+		self.assertEqual(list(convolved.prob_points.keys()), list(expected.prob_points.keys()))
+		for (p, expected_p) in zip(convolved.prob_points.values(), expected.prob_points.values()):
+			self.assertAlmostEqual(p, expected_p)
+
+	def test_supports_ranges(self):
+		# The sum of two uniform distributions on [0, 1]
+		# has a triangular distribution on [0, 2].
+		pd = ArrayProbabilityDistribution({(0, 1): 1})
+		convolved = pd.convolve(pd, resolution=0.01)
+		self.assertAlmostEqual(convolved.mean, 1)
+		(val_min, val_max) = convolved.interval(0.95)
+		self.assertAlmostEqual(val_min, math.sqrt(0.05), delta=0.01)
+		self.assertAlmostEqual(val_max, 2 - math.sqrt(0.05), delta=0.01)
+
+	def test_keeps_mean(self):
+		pd1 = ProbabilityDistribution({2.11: 0.548, 2.53: 0.24, 2.86: 0.212})
+		pd2 = ProbabilityDistribution({(1.25, 2.175): 0.4, 0: 0.6})
+		self.assertAlmostEqual(pd1.convolve(pd2).mean, (pd1 & pd2).mean)
+		self.assertEqual(type(pd1.convolve(pd2)), ProbabilityDistribution)
+
+	def test_is_empty_for_empty_distributions(self):
+		empty = ArrayProbabilityDistribution({})
+		pd = ArrayProbabilityDistribution({(0, 1): 0.5, 2: 0.5})
+		(grid_min, ps) = empty.discretize(0.01)
+		self.assertEqual(len(ps), 0)
+		for convolved in [empty.convolve(pd), pd.convolve(empty), empty.convolve(empty)]:
+			self.assertEqual(str(convolved), str(empty & pd))
+			self.assertEqual(convolved.get_cum_p(), 0)
+
+	def test_fft_matches_direct(self):
+		pd1 = ArrayProbabilityDistribution({(0, 3): 0.5, 1.234: 0.5})
+		pd2 = ArrayProbabilityDistribution({(1, 2): 0.9, 5: 0.1})
+		direct = pd1.convolve(pd2, method='direct')
+		fft = pd1.convolve(pd2, method='fft')
+		for value in [1.5, 3.5, 6.23]:
+			self.assertAlmostEqual(direct.p(value), fft.p(value))
+		self.assertRaises(ValueError, pd1.convolve, pd2, method='unknown')
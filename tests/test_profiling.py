@@ -0,0 +1,73 @@
+import os
+import pstats
+import sys
+import tempfile
+import time
+import unittest
+
+# Necessary to import modules from parent folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.profiling import Profiler, get_collapsed_stack
+
+def busy_function(n=20000):
+	return sum(i * i for i in range(n))
+
+def waiting_function(seconds=0.2):
+	# Like waiting for the database: no CPU time.
+	time.sleep(seconds)
+
+class TestProfiler(unittest.TestCase):
+
+	def test_saves_pstats_and_collapsed_stacks(self):
+		profiler = Profiler(interval=0.001)
+		profiler.start()
+		for _ in range(50):
+			busy_function()
+		profiler.stop()
+
+		with tempfile.TemporaryDirectory() as directory:
+			pstats_path, collapsed_path = profiler.save(os.path.join(directory, 'profile'))
+			stats = pstats.Stats(pstats_path)
+			function_names = [function_name for (_, _, function_name) in stats.stats]
+			self.assertIn('busy_function', function_names)
+			with open(collapsed_path) as file:
+				lines = file.read().splitlines()
+
+		for line in lines:
+			(stack, count) = line.rsplit(' ', 1)
+			self.assertGreater(int(count), 0)
+		if profiler.sampling:
+			self.assertTrue(any('busy_function' in line for line in lines))
+
+	def test_samples_wall_time_by_default(self):
+		profiler = Profiler(interval=0.005)
+		profiler.start()
+		waiting_function()
+		profiler.stop()
+
+		if profiler.sampling:
+			n_samples = sum(count for (stack, count) in profiler.stacks.items() if 'waiting_function' in stack)
+			# 0.2 s is 40 intervals.
+			self.assertGreater(n_samples, 20)
+
+	def test_rejects_unknown_timer(self):
+		self.assertRaises(ValueError, Profiler, timer='virtual')
+
+	def test_profiles_every_kth_call(self):
+		profiler = Profiler(every=3)
+		profiler.start()
+		for n in range(1, 7):
+			profiler.profile(busy_function, n)
+		profiler.stop()
+
+		stats = pstats.Stats(profiler.cprofile)
+		calls = {function_name: n_calls for ((_, _, function_name), (_, n_calls, _, _, _)) in stats.stats.items()}
+		# The 1st and 4th call
+		self.assertEqual(calls['busy_function'], 2)
+
+	def test_collapsed_stack_starts_at_outermost_frame(self):
+		stack = get_collapsed_stack(sys._getframe())
+		names = stack.split(';')
+		self.assertTrue(names[-1].startswith('test_collapsed_stack_starts_at_outermost_frame (test_profiling.py:'))
+		self.assertGreater(len(names), 1)
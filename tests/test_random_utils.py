@@ -0,0 +1,55 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# Necessary to import modules from parent folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.random_utils import get_stream_id, get_uniforms, philox4x32
+
+class TestPhilox(unittest.TestCase):
+
+	def test_known_answers(self):
+		# Known-answer tests of Random123 for Philox4x32-10
+		known_answers = [
+			([0, 0, 0, 0], (0, 0), [0x6627e8d5, 0xe169c58d, 0xbc57ac4c, 0x9b00dbd8]),
+			([0xffffffff] * 4, (0xffffffff, 0xffffffff), [0x408f276d, 0x41c83b0e, 0xa20bc7c6, 0x6d5451fd]),
+			([0x243f6a88, 0x85a308d3, 0x13198a2e, 0x03707344], (0xa4093822, 0x299f31d0), [0xd16cfe09, 0x94fdcceb, 0x5001e420, 0x24126ea1])
+		]
+		for (counter, key, expected) in known_answers:
+			self.assertEqual(philox4x32([counter], key)[0].tolist(), expected)
+
+	def test_is_vectorized(self):
+		counters = np.arange(40).reshape(10, 4)
+		words = philox4x32(counters, (1, 2))
+		self.assertEqual(words.shape, (10, 4))
+		self.assertEqual(words[3].tolist(), philox4x32(counters[3:4], (1, 2))[0].tolist())
+
+class TestGetUniforms(unittest.TestCase):
+
+	def setUp(self):
+		self.vbo_ids = ['0363010000000001', '0363010000000002', '0363010000000003']
+		self.names = ['gas_boiler_space', 'gas_cooking']
+
+	def test_gets_uniforms(self):
+		uniforms = get_uniforms(1, self.vbo_ids, self.names)
+		self.assertEqual(uniforms.shape, (3, 2))
+		self.assertTrue(((0 <= uniforms) & (uniforms < 1)).all())
+
+	def test_does_not_depend_on_order(self):
+		uniforms = get_uniforms(1, self.vbo_ids, self.names)
+		reversed_uniforms = get_uniforms(1, self.vbo_ids[::-1], self.names[::-1])
+		self.assertEqual(uniforms.tolist(), reversed_uniforms[::-1, ::-1].tolist())
+		self.assertEqual(get_uniforms(1, self.vbo_ids[1:2], self.names[1:])[0, 0], uniforms[1, 1])
+
+	def test_depends_on_seed_and_attempt(self):
+		uniforms = get_uniforms(1, self.vbo_ids, self.names)
+		self.assertFalse((uniforms == get_uniforms(2, self.vbo_ids, self.names)).any())
+		self.assertFalse((uniforms == get_uniforms(1, self.vbo_ids, self.names, attempt=1)).any())
+
+	def test_gets_stream_id(self):
+		self.assertEqual(get_stream_id('0363010000000001'), 363010000000001)
+		self.assertEqual(get_stream_id('gas_cooking', n_bytes=4), get_stream_id('gas_cooking', n_bytes=4))
+		self.assertLess(get_stream_id('gas_cooking', n_bytes=4), 2 ** 32)
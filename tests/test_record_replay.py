@@ -0,0 +1,119 @@
+import datetime
+import decimal
+import os
+import sys
+import tempfile
+import unittest
+
+from psycopg2 import sql
+
+# Necessary to import modules from parent folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_data import SyntheticDataset
+from benchmarks.stand_in import StandInConnection
+from benchmarks.run_benchmarks import run_benchmark
+from utils.record_replay import Recording, ReplayConnection, load_recording, mogrify, record_statements
+
+class TestRecordReplay(unittest.TestCase):
+
+	def setUp(self):
+		self.connection = StandInConnection(SyntheticDataset(1000, seed=4))
+		self.recording = Recording()
+		record_statements(self.connection, self.recording)
+		(_, self.path) = tempfile.mkstemp(suffix='.json.gz')
+
+	def tearDown(self):
+		os.remove(self.path)
+
+	def execute(self, connection, query, parameters=None):
+		cursor = connection.cursor()
+		cursor.execute(query, parameters)
+		rows = cursor.fetchall()
+		cursor.close()
+		return rows
+
+	def test_replays_a_recorded_pipeline_run(self):
+		report = run_benchmark(self.connection, N=200, module_kwargs={'seed': 1})
+		self.recording.save(self.path)
+
+		connection = ReplayConnection(load_recording(self.path), strict=True)
+		replay_report = run_benchmark(connection, N=200, module_kwargs={'seed': 1})
+
+		self.assertEqual(replay_report['pipeline']['written_results'], 200)
+		self.assertEqual(replay_report['pipeline']['statements'], report['pipeline']['statements'])
+		self.assertEqual(connection.get_missing_report(), [])
+
+	def test_replays_a_recorded_pipeline_run_with_realizations(self):
+		# The realization counts are inserted with execute_values().
+		module_kwargs = {'seed': 1, 'realizations': 3}
+		run_benchmark(self.connection, N=200, module_kwargs=module_kwargs, batch=True)
+		self.assertTrue(any(statement.startswith('INSERT INTO realization_counts') for statement in self.recording.statements))
+		self.recording.save(self.path)
+
+		connection = ReplayConnection(load_recording(self.path), strict=True)
+		replay_report = run_benchmark(connection, N=200, module_kwargs=module_kwargs, batch=True)
+
+		self.assertEqual(replay_report['pipeline']['written_results'], 200)
+		self.assertEqual(connection.get_missing_report(), [])
+
+	def test_mogrifies_like_psycopg2(self):
+		statement = mogrify('INSERT INTO table_ VALUES (%s, %s, %s, %s, %s, %s)', ("O'Brien", None, [1, 2], ['é', None], [], 1.5))
+		self.assertEqual(statement.decode(), "INSERT INTO table_ VALUES ('O''Brien', NULL, ARRAY[1,2], ARRAY['é',NULL], '{}', 1.5)")
+
+	def test_fetches_recorded_rows(self):
+		cursor = self.connection.cursor()
+		cursor.execute(sql.SQL('SELECT vbo_id FROM bag WHERE pc6 = %s'), ('1000AA',))
+		first_row = cursor.fetchone()
+		rows = cursor.fetchall()
+
+		connection = ReplayConnection(self.recording)
+		self.assertEqual(self.execute(connection, '''
+			SELECT vbo_id
+			FROM bag
+			WHERE pc6 = %s;''', ['1000AA']), [first_row] + rows)
+
+	def test_fetches_rows_one_by_one_and_in_batches(self):
+		self.recording.record('SELECT 1', None, [(1,), (2,), (3,), (4,)])
+		cursor = ReplayConnection(self.recording).cursor()
+		cursor.execute('SELECT 1')
+
+		self.assertEqual(cursor.fetchone(), (1,))
+		self.assertEqual(cursor.fetchmany(2), [(2,), (3,)])
+		self.assertEqual(cursor.fetchall(), [(4,)])
+		self.assertIsNone(cursor.fetchone())
+		self.assertEqual(cursor.fetchmany(), [])
+
+	def test_replays_the_results_of_a_statement_in_order(self):
+		self.recording.record('SELECT 1', None, [(1,)])
+		self.recording.record('SELECT 1', None, [(2,)])
+		connection = ReplayConnection(self.recording)
+
+		self.assertEqual(self.execute(connection, 'SELECT 1'), [(1,)])
+		self.assertEqual(self.execute(connection, 'SELECT 1'), [(2,)])
+		self.assertEqual(self.execute(connection, 'SELECT 1'), [(2,)])
+
+	def test_saves_decimals_and_dates(self):
+		rows = [(decimal.Decimal('1.25'), datetime.date(2021, 3, 1), None)]
+		self.recording.record('SELECT value, date, other FROM table_ WHERE id = %s', (decimal.Decimal('2'),), rows)
+		self.recording.save(self.path)
+
+		connection = ReplayConnection(load_recording(self.path))
+		self.assertEqual(self.execute(connection, 'SELECT value, date, other FROM table_ WHERE id = %s', (decimal.Decimal('2'),)), rows)
+
+	def test_reports_statements_that_were_not_recorded(self):
+		self.recording.record('SELECT 1', None, [(1,)])
+		connection = ReplayConnection(self.recording)
+
+		self.assertEqual(self.execute(connection, 'SELECT 2'), [])
+		self.assertEqual(self.execute(connection, 'SELECT 2'), [])
+		self.assertEqual(self.execute(connection, 'SELECT 1', (1,)), [])
+		self.assertEqual(connection.get_missing_report(), [
+			{'statement': 'SELECT 2', 'parameters': None, 'count': 2},
+			{'statement': 'SELECT 1', 'parameters': '[1]', 'count': 1}
+		])
+
+	def test_raises_on_statement_that_was_not_recorded_when_strict(self):
+		connection = ReplayConnection(self.recording, strict=True)
+		with self.assertRaises(NotImplementedError):
+			self.execute(connection, 'SELECT 2')
@@ -0,0 +1,163 @@
+import os
+import sys
+import unittest
+
+# Necessary to import modules from parent folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.utils import get_mock_connection
+
+from modules.classes import Buurt, PC6
+from modules import regional_tables
+from modules.regional_tables import HeatingSharesTable, PC6StatsTable, get_heating_shares_query, get_pc6_stats_query
+from modules.energy_label_module import EnergyLabelRegionalModule
+from modules.gas_consumption_comparison_module import GasConsumptionComparisonRegionalModule
+from modules.electricity_consumption_comparison_module import ElectricityConsumptionComparisonRegionalModule
+from modules.district_space_heating_module import DistrictSpaceHeatingRegionalModule
+from modules.gas_space_heating_module import GasSpaceHeatingRegionalModule
+
+class TestHeatingSharesTable(unittest.TestCase):
+
+	def setUp(self):
+		rows = [
+			# area_code, total, A050112 ... A050119
+			('BU00000001', 90, 60, 10, 5, None, None, 10, 5, None),
+			('BU00000000', None, None, None, None, None, None, None, None, None)
+		]
+		self.table = HeatingSharesTable(rows)
+
+	def test_gets_shares(self):
+		self.assertEqual(self.table.get_share('BU00000001', 'A050112'), 0.6)
+		self.assertEqual(self.table.get_share('BU00000001', 'A050115'), 0)
+
+	def test_gets_probability_modifier(self):
+		self.assertEqual(self.table.get_probability_modifier('BU00000001'), 99 / 90)
+		self.assertEqual(self.table.get_probability_modifier('BU00000000'), 1)
+
+	def test_handles_unknown_areas(self):
+		self.assertEqual(self.table.get_share('BU99999999', 'A050112'), 0)
+		self.assertEqual(self.table.get_probability_modifier('BU99999999'), 1)
+
+	def test_ignores_trailing_spaces(self):
+		table = HeatingSharesTable([('BU0001  ', 100, 50, 0, 0, 0, 0, 0, 0, 0)])
+		self.assertEqual(table.get_share('BU0001', 'A050112'), 0.5)
+
+class TestHeatingShareModules(unittest.TestCase):
+
+	def setUp(self):
+		query_dict = {
+			get_heating_shares_query(): [('BU00000001', 99, 50, 10, 20, 5, 0, 4, 0, 10)],
+			('SELECT vbo_id FROM bag WHERE buurt_id = %s', ('BU00000001',)): []
+		}
+		self.connection = get_mock_connection(query_dict)
+
+	def test_modules_share_the_table(self):
+		district_module = DistrictSpaceHeatingRegionalModule(self.connection, silent=True)
+		gas_module = GasSpaceHeatingRegionalModule(self.connection, silent=True)
+		self.assertIs(district_module.heating_shares, gas_module.heating_shares)
+
+	def test_adds_installation_type_shares(self):
+		district_module = DistrictSpaceHeatingRegionalModule(self.connection, silent=True)
+		gas_module = GasSpaceHeatingRegionalModule(self.connection, silent=True)
+		buurt = Buurt('BU00000001', self.connection, buurt_modules=[district_module, gas_module])
+		self.assertEqual(buurt.attributes['probability_modifier'], 1)
+		self.assertEqual(buurt.attributes['district_high_gas_share'], 0.2)
+		self.assertEqual(buurt.attributes['gas_boiler_heating_share'], 0.5)
+
+class TestSharedRegionalTables(unittest.TestCase):
+
+	def setUp(self):
+		query_dict = {
+			get_heating_shares_query(): [('BU00000001', 90, 60, 10, 5, None, None, 10, 5, None)],
+			get_pc6_stats_query(): [('1000AA', 10, 1000, 1200, 2500, 2.2, 0.5), ('1000AB', 2, None, None, None, None, None)]
+		}
+		self.connection = get_mock_connection(query_dict)
+		self.blocks, self.descriptions = regional_tables.share_regional_tables(self.connection, pc6_stats=True)
+
+	def tearDown(self):
+		attached_blocks = [block for table in regional_tables.shared_tables.values() for block in table.shared_memory_blocks]
+		regional_tables.shared_tables.clear()
+		for block in attached_blocks:
+			block.close()
+		regional_tables.release_shared_memory(self.blocks)
+
+	def test_attached_tables_equal_loaded_tables(self):
+		regional_tables.attach_regional_tables(self.descriptions)
+		# Another connection (e.g. of a worker) gets the shared
+		# tables, without querying the database.
+		other_connection = get_mock_connection()
+		heating_shares = regional_tables.get_heating_shares_table(other_connection)
+		pc6_stats = regional_tables.get_pc6_stats_table(other_connection)
+
+		self.assertEqual(heating_shares.get_share('BU00000001', 'A050112'), 0.6)
+		self.assertEqual(heating_shares.get_probability_modifier('BU00000001'), 99 / 90)
+		self.assertEqual(pc6_stats.get_stats('1000AA')['household_size'], 2.2)
+		self.assertEqual(pc6_stats.get_stats('1000AB')['avg_gas_use'], None)
+		self.assertEqual(pc6_stats.get_stats('9999XX')['number_of_dwellings'], 0)
+
+	def test_regional_modules_use_attached_tables(self):
+		regional_tables.attach_regional_tables(self.descriptions)
+		# Without the heating shares and pc6_stats queries,
+		# so the modules can only use the attached tables.
+		other_connection = get_mock_connection()
+		district_space_heating_module = DistrictSpaceHeatingRegionalModule(other_connection, silent=True)
+		energy_label_module = EnergyLabelRegionalModule(other_connection, silent=True, pc6_stats=True)
+
+		self.assertIs(district_space_heating_module.heating_shares, regional_tables.shared_tables['heating_shares'])
+		self.assertIs(energy_label_module.pc6_stats, regional_tables.shared_tables['pc6_stats'])
+
+		pc6 = PC6('1000AA', get_mock_connection({('SELECT vbo_id FROM bag WHERE pc6 = %s', ('1000AA',)): []}), pc6_modules=[energy_label_module])
+		self.assertEqual(pc6.attributes['energy_label_epi_log_avg'], 0.5)
+
+	def test_attached_tables_are_read_only(self):
+		regional_tables.attach_regional_tables(self.descriptions)
+		with self.assertRaises(ValueError):
+			regional_tables.shared_tables['heating_shares'].shares[0, 0] = 1
+
+class TestPC6StatsTable(unittest.TestCase):
+
+	def setUp(self):
+		rows = [
+			# pc6, number_of_dwellings, total_floor_space, avg_gas_use, avg_elec_use, household_size, energy_label_epi_log_avg
+			('1000AB', 2, None, None, None, None, None),
+			('1000AA', 10, 1000, 1200, 2500, 2.2, 0.5)
+		]
+		self.table = PC6StatsTable(rows)
+
+	def test_gets_stats(self):
+		stats = self.table.get_stats('1000AA')
+		self.assertEqual(stats['number_of_dwellings'], 10)
+		self.assertEqual(stats['household_size'], 2.2)
+		self.assertEqual(stats['energy_label_epi_log_avg'], 0.5)
+
+	def test_gets_none_for_null_values(self):
+		stats = self.table.get_stats('1000AB')
+		self.assertEqual(stats['number_of_dwellings'], 2)
+		self.assertEqual(stats['total_floor_space'], None)
+
+	def test_unknown_pc6_has_no_dwellings(self):
+		self.assertEqual(self.table.get_stats('9999XX')['number_of_dwellings'], 0)
+		self.assertEqual(self.table.get_stats(None)['avg_gas_use'], None)
+
+class TestPC6StatsModules(unittest.TestCase):
+
+	def setUp(self):
+		query_dict = {
+			get_pc6_stats_query(): [('1000AA', 10, 1000, 1200, 2500, 2.2, 0.5)],
+			('SELECT vbo_id FROM bag WHERE pc6 = %s', ('1000AA',)): []
+		}
+		self.connection = get_mock_connection(query_dict)
+		self.pc6_modules = [
+			GasConsumptionComparisonRegionalModule(self.connection, silent=True, pc6_stats=True),
+			ElectricityConsumptionComparisonRegionalModule(self.connection, silent=True, pc6_stats=True),
+			EnergyLabelRegionalModule(self.connection, silent=True, pc6_stats=True)
+		]
+
+	def test_fills_pc6_from_pc6_stats(self):
+		pc6 = PC6('1000AA', self.connection, pc6_modules=self.pc6_modules)
+		self.assertEqual(pc6.attributes['number_of_dwellings'], 10)
+		self.assertEqual(pc6.attributes['total_gas_use'], 12000)
+		self.assertEqual(pc6.attributes['total_floor_space'], 1000)
+		self.assertEqual(pc6.attributes['total_elec_use'], 25000)
+		self.assertEqual(pc6.attributes['household_size'], 2.2)
+		self.assertEqual(pc6.attributes['energy_label_epi_log_avg'], 0.5)
@@ -21,6 +21,7 @@ class TestRegion(unittest.TestCase):
 		self.placeholder_attributes = {'vbo_id': self.vbo_id}
 		self.placeholder_dwelling = PlaceholderDwelling(self.placeholder_attributes, self.connection)
 		self.region.dwellings.append(self.placeholder_dwelling)
+		self.region.index_dwellings()
 
 	def test_can_save_dwellings(self):
 		region = Region()
@@ -51,6 +52,7 @@ class TestRegion(unittest.TestCase):
 		dwelling_2 = Dwelling(attributes_2, self.connection)
 
 		self.region.dwellings = [dwelling_1]
+		self.region.index_dwellings()
 		# Attempt to add the same dwelling.
 		add_dwelling_partial = partial(self.region.add_dwelling, dwelling_2)
 
@@ -131,6 +133,44 @@ class TestRegion(unittest.TestCase):
 		self.region.add_dwelling(dwelling)
 		self.assertEqual(dwelling.processed_by, ['OtherModule', 'BaseModule'])
 
+	def test_can_replace_multiple_placeholders(self):
+		vbo_id_2 = '0363010000000002'
+		placeholder_dwelling_2 = PlaceholderDwelling({'vbo_id': vbo_id_2}, self.connection)
+		self.region.dwellings.append(placeholder_dwelling_2)
+		self.region.index_dwellings()
+
+		dwelling_2 = Dwelling({'vbo_id': vbo_id_2}, self.connection)
+		dwelling_1 = Dwelling({'vbo_id': self.vbo_id}, self.connection)
+		self.region.add_dwelling(dwelling_2)
+		self.region.add_dwelling(dwelling_1)
+		self.assertEqual(self.region.dwellings, [dwelling_1, dwelling_2])
+
+	def test_raises_when_adding_dwelling_twice(self):
+		self.region.add_dwelling(Dwelling({'vbo_id': self.vbo_id}, self.connection))
+
+		add_dwelling_partial = partial(self.region.add_dwelling, Dwelling({'vbo_id': self.vbo_id}, self.connection))
+		self.assertRaises(ValueError, add_dwelling_partial)
+
+	def test_raises_when_multiple_placeholders_match(self):
+		self.region.dwellings.append(PlaceholderDwelling(self.placeholder_attributes.copy(), self.connection))
+		self.region.index_dwellings()
+
+		add_dwelling_partial = partial(self.region.add_dwelling, Dwelling({'vbo_id': self.vbo_id}, self.connection))
+		self.assertRaises(ValueError, add_dwelling_partial)
+
+	def test_check_for_deletion_can_be_called_after_deletion(self):
+		# As when a batch of dwellings is saved.
+		vbo_id_2 = '0363010000000002'
+		self.region.dwellings.append(PlaceholderDwelling({'vbo_id': vbo_id_2}, self.connection))
+		self.region.index_dwellings()
+		self.region.n_placeholders = 2
+		self.region.add_dwelling(Dwelling({'vbo_id': self.vbo_id}, self.connection))
+		self.region.add_dwelling(Dwelling({'vbo_id': vbo_id_2}, self.connection))
+
+		self.region.check_for_deletion()
+		self.region.check_for_deletion()
+		self.assertIsNone(self.region.dwellings)
+
 class TestPC6(unittest.TestCase):
 
 	def setUp(self):
@@ -0,0 +1,81 @@
+import os
+import sys
+import unittest
+
+# Necessary to import modules from parent folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.classes import Dwelling
+from modules.regions_module import RegionCache, RegionsModule
+
+from tests.utils import get_mock_connection
+
+class ExampleRegion:
+
+	def __init__(self, n_placeholders=1):
+		self.n_placeholders = n_placeholders
+
+class TestRegionCache(unittest.TestCase):
+
+	def test_counts_hits_and_misses(self):
+		cache = RegionCache()
+		self.assertIsNone(cache.get('1000AA'))
+		region = ExampleRegion()
+		cache.add('1000AA', region)
+		self.assertIs(cache.get('1000AA'), region)
+		self.assertIs(cache.get('1000AA'), region)
+		self.assertEqual(cache.get_stats(), {'size': 1, 'hits': 2, 'misses': 1, 'evictions': 0})
+
+	def test_evicts_least_recently_used(self):
+		cache = RegionCache(max_size=2)
+		cache.add('1000AA', ExampleRegion())
+		cache.add('1000AB', ExampleRegion())
+		cache.get('1000AA')
+		cache.add('1000AC', ExampleRegion())
+		self.assertIn('1000AA', cache)
+		self.assertNotIn('1000AB', cache)
+		self.assertIn('1000AC', cache)
+		self.assertEqual(cache.evictions, 1)
+
+	def test_evicts_completed_regions(self):
+		cache = RegionCache()
+		region = ExampleRegion(n_placeholders=1)
+		cache.add('1000AA', region)
+		cache.dwelling_added('1000AA')
+		self.assertIn('1000AA', cache)
+		region.n_placeholders = 0
+		cache.dwelling_added('1000AA')
+		self.assertNotIn('1000AA', cache)
+
+	def test_can_keep_completed_regions(self):
+		cache = RegionCache(evict_on_complete=False)
+		cache.add('1000AA', ExampleRegion(n_placeholders=0))
+		cache.dwelling_added('1000AA')
+		self.assertIn('1000AA', cache)
+
+class TestRegionsModule(unittest.TestCase):
+
+	def setUp(self):
+		query_dict = {
+			('SELECT vbo_id FROM bag WHERE pc6 = %s', ('1000AA',)): [('0003010000000001',), ('0003010000000002',)],
+			('SELECT vbo_id FROM bag WHERE buurt_id = %s', ('BU00000000',)): [('0003010000000001',), ('0003010000000002',)]
+		}
+		self.connection = get_mock_connection(query_dict)
+
+	def get_dwelling(self, vbo_id):
+		return Dwelling({'vbo_id': vbo_id, 'pc6': '1000AA', 'buurt_id': 'BU00000000'}, self.connection)
+
+	def test_evicts_regions_after_last_dwelling(self):
+		regions_module = RegionsModule(self.connection, silent=True)
+		dwelling_1 = self.get_dwelling('0003010000000001')
+		regions_module.process(dwelling_1)
+		self.assertIn('1000AA', regions_module.pc6s)
+		self.assertIn('BU00000000', regions_module.buurten)
+
+		dwelling_2 = self.get_dwelling('0003010000000002')
+		regions_module.process(dwelling_2)
+		# The dwellings still have their regions.
+		self.assertIs(dwelling_2.regions['pc6'], dwelling_1.regions['pc6'])
+		self.assertNotIn('1000AA', regions_module.pc6s)
+		self.assertNotIn('BU00000000', regions_module.buurten)
+		self.assertEqual(regions_module.get_cache_stats()['pc6'], {'size': 0, 'hits': 1, 'misses': 1, 'evictions': 1})
@@ -0,0 +1,98 @@
+import os
+import sys
+import unittest
+from unittest.mock import Mock
+
+import numpy as np
+from psycopg2.extras import NumericRange, Range
+
+# Necessary to import modules from parent folder
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.results_writer import ResultsWriter, format_copy_value, rows_to_copy_buffer
+
+class EnergyLabelClassRange(Range):
+	# Stand-in for the Range type that
+	# register_range() creates for 'energy_label_class_range'.
+	pass
+
+class TestFormatCopyValue(unittest.TestCase):
+
+	def test_formats_null(self):
+		self.assertEqual(format_copy_value(None), '\\N')
+
+	def test_formats_booleans(self):
+		self.assertEqual(format_copy_value(True), 't')
+		self.assertEqual(format_copy_value(False), 'f')
+		self.assertEqual(format_copy_value(np.True_), 't')
+
+	def test_formats_numbers(self):
+		self.assertEqual(format_copy_value(1), '1')
+		self.assertEqual(format_copy_value(0.25), '0.25')
+		self.assertEqual(format_copy_value(np.float64(0.25)), '0.25')
+
+	def test_escapes_special_characters(self):
+		self.assertEqual(format_copy_value('a\tb\nc\\d'), 'a\\tb\\nc\\\\d')
+
+	def test_formats_numrange(self):
+		numrange = NumericRange(2.01, 10, bounds='[]')
+		self.assertEqual(format_copy_value(numrange), '["2.01","10"]')
+
+	def test_formats_numrange_with_numpy_values(self):
+		numrange = NumericRange(np.float64(0.5), np.float64(1.5), bounds='[)')
+		self.assertEqual(format_copy_value(numrange), '["0.5","1.5")')
+
+	def test_formats_energy_label_class_range(self):
+		label_range = EnergyLabelClassRange('D', 'A+', bounds='[]')
+		self.assertEqual(format_copy_value(label_range), '["D","A+"]')
+
+	def test_formats_empty_and_infinite_ranges(self):
+		self.assertEqual(format_copy_value(NumericRange(empty=True)), 'empty')
+		self.assertEqual(format_copy_value(NumericRange(None, 3, bounds='(]')), '(,"3"]')
+
+	def test_formats_energy_label_class(self):
+		self.assertEqual(format_copy_value('A++'), 'A++')
+
+class TestResultsWriter(unittest.TestCase):
+
+	def setUp(self):
+		self.connection = Mock()
+		self.cursor = self.connection.cursor.return_value
+		self.writer = ResultsWriter(self.connection, flush_size=3)
+
+	def test_buffers_rows_until_flush_size(self):
+		self.writer.add({'vbo_id': '0363010000000001'})
+		self.writer.add({'vbo_id': '0363010000000002'})
+		self.cursor.copy_expert.assert_not_called()
+		self.writer.add({'vbo_id': '0363010000000003'})
+		self.cursor.copy_expert.assert_called_once()
+		self.assertEqual(self.writer.rows, [])
+		self.assertEqual(self.writer.n_written, 3)
+
+	def test_flush_writes_remaining_rows(self):
+		self.writer.add({'vbo_id': '0363010000000001', 'cooking': 'co01'})
+		self.writer.flush()
+		buffer = self.cursor.copy_expert.call_args[0][1]
+		self.assertEqual(buffer.read(), '0363010000000001\tco01\n')
+
+	def test_flush_without_rows_does_nothing(self):
+		self.writer.flush()
+		self.connection.cursor.assert_not_called()
+
+	def test_ignores_empty_rows(self):
+		self.writer.add({})
+		self.assertEqual(self.writer.rows, [])
+
+	def test_copies_rows_with_different_columns_separately(self):
+		self.writer.add({'vbo_id': '0363010000000001'})
+		self.writer.add({'vbo_id': '0363010000000002', 'cooking': 'co01'})
+		self.writer.flush()
+		self.assertEqual(self.cursor.copy_expert.call_count, 2)
+
+	def test_copy_buffer_has_one_line_per_row(self):
+		rows = [
+			{'vbo_id': '0363010000000001', 'gas_cooking_p': 0.5},
+			{'vbo_id': '0363010000000002', 'gas_cooking_p': None}
+		]
+		buffer = rows_to_copy_buffer(rows)
+		self.assertEqual(buffer.read(), '0363010000000001\t0.5\n0363010000000002\t\\N\n')
@@ -1,12 +1,13 @@
 import os
 import sys
 import unittest
+from unittest.mock import patch
 
 # Necessary to import modules from parent folder
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from modules.sampling_module import SamplingModule
-from modules.classes import Dwelling
+from modules.classes import Dwelling, DwellingFrame
 from utils.probability_utils import ProbabilityDistribution
 
 from tests.utils import get_mock_connection
@@ -84,3 +85,178 @@ class TestSamplingModule(unittest.TestCase):
 		# Should take 95% interval by default,
 		# should round to 2 decimals.
 		self.assertEqual(str(dwelling.attributes['example']), '[2.01, 10]')
+
+class TestSamplingModuleBatch(unittest.TestCase):
+
+	def setUp(self):
+		self.mock_connection = get_mock_connection(strict=False)
+		self.sampling_module = SamplingModule(self.mock_connection, silent=True)
+		self.outputs = {
+			'district_heating_space': {'type': 'boolean', 'sampling': True, 'distribution': 'district_heating_space_p', 'function': 'space'},
+			'gas_boiler_space': {'type': 'boolean', 'sampling': True, 'distribution': 'gas_boiler_space_p', 'function': 'space'},
+			'district_heating_water': {'type': 'boolean', 'sampling': True, 'distribution': 'district_heating_water_p', 'function': 'water'},
+			'gas_boiler_water': {'type': 'boolean', 'sampling': True, 'distribution': 'gas_boiler_water_p', 'function': 'water'},
+			'gas_cooking': {'type': 'boolean', 'sampling': True, 'distribution': 'gas_cooking_p', 'function': 'cooking'},
+			'electric_cooking': {'type': 'boolean', 'sampling': True, 'distribution': 'electric_cooking_p', 'function': 'cooking'}
+		}
+
+	def get_dwellings(self, attributes, n=10):
+		dwellings = []
+		for _ in range(n):
+			dwelling = Dwelling(attributes.copy(), self.mock_connection)
+			dwelling.outputs = self.outputs.copy()
+			dwellings.append(dwelling)
+		return dwellings
+
+	def test_matches_process_for_certain_probabilities(self):
+		attributes = {
+			'district_heating_space_p': 1,
+			'gas_boiler_space_p': 0,
+			'district_heating_water_p': 1,
+			'gas_boiler_water_p': 1,
+			'gas_cooking_p': 0,
+			'electric_cooking_p': 1.0
+		}
+		dwellings = self.get_dwellings(attributes)
+		self.sampling_module.process_batch(DwellingFrame(dwellings))
+		dwelling = self.get_dwellings(attributes, n=1)[0]
+		self.sampling_module.process(dwelling)
+
+		for batch_dwelling in dwellings:
+			self.assertEqual(batch_dwelling.attributes['space_heating'], 'sh01')
+			self.assertEqual(batch_dwelling.attributes['water_heating'], 'wh01_wh02')
+			self.assertEqual(batch_dwelling.attributes['cooking'], 'co02')
+			for name in ['space_heating', 'water_heating', 'cooking', 'district_heating_water', 'gas_cooking']:
+				self.assertEqual(batch_dwelling.attributes[name], dwelling.attributes[name])
+
+	def test_applies_water_space_dependency(self):
+		attributes = {
+			'district_heating_space_p': 0,
+			'gas_boiler_space_p': 1,
+			'district_heating_water_p': 1,
+			'gas_boiler_water_p': 1,
+			'gas_cooking_p': 1,
+			'electric_cooking_p': 0
+		}
+		dwellings = self.get_dwellings(attributes)
+		self.sampling_module.process_batch(DwellingFrame(dwellings))
+		for dwelling in dwellings:
+			self.assertFalse(dwelling.attributes['district_heating_water'])
+			self.assertEqual(dwelling.attributes['water_heating'], 'wh02')
+
+	def test_assigns_gas_when_sampling_fails(self):
+		attributes = {
+			'district_heating_space_p': 1,
+			'gas_boiler_space_p': 0,
+			'district_heating_water_p': 0,
+			'gas_boiler_water_p': 0,
+			'gas_cooking_p': 0,
+			'electric_cooking_p': 1
+		}
+		dwellings = self.get_dwellings(attributes)
+		self.sampling_module.process_batch(DwellingFrame(dwellings))
+		for dwelling in dwellings:
+			self.assertEqual(dwelling.attributes['water_heating'], 'wh02')
+			self.assertEqual(dwelling.attributes['cooking'], 'co02')
+
+	def test_does_not_process_dwellings_twice(self):
+		attributes = {
+			'district_heating_space_p': 0.5,
+			'gas_boiler_space_p': 0.5,
+			'district_heating_water_p': 0.5,
+			'gas_boiler_water_p': 0.5,
+			'gas_cooking_p': 0.5,
+			'electric_cooking_p': 0.5
+		}
+		dwellings = self.get_dwellings(attributes)
+		self.sampling_module.process_batch(DwellingFrame(dwellings))
+		codes = [dwelling.attributes['space_heating'] for dwelling in dwellings]
+		self.sampling_module.process_batch(DwellingFrame(dwellings))
+		self.assertEqual([dwelling.attributes['space_heating'] for dwelling in dwellings], codes)
+
+	def test_raises_valueerror_for_invalid_probability(self):
+		attributes = {
+			'district_heating_space_p': 1.5,
+			'gas_boiler_space_p': 0,
+			'district_heating_water_p': 0,
+			'gas_boiler_water_p': 0,
+			'gas_cooking_p': 0,
+			'electric_cooking_p': 1
+		}
+		self.assertRaises(ValueError, self.sampling_module.process_batch, DwellingFrame(self.get_dwellings(attributes)))
+
+	def get_seeded_dwellings(self, n=50):
+		attributes = {
+			'district_heating_space_p': 0.3,
+			'gas_boiler_space_p': 0.2,
+			'district_heating_water_p': 0.8,
+			'gas_boiler_water_p': 0.1,
+			'gas_cooking_p': 0.4,
+			'electric_cooking_p': 0.1
+		}
+		dwellings = self.get_dwellings(attributes, n)
+		for (i, dwelling) in enumerate(dwellings):
+			dwelling.attributes['vbo_id'] = f'03630100000{i:05}'
+		return dwellings
+
+	def get_codes(self, dwellings):
+		return [
+			(dwelling.attributes['space_heating'], dwelling.attributes['water_heating'], dwelling.attributes['cooking'])
+			for dwelling in dwellings
+		]
+
+	def test_seed_gives_same_samples(self):
+		dwellings = self.get_seeded_dwellings()
+		SamplingModule(self.mock_connection, silent=True, seed=1).process_batch(DwellingFrame(dwellings))
+
+		# In another order, in parts
+		other_dwellings = self.get_seeded_dwellings()
+		sampling_module = SamplingModule(self.mock_connection, silent=True, seed=1)
+		sampling_module.process_batch(DwellingFrame(other_dwellings[25:][::-1]))
+		sampling_module.process_batch(DwellingFrame(other_dwellings[:25]))
+		self.assertEqual(self.get_codes(dwellings), self.get_codes(other_dwellings))
+
+		# And one by one
+		single_dwellings = self.get_seeded_dwellings()
+		sampling_module = SamplingModule(self.mock_connection, silent=True, seed=1)
+		for dwelling in single_dwellings:
+			sampling_module.process(dwelling)
+		self.assertEqual(self.get_codes(dwellings), self.get_codes(single_dwellings))
+
+	def test_other_seed_gives_other_samples(self):
+		dwellings = self.get_seeded_dwellings()
+		SamplingModule(self.mock_connection, silent=True, seed=1).process_batch(DwellingFrame(dwellings))
+		other_dwellings = self.get_seeded_dwellings()
+		SamplingModule(self.mock_connection, silent=True, seed=2).process_batch(DwellingFrame(other_dwellings))
+		self.assertNotEqual(self.get_codes(dwellings), self.get_codes(other_dwellings))
+
+	def test_saves_realization_counts(self):
+		sampling_module = SamplingModule(self.mock_connection, silent=True, seed=1, realizations=20)
+		dwellings = self.get_seeded_dwellings(n=10)
+		for (i, dwelling) in enumerate(dwellings):
+			dwelling.attributes['buurt_id'] = 'BU03630000'
+			dwelling.attributes['pc6'] = '1011AB' if i < 4 else '1011AC'
+
+		with patch('modules.sampling_module.execute_values') as execute_values:
+			sampling_module.process_batch(DwellingFrame(dwellings))
+		rows = execute_values.call_args[0][2]
+		counts = {(pc6, installation): counts for (_, pc6, installation, counts) in rows}
+
+		self.assertEqual(len(rows), 2 * len(self.outputs))
+		self.assertEqual(len(counts[('1011AB', 'gas_cooking')]), 20)
+		# The first realization is the one of the dwellings.
+		self.assertEqual(
+			counts[('1011AB', 'gas_cooking')][0] + counts[('1011AC', 'gas_cooking')][0],
+			sum(dwelling.attributes['gas_cooking'] for dwelling in dwellings)
+		)
+		# And the same as without realizations.
+		other_dwellings = self.get_seeded_dwellings(n=10)
+		SamplingModule(self.mock_connection, silent=True, seed=1).process_batch(DwellingFrame(other_dwellings))
+		self.assertEqual(self.get_codes(dwellings), self.get_codes(other_dwellings))
+
+	def test_realizations_need_batch_processing(self):
+		sampling_module = SamplingModule(self.mock_connection, silent=True, seed=1, realizations=20)
+		(dwelling,) = self.get_seeded_dwellings(n=1)
+		with patch('modules.sampling_module.execute_values') as execute_values:
+			self.assertRaises(ValueError, sampling_module.process, dwelling)
+		execute_values.assert_not_called()
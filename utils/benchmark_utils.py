@@ -0,0 +1,101 @@
+import numpy as np
+
+class BenchmarkTable:
+	'''
+	Percentiles of a CBS benchmark table (e.g. the gas use of
+	dwellings by energy label, dwelling type, floor area class
+	and construction year class), loaded into memory at once.
+
+	Every combination of characteristics is coded as an index
+	into a NumPy array with the values at the percentiles
+	(the 'knots'), so a whole buurt can be compared against the
+	benchmark with a few array operations instead of a query
+	and an interpolation function per combination.
+	'''
+
+	def __init__(self, rows, percentiles=(5, 25, 50, 75, 95)):
+		'''
+		'rows' are tuples (characteristic_1, ..., characteristic_n, value).
+		Combinations that do not have a value for every percentile
+		have no benchmark.
+		'''
+		self.percentiles = np.array(percentiles, dtype=float)
+
+		groups = {}
+		for row in rows:
+			key = tuple(row[:-1])
+			if None not in key:
+				groups.setdefault(key, []).append(row[-1])
+
+		# Code every characteristic by the index of its
+		# value within that characteristic.
+		n_characteristics = len(next(iter(groups))) if len(groups) > 0 else 0
+		self.codes = [
+			{value: code for (code, value) in enumerate(sorted({key[i] for key in groups}))}
+			for i in range(n_characteristics)
+		]
+
+		shape = tuple(len(codes) for codes in self.codes)
+		self.knots = np.full(shape + (len(percentiles),), np.nan)
+		self.available = np.zeros(shape, dtype=bool)
+		for key, values in groups.items():
+			if None in values or len(values) != len(percentiles):
+				continue
+			index = tuple(self.codes[i][value] for (i, value) in enumerate(key))
+			self.knots[index] = sorted(values)
+			self.available[index] = True
+
+	def __len__(self):
+		return int(self.available.sum())
+
+	def encode(self, characteristics_tuples):
+		'''
+		Convert characteristics tuples to an array of codes
+		of shape (n, n_characteristics), with -1 for unknown
+		characteristics.
+		'''
+		encoded = np.array([
+			[self.codes[i].get(value, -1) for (i, value) in enumerate(characteristics_tuple)]
+			for characteristics_tuple in characteristics_tuples
+		], dtype=int).reshape(len(characteristics_tuples), len(self.codes))
+		return encoded
+
+	def compare(self, characteristics_tuples, values):
+		'''
+		Get the percentile (in [0, 100], but extrapolated beyond
+		the lowest and highest percentile) of every value compared
+		to the benchmark of its characteristics. Returns the array
+		of percentiles (NaN where there is no benchmark) and a
+		boolean array that indicates which values have a benchmark.
+
+		Equal to scipy's interp1d(knots, percentiles, fill_value='extrapolate')
+		per characteristics tuple: np.interp cannot extrapolate,
+		so we pick the segments ourselves.
+		'''
+		values = np.asarray(values, dtype=float)
+		encoded = self.encode(characteristics_tuples)
+		known = (encoded >= 0).all(axis=1)
+		has_benchmark = np.zeros(len(values), dtype=bool)
+		has_benchmark[known] = self.available[tuple(encoded[known].T)]
+
+		result = np.full(len(values), np.nan)
+		if not has_benchmark.any():
+			return result, has_benchmark
+
+		knots = self.knots[tuple(encoded[has_benchmark].T)]
+		x = values[has_benchmark]
+
+		# Same segment choice as interp1d: the first knot that is
+		# not smaller than the value, clipped to the outer segments.
+		upper = np.clip((knots < x[:, np.newaxis]).sum(axis=1), 1, len(self.percentiles) - 1)
+		lower = upper - 1
+		rows = np.arange(len(x))
+		x_lower = knots[rows, lower]
+		x_upper = knots[rows, upper]
+		y_lower = self.percentiles[lower]
+		y_upper = self.percentiles[upper]
+
+		with np.errstate(divide='ignore', invalid='ignore'):
+			slope = (y_upper - y_lower) / (x_upper - x_lower)
+		result[has_benchmark] = slope * (x - x_lower) + y_lower
+		return result, has_benchmark
@@ -12,15 +12,75 @@ CREATE TABLE IF NOT EXISTS results
 (
 	vbo_id character(16)
 );
+CREATE TABLE IF NOT EXISTS pipeline_progress
+(
+	buurt_id character(10) PRIMARY KEY,
+	n_dwellings integer,
+	finished_at timestamp DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS realization_counts
+(
+	buurt_id character(10),
+	pc6 character(6),
+	installation varchar,
+	counts integer[]
+);
 '''
 
 # DROP it first so we start fresh
 create_table_fresh_statement = '''
 DROP TABLE IF EXISTS results;
+DROP TABLE IF EXISTS pipeline_progress;
+DROP VIEW IF EXISTS realization_aggregates;
+DROP TABLE IF EXISTS realization_counts;
 CREATE TABLE IF NOT EXISTS results
 (
 	vbo_id character(16)
 );
+CREATE TABLE IF NOT EXISTS pipeline_progress
+(
+	buurt_id character(10) PRIMARY KEY,
+	n_dwellings integer,
+	finished_at timestamp DEFAULT now()
+);
+CREATE TABLE IF NOT EXISTS realization_counts
+(
+	buurt_id character(10),
+	pc6 character(6),
+	installation varchar,
+	counts integer[]
+);
+'''
+
+# The mean and percentiles over the realizations of the
+# number of dwellings with every installation, per buurt
+# and per pc6, see SamplingModule.save_realization_counts.
+create_view_statement = '''
+CREATE OR REPLACE VIEW realization_aggregates AS
+WITH realization_counts_unnested AS (
+	SELECT buurt_id, pc6, installation, realization, count
+	FROM realization_counts, unnest(counts) WITH ORDINALITY AS realizations(count, realization)
+),
+region_counts AS (
+	SELECT 'buurt' AS region_type, buurt_id::varchar AS region_id, installation, realization, SUM(count) AS count
+	FROM realization_counts_unnested
+	GROUP BY buurt_id, installation, realization
+	UNION ALL
+	SELECT 'pc6' AS region_type, pc6::varchar AS region_id, installation, realization, SUM(count) AS count
+	FROM realization_counts_unnested
+	GROUP BY pc6, installation, realization
+)
+SELECT
+	region_type,
+	region_id,
+	installation,
+	COUNT(*) AS realizations,
+	AVG(count) AS mean,
+	percentile_cont(0.05) WITHIN GROUP (ORDER BY count) AS p05,
+	percentile_cont(0.5) WITHIN GROUP (ORDER BY count) AS p50,
+	percentile_cont(0.95) WITHIN GROUP (ORDER BY count) AS p95
+FROM region_counts
+GROUP BY region_type, region_id, installation;
 '''
 
 def main(fresh=True):
@@ -29,6 +89,7 @@ def main(fresh=True):
 		execute(create_table_fresh_statement)
 	else:
 		execute(create_table_statement)
+	execute(create_view_statement)
 
 if __name__ == "__main__":
 	main()
@@ -1,9 +1,13 @@
+import json
 import os
+import random
 import sys
+import time
 
+import numpy as np
 import psycopg2
 from psycopg2 import sql
-from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT, AsIs
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT, AsIs, cursor as Cursor
 from psycopg2.extras import DictCursor
 from psycopg2.errors import InvalidTableDefinition, UndefinedColumn
 
@@ -12,11 +16,12 @@ from psycopg2.errors import InvalidTableDefinition, UndefinedColumn
 sys.path.append(os.path.dirname(__file__))
 from utils.file_utils import get_env
 
-env = get_env()
-
-def get_connection(dbname=env['POSTGRES_DBNAME']):
+def get_connection(dbname=None):
+	# The .env file is only read when connecting,
+	# so this module can be imported without it.
+	env = get_env()
 	return psycopg2.connect(
-		dbname=dbname,
+		dbname=dbname if dbname is not None else env['POSTGRES_DBNAME'],
 		user=env['POSTGRES_USER'],
 		password=env['POSTGRES_PASSWORD']
 	)
@@ -49,7 +54,9 @@ def execute_file(path):
 	with open(path, 'r') as file:
 		execute(file.read())
 
-def create_database(dbname=env['POSTGRES_DBNAME']):
+def create_database(dbname=None):
+	if dbname is None:
+		dbname = get_env()['POSTGRES_DBNAME']
 
 	create_statement = sql.SQL("CREATE DATABASE {}").format(sql.Identifier(dbname))
 
@@ -94,11 +101,13 @@ def create_table(table_name, columns):
 
 	execute(create_statement, (AsIs(columns_sql),))
 
-def table_exists(table_name, dbname=env['POSTGRES_DBNAME']):
+def table_exists(table_name, dbname=None):
 	'''
 	Check whether a table with name 'table_name' exists.
 	Return True or False.
 	'''
+	if dbname is None:
+		dbname = get_env()['POSTGRES_DBNAME']
 	# Adapted from https://stackoverflow.com/a/1874268/7770056
 	query = "SELECT exists(SELECT * FROM information_schema.tables WHERE table_catalog = %s AND table_name = %s)"
 	return execute(query, (dbname, table_name), fetch='one')[0]
@@ -252,3 +261,325 @@ def get_neighbourhoods_sample_UAE(connection):
 	sample = cursor.fetchall()
 	cursor.close()
 	return sample
+
+# Statements are attributed to the innermost module, regional
+# module or region (an instance of one of these classes) that
+# executes them. The classes are compared by name, since the modules
+# can be imported both as e.g. 'base_module' and
+# 'modules.base_module'.
+CALLER_BASE_CLASSES = {'BaseModule', 'BaseRegionalModule', 'Region'}
+
+def get_calling_module(max_depth=20):
+	'''
+	Get the class name of the innermost module, regional
+	module or region in the call stack, or None.
+	'''
+	frame = sys._getframe(1)
+	for _ in range(max_depth):
+		if frame is None:
+			break
+		caller = frame.f_locals.get('self')
+		if caller is not None and any(cls.__name__ in CALLER_BASE_CLASSES for cls in type(caller).__mro__):
+			return caller.__class__.__name__
+		frame = frame.f_back
+	return None
+
+def get_statement_text(query, cursor):
+	if isinstance(query, sql.Composable):
+		return query.as_string(cursor)
+	if isinstance(query, bytes):
+		return query.decode()
+	return query
+
+class StatementObserver:
+	'''
+	Observes the statements of the cursors of a connection,
+	see observe_statements(). Only statements that succeeded
+	are observed: after an error the transaction is aborted.
+	Subclasses override the methods of the events they need.
+	'''
+
+	def executed(self, cursor, query, vars, duration):
+		'''
+		Called after 'cursor' executed 'query' with 'vars'
+		in 'duration' seconds.
+		'''
+		pass
+
+	def executed_many(self, cursor, query, vars_list, duration):
+		self.executed(cursor, query, None, duration)
+
+	def copied(self, cursor, sql, duration):
+		self.executed(cursor, sql, None, duration)
+
+	def fetched(self, cursor, n_rows, duration):
+		'''
+		Called after 'cursor' fetched 'n_rows' rows, except
+		rows that are fetched by iterating over the cursor.
+		'''
+		pass
+
+class ObservedCursor:
+	'''
+	Calls its 'observers' (StatementObservers) after every
+	statement and fetch, see get_observed_cursor_class().
+	Observers that need the rows of a statement get them with
+	get_result_rows(), the fetch methods return them after that.
+	'''
+
+	observers = []
+	# The rows of the last statement, once
+	# get_result_rows() has fetched them.
+	result_rows = None
+	result_index = 0
+
+	def execute(self, query, vars=None):
+		self.result_rows = None
+		start_time = time.perf_counter()
+		result = super().execute(query, vars)
+		duration = time.perf_counter() - start_time
+		for observer in self.observers:
+			observer.executed(self, query, vars, duration)
+		return result
+
+	def executemany(self, query, vars_list):
+		# The observers can go over the parameters again.
+		vars_list = list(vars_list)
+		self.result_rows = None
+		start_time = time.perf_counter()
+		result = super().executemany(query, vars_list)
+		duration = time.perf_counter() - start_time
+		for observer in self.observers:
+			observer.executed_many(self, query, vars_list, duration)
+		return result
+
+	def copy_expert(self, sql, file, size=8192):
+		self.result_rows = None
+		start_time = time.perf_counter()
+		result = super().copy_expert(sql, file, size)
+		duration = time.perf_counter() - start_time
+		for observer in self.observers:
+			observer.copied(self, sql, duration)
+		return result
+
+	def get_result_rows(self):
+		'''
+		Get all rows of the last statement,
+		without fetching them for the caller.
+		'''
+		if self.result_rows is None:
+			self.result_rows = super().fetchall()
+			self.result_index = 0
+		return self.result_rows
+
+	def fetchone(self):
+		start_time = time.perf_counter()
+		if self.result_rows is None:
+			row = super().fetchone()
+		elif self.result_index < len(self.result_rows):
+			row = self.result_rows[self.result_index]
+			self.result_index += 1
+		else:
+			row = None
+		self.notify_fetched(0 if row is None else 1, time.perf_counter() - start_time)
+		return row
+
+	def fetchmany(self, size=None):
+		start_time = time.perf_counter()
+		if self.result_rows is None:
+			rows = super().fetchmany() if size is None else super().fetchmany(size)
+		else:
+			size = self.arraysize if size is None else size
+			rows = self.result_rows[self.result_index:self.result_index + size]
+			self.result_index += len(rows)
+		self.notify_fetched(len(rows), time.perf_counter() - start_time)
+		return rows
+
+	def fetchall(self):
+		start_time = time.perf_counter()
+		if self.result_rows is None:
+			rows = super().fetchall()
+		else:
+			rows = self.result_rows[self.result_index:]
+			self.result_index = len(self.result_rows)
+		self.notify_fetched(len(rows), time.perf_counter() - start_time)
+		return rows
+
+	def notify_fetched(self, n_rows, duration):
+		for observer in self.observers:
+			observer.fetched(self, n_rows, duration)
+
+	def __iter__(self):
+		if self.result_rows is None:
+			return super().__iter__()
+		return iter(self.fetchall())
+
+def get_observed_cursor_class(observers, base=Cursor):
+	'''
+	Get a subclass of cursor class 'base' that calls
+	'observers' after its statements (see ObservedCursor).
+	'''
+	return type('ObservedCursor', (ObservedCursor, base), {'observers': list(observers), 'observed_base': base})
+
+def observe_statements(connection, observer):
+	'''
+	Call 'observer' (a StatementObserver) after the statements
+	of the cursors of 'connection' (except cursors with their
+	own cursor_factory), after the observers it already has.
+	'''
+	cursor_factory = connection.cursor_factory or Cursor
+	if issubclass(cursor_factory, ObservedCursor):
+		connection.cursor_factory = get_observed_cursor_class(cursor_factory.observers + [observer], base=cursor_factory.observed_base)
+	else:
+		connection.cursor_factory = get_observed_cursor_class([observer], base=cursor_factory)
+
+class StatementStats(StatementObserver):
+	'''
+	The number of executions and the latencies of every
+	distinct statement (with the parameters left out), and
+	the modules that execute it. The 95th percentile is
+	computed from a random sample of at most 'sample_size'
+	latencies per statement. With an 'explain_threshold' (in
+	seconds), the first execution of a SELECT statement that
+	takes longer is run again with EXPLAIN (ANALYZE, BUFFERS).
+	'''
+
+	def __init__(self, explain_threshold=None, sample_size=1000):
+		self.explain_threshold = explain_threshold
+		self.sample_size = sample_size
+		self.statements = {}
+		self.random = random.Random(0)
+
+	def executed(self, cursor, query, vars, duration):
+		self.record(cursor, query, vars, duration)
+
+	def record(self, cursor, query, parameters, duration):
+		statement = get_statement_text(query, cursor)
+		if statement not in self.statements:
+			self.statements[statement] = {
+				'count': 0,
+				'total_time': 0.0,
+				'max_time': 0.0,
+				'samples': [],
+				'modules': {},
+				'explain': None
+			}
+		stats = self.statements[statement]
+		stats['count'] += 1
+		stats['total_time'] += duration
+		stats['max_time'] = max(stats['max_time'], duration)
+
+		# Reservoir sampling: every latency has the
+		# same probability to be in the sample.
+		if len(stats['samples']) < self.sample_size:
+			stats['samples'].append(duration)
+		else:
+			index = self.random.randrange(stats['count'])
+			if index < self.sample_size:
+				stats['samples'][index] = duration
+
+		module = get_calling_module()
+		stats['modules'][module] = stats['modules'].get(module, 0) + 1
+
+		if self.explain_threshold is not None and duration >= self.explain_threshold and stats['explain'] is None and is_explainable(statement):
+			stats['explain'] = explain(cursor.connection, query, parameters)
+
+	def get_report(self, include_samples=False):
+		'''
+		Get the statistics per statement, sorted by total time.
+		'''
+		return get_statement_report(self.statements, include_samples)
+
+	def save_report(self, path, include_samples=False):
+		with open(path, 'w') as file:
+			json.dump(self.get_report(include_samples), file, indent='\t')
+
+def get_statement_report(statements, include_samples=False):
+	report = []
+	for (statement, stats) in statements.items():
+		statement_report = {
+			'statement': statement,
+			'count': stats['count'],
+			'total_time': stats['total_time'],
+			'mean_time': stats['total_time'] / stats['count'],
+			'p95_time': float(np.percentile(stats['samples'], 95)) if len(stats['samples']) > 0 else None,
+			'max_time': stats['max_time'],
+			# JSON only has string keys, None is
+			# for statements outside of modules.
+			'modules': {str(module): count for (module, count) in stats['modules'].items()},
+			'explain': stats['explain']
+		}
+		if include_samples:
+			statement_report['samples'] = stats['samples']
+		report.append(statement_report)
+	report.sort(key=lambda statement_report: statement_report['total_time'], reverse=True)
+	return report
+
+def merge_statement_reports(reports, sample_size=1000):
+	'''
+	Merge statement reports that were saved with
+	include_samples=True, e.g. by the workers of the pipeline.
+	'''
+	rng = random.Random(0)
+	statements = {}
+	for report in reports:
+		for statement_report in report:
+			stats = statements.setdefault(statement_report['statement'], {
+				'count': 0,
+				'total_time': 0.0,
+				'max_time': 0.0,
+				'samples': [],
+				'modules': {},
+				'explain': None
+			})
+			stats['count'] += statement_report['count']
+			stats['total_time'] += statement_report['total_time']
+			stats['max_time'] = max(stats['max_time'], statement_report['max_time'])
+			stats['samples'] += statement_report.get('samples', [])
+			for (module, count) in statement_report['modules'].items():
+				stats['modules'][module] = stats['modules'].get(module, 0) + count
+			if stats['explain'] is None:
+				stats['explain'] = statement_report['explain']
+	for stats in statements.values():
+		if len(stats['samples']) > sample_size:
+			stats['samples'] = rng.sample(stats['samples'], sample_size)
+	return get_statement_report(statements)
+
+def is_explainable(statement):
+	'''
+	EXPLAIN ANALYZE executes the statement, so only
+	statements without side effects are explained.
+	'''
+	return statement.lstrip().upper().startswith('SELECT')
+
+def explain(connection, query, parameters=None):
+	'''
+	Get the output of EXPLAIN (ANALYZE, BUFFERS) for the query.
+	A savepoint makes sure that an error does not abort
+	the transaction of the connection.
+	'''
+	# A plain cursor, so this statement is not tracked itself.
+	cursor = Cursor(connection)
+	in_transaction = not connection.autocommit
+	try:
+		explain_statement = 'EXPLAIN (ANALYZE, BUFFERS) ' + cursor.mogrify(query, parameters).decode()
+		if in_transaction:
+			cursor.execute('SAVEPOINT explain_statement')
+		try:
+			cursor.execute(explain_statement)
+			return '\n'.join([line for (line,) in cursor.fetchall()])
+		except psycopg2.Error as e:
+			return f'EXPLAIN failed: {e}'
+		finally:
+			if in_transaction:
+				cursor.execute('ROLLBACK TO SAVEPOINT explain_statement')
+				cursor.execute('RELEASE SAVEPOINT explain_statement')
+	finally:
+		cursor.close()
+
+def track_statements(connection, statement_stats):
+	'''
+	Record the statements of the cursors of 'connection' in
+	'statement_stats' (except cursors with their own cursor_factory).
+	'''
+	observe_statements(connection, statement_stats)
@@ -0,0 +1,137 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+# Required for relative imports to also work when called
+# from project root directory.
+sys.path.append(os.path.dirname(__file__))
+from file_utils import data_dir
+
+ENERGY_LABEL_INDEX_DIR = os.path.join(data_dir, 'energy_label_index')
+
+# The values of the Postgres type 'energy_label_class',
+# in the order of the type (see setup.py). The labels
+# are stored by their index in this list.
+ENERGY_LABEL_CLASSES = ['G', 'F', 'E', 'D', 'C', 'B', 'A', 'A+', 'A++', 'A+++', 'A++++', 'A+++++']
+
+# vbo_ids are character(16)
+VBO_ID_DTYPE = 'S16'
+
+class EnergyLabelIndex:
+	'''
+	The energy labels of all dwellings, built once by
+	utils/energy_label_index_create.py and saved as NumPy
+	arrays, which are memory-mapped so every process
+	shares them. The vbo_ids are stored sorted as
+	fixed-width bytes, so a lookup is a binary search
+	instead of a query.
+
+	The labels are stored as codes (the index in
+	ENERGY_LABEL_CLASSES), the EPIs as float32, which
+	is the type of epi_imputed ('real') in Postgres.
+	'''
+
+	def __init__(self, path=ENERGY_LABEL_INDEX_DIR, mmap_mode='r'):
+		with open(os.path.join(path, 'info.json')) as file:
+			self.info = json.load(file)
+
+		self.vbo_ids = np.load(os.path.join(path, 'vbo_ids.npy'), mmap_mode=mmap_mode)
+		self.label_codes = np.load(os.path.join(path, 'label_codes.npy'), mmap_mode=mmap_mode)
+		self.epis = np.load(os.path.join(path, 'epis.npy'), mmap_mode=mmap_mode)
+
+	def __len__(self):
+		return len(self.vbo_ids)
+
+	def get_indexes(self, vbo_ids):
+		'''
+		Get the index of every vbo_id in the arrays,
+		with -1 for the vbo_ids without a label.
+		'''
+		vbo_ids = np.array([vbo_id.rstrip() for vbo_id in vbo_ids], dtype=VBO_ID_DTYPE)
+		indexes = np.searchsorted(self.vbo_ids, vbo_ids)
+		found = indexes < len(self.vbo_ids)
+		found[found] = self.vbo_ids[indexes[found]] == vbo_ids[found]
+		return np.where(found, indexes, -1)
+
+	def get_energy_label(self, vbo_id):
+		'''
+		Get (energy_label_class, energy_label_epi) of the
+		dwelling, or (None, None) if it has no label, like
+		EnergyLabelModule.get_energy_label().
+		'''
+		return self.get_energy_labels([vbo_id])[0]
+
+	def get_energy_labels(self, vbo_ids):
+		'''
+		Get a list with (energy_label_class, energy_label_epi)
+		for every vbo_id.
+		'''
+		indexes = self.get_indexes(vbo_ids)
+		found = indexes >= 0
+		label_codes = np.zeros(len(indexes), dtype=np.int8)
+		label_codes[found] = self.label_codes[indexes[found]]
+		epis = np.zeros(len(indexes), dtype=np.float32)
+		epis[found] = self.epis[indexes[found]]
+
+		return [
+			# The shortest string of the float32 is how
+			# Postgres returns a real, e.g. 0.7 instead of
+			# 0.699999988079071.
+			(ENERGY_LABEL_CLASSES[label_code], float(str(epi))) if is_found else (None, None)
+			for (is_found, label_code, epi) in zip(found.tolist(), label_codes.tolist(), epis)
+		]
+
+def build_energy_label_index(rows, path=ENERGY_LABEL_INDEX_DIR, signature=None):
+	'''
+	Build the EnergyLabelIndex from 'rows' (an iterable of
+	tuples (vbo_id, energieklasse, epi_imputed), e.g. a cursor)
+	and save it in 'path'. Like the queries of the
+	EnergyLabelModule, the first label of a dwelling
+	with multiple labels is used.
+	'''
+	label_codes_by_class = {label: code for (code, label) in enumerate(ENERGY_LABEL_CLASSES)}
+	vbo_ids = []
+	label_codes = []
+	epis = []
+	for (vbo_id, energy_label_class, energy_label_epi) in rows:
+		if vbo_id is None or energy_label_class is None or energy_label_epi is None:
+			continue
+		vbo_ids.append(vbo_id.rstrip())
+		label_codes.append(label_codes_by_class[energy_label_class])
+		epis.append(energy_label_epi)
+
+	vbo_ids = np.array(vbo_ids, dtype=VBO_ID_DTYPE)
+	# A stable sort keeps the labels of a
+	# dwelling in the order of 'rows'.
+	order = np.argsort(vbo_ids, kind='stable')
+	vbo_ids = vbo_ids[order]
+	is_first = np.ones(len(vbo_ids), dtype=bool)
+	is_first[1:] = vbo_ids[1:] != vbo_ids[:-1]
+	order = order[is_first]
+
+	os.makedirs(path, exist_ok=True)
+	info_path = os.path.join(path, 'info.json')
+	if os.path.exists(info_path):
+		os.remove(info_path)
+	np.save(os.path.join(path, 'vbo_ids.npy'), vbo_ids[is_first])
+	np.save(os.path.join(path, 'label_codes.npy'), np.array(label_codes, dtype=np.int8)[order])
+	np.save(os.path.join(path, 'epis.npy'), np.array(epis, dtype=np.float32)[order])
+	# Written last, so an interrupted build
+	# is not mistaken for a finished one.
+	with open(info_path, 'w') as file:
+		json.dump({'signature': signature}, file)
+
+def load_energy_label_index(signature=None, path=ENERGY_LABEL_INDEX_DIR):
+	'''
+	Load the EnergyLabelIndex, or get None when it has not
+	been built or (if 'signature' is given) is out of date.
+	'''
+	try:
+		energy_label_index = EnergyLabelIndex(path)
+	except FileNotFoundError:
+		return None
+	if signature is not None and energy_label_index.info.get('signature') != signature:
+		return None
+	return energy_label_index
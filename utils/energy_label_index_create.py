@@ -0,0 +1,40 @@
+import os
+import sys
+
+# Required for relative imports to also work when called
+# from project root directory.
+sys.path.append(os.path.dirname(__file__))
+from database_utils import get_connection
+from energy_label_index import ENERGY_LABEL_INDEX_DIR, build_energy_label_index, load_energy_label_index
+from pc6_stats_create_table import get_source_signature
+
+# Number of rows the server-side cursor
+# fetches at a time.
+ITERSIZE = 100000
+
+def main(force=False, path=ENERGY_LABEL_INDEX_DIR):
+	'''
+	(Re)build the energy label index, but only when the table
+	energy_labels has changed since it was last built (or
+	when 'force').
+	'''
+	source_signature = get_source_signature(['energy_labels'])
+	if not force and source_signature is not None and load_energy_label_index(source_signature, path) is not None:
+		print('   energy label index is up to date.')
+		return
+
+	print('   building energy label index...')
+	connection = get_connection()
+	# A named cursor is a server-side cursor, so the labels
+	# are streamed instead of loaded into memory at once.
+	cursor = connection.cursor(name='energy_label_index')
+	cursor.itersize = ITERSIZE
+	cursor.execute('SELECT vbo_id, energieklasse, epi_imputed FROM energy_labels WHERE vbo_id IS NOT null AND energieklasse IS NOT null AND epi_imputed > 0')
+	try:
+		build_energy_label_index(cursor, path, source_signature)
+	finally:
+		cursor.close()
+		connection.close()
+
+if __name__ == "__main__":
+	main(force='--force' in sys.argv)
@@ -1,5 +1,17 @@
 import bisect
 
+import numpy as np
+
+# Limits are inclusive maximums for the corresponding value,
+# e.g.
+#	0.5 --> A++
+#	0.51 -> A+.
+#
+# Note: technically the category 'A++' is 'A++ or higher',
+# but this eases further manipulations.
+EPI_LIMITS = [  0.5,  0.7, 1.05, 1.3, 1.6, 2.0, 2.4, 2.9     ]
+EPI_LABELS = ['A++', 'A+',  'A', 'B', 'C', 'D', 'E', 'F', 'G']
+
 def label_to_epi(label):
 	'''
 	Converts an energy label to the corresponding
@@ -32,16 +44,14 @@ def epi_to_label(epi):
 	energy label.
 	'''
 	# Method adapted from https://stackoverflow.com/a/53138486/7770056.
-	# Limits are inclusive maximums for the corresponding value,
-	# e.g.
-	#	0.5 --> A++
-	#	0.51 -> A+.
-	#
-	# Note: technically the category 'A++' is 'A++ or higher',
-	# but this eases further manipulations.
-
-	limits = [            0.5,  0.7, 1.05, 1.3, 1.6, 2.0, 2.4, 2.9     ]
-	values = [          'A++', 'A+',  'A', 'B', 'C', 'D', 'E', 'F', 'G']
+	index = bisect.bisect_left(EPI_LIMITS, epi)
+	return EPI_LABELS[index]
 
-	index = bisect.bisect_left(limits, epi)
-	return values[index]
+def epis_to_labels(epis):
+	'''
+	Like epi_to_label(), for an array of EPIs at once.
+	Returns an array of labels (of dtype object).
+	'''
+	# side='left' finds the same index as bisect_left().
+	indexes = np.searchsorted(EPI_LIMITS, np.asarray(epis, dtype=float), side='left')
+	return np.array(EPI_LABELS, dtype=object)[indexes]
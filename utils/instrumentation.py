@@ -0,0 +1,179 @@
+import glob
+import json
+import os
+import time
+
+from utils.database_utils import StatementObserver, observe_statements
+
+# Methods of the modules that are timed, if the module has them.
+MODULE_METHODS = ['process', 'process_batch', 'process_region', 'process_pc6', 'process_buurt']
+
+# Label of the time and statements outside of the modules.
+PIPELINE_LABEL = ('pipeline', 'other')
+
+def get_empty_stats():
+	return {
+		'calls': 0,
+		# Wall time, including the time of calls to other
+		# timed methods ('self_time' excludes it).
+		'time': 0.0,
+		'self_time': 0.0,
+		'statements': 0,
+		'rows': 0,
+		'db_time': 0.0
+	}
+
+class Instrumentation(StatementObserver):
+	'''
+	Records for every (timed) method of every module the
+	number of calls and the wall time, and the number of SQL
+	statements, the fetched rows and the time spent in the
+	database during these calls. Statements are attributed to
+	the innermost method that is running, e.g. the
+	process_buurt() of a regional module that runs when
+	the RegionsModule creates a buurt.
+	'''
+
+	def __init__(self):
+		self.start_time = time.time()
+		# Stats by (owner, method), e.g. ('GasCookingModule', 'process').
+		self.stats = {}
+		# The running methods: [label, start time, time in other timed methods].
+		self.stack = []
+
+	def get_stats(self, label):
+		if label not in self.stats:
+			self.stats[label] = get_empty_stats()
+		return self.stats[label]
+
+	def enter(self, label):
+		self.stack.append([label, time.perf_counter(), 0.0])
+
+	def exit(self):
+		(label, start_time, child_time) = self.stack.pop()
+		elapsed = time.perf_counter() - start_time
+		stats = self.get_stats(label)
+		stats['calls'] += 1
+		stats['time'] += elapsed
+		stats['self_time'] += elapsed - child_time
+		if len(self.stack) > 0:
+			self.stack[-1][2] += elapsed
+
+	def wrap(self, function, label):
+		'''
+		Get 'function', timed under 'label'.
+		'''
+		def timed_function(*args, **kwargs):
+			self.enter(label)
+			try:
+				return function(*args, **kwargs)
+			finally:
+				self.exit()
+		return timed_function
+
+	def instrument_module(self, module):
+		'''
+		Time the methods of 'module'. The timed methods replace
+		the methods on the instance, so the calls that modules
+		make to their own methods are timed as well.
+		'''
+		for method in MODULE_METHODS:
+			if hasattr(module, method):
+				setattr(module, method, self.wrap(getattr(module, method), (module.__class__.__name__, method)))
+
+	def instrument_connection(self, connection):
+		'''
+		Record the statements of the cursors of 'connection'
+		(except cursors with their own cursor_factory).
+		'''
+		observe_statements(connection, self)
+
+	def executed(self, cursor, query, vars, duration):
+		self.record_statement(duration)
+
+	def fetched(self, cursor, n_rows, duration):
+		self.record_fetch(duration, n_rows)
+
+	def record_statement(self, duration):
+		stats = self.get_stats(self.stack[-1][0] if len(self.stack) > 0 else PIPELINE_LABEL)
+		stats['statements'] += 1
+		stats['db_time'] += duration
+
+	def record_fetch(self, duration, n_rows):
+		stats = self.get_stats(self.stack[-1][0] if len(self.stack) > 0 else PIPELINE_LABEL)
+		stats['rows'] += n_rows
+		stats['db_time'] += duration
+
+	def get_report(self):
+		'''
+		Get the stats as a dict, by owner (module
+		class) and method, that can be saved as JSON.
+		'''
+		report = {
+			'elapsed': time.time() - self.start_time,
+			'modules': {}
+		}
+		for ((owner, method), stats) in sorted(self.stats.items()):
+			report['modules'].setdefault(owner, {})[method] = dict(stats)
+		return report
+
+	def get_summary(self, n=5):
+		'''
+		Get lines with the 'n' methods with the most self time.
+		'''
+		return format_summary(self.get_report(), n)
+
+	def save_report(self, path):
+		with open(path, 'w') as file:
+			json.dump(self.get_report(), file, indent='\t')
+
+def format_summary(report, n=5):
+	methods = [
+		(owner, method, stats)
+		for (owner, methods) in report['modules'].items()
+		for (method, stats) in methods.items()
+	]
+	methods.sort(key=lambda item: item[2]['self_time'], reverse=True)
+	return [
+		f"{owner}.{method}: {stats['self_time']:.2f} s ({stats['calls']:,} calls, {stats['statements']:,} statements, {stats['rows']:,} rows, {stats['db_time']:.2f} s in database)"
+		for (owner, method, stats) in methods[:n]
+	]
+
+def merge_reports(reports):
+	'''
+	Add up the reports of e.g. the workers of the
+	pipeline. The elapsed time is the longest.
+	'''
+	merged = {
+		'elapsed': max([report['elapsed'] for report in reports], default=0),
+		'modules': {}
+	}
+	for report in reports:
+		for (owner, methods) in report['modules'].items():
+			for (method, stats) in methods.items():
+				merged_stats = merged['modules'].setdefault(owner, {}).setdefault(method, get_empty_stats())
+				for key in merged_stats:
+					merged_stats[key] += stats.get(key, 0)
+	return merged
+
+def get_worker_report_path(path, pid):
+	return f'{path}.worker-{pid}'
+
+def merge_worker_reports(path, merge=merge_reports):
+	'''
+	Merge the reports that the workers saved next to 'path'
+	(see get_worker_report_path()) with the function 'merge'
+	into one report at 'path', and remove them. Returns the
+	merged report.
+	'''
+	reports = []
+	worker_paths = glob.glob(glob.escape(path) + '.worker-*')
+	for worker_path in worker_paths:
+		with open(worker_path) as file:
+			reports.append(json.load(file))
+	report = merge(reports)
+	with open(path, 'w') as file:
+		json.dump(report, file, indent='\t')
+	for worker_path in worker_paths:
+		os.remove(worker_path)
+	return report
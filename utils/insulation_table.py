@@ -0,0 +1,165 @@
+import datetime
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+from psycopg2.extras import NumericRange
+
+# Required for relative imports to also work when called
+# from project root directory.
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from file_utils import data_dir
+from utils.probability_utils import ArrayProbabilityDistribution, ProbabilityDistribution
+from modules.insulation_data import INSULATION_DATA
+
+INSULATION_TABLE_DIR = os.path.join(data_dir, 'insulation_table')
+
+# The construction years in the table, every year
+# outside of these is processed by the InsulationModule.
+YEAR_MIN = 1800
+
+def get_year_max():
+	return datetime.date.today().year
+
+def get_signature(insulation_module):
+	'''
+	Get a string that changes when the results in the table
+	would change: when the insulation data or the options
+	of the module change. Years that are not in the table
+	are processed by the module, so they don't matter.
+	'''
+	def serialize(data):
+		if type(data) == dict:
+			return {str(key): serialize(value) for (key, value) in data.items()}
+		elif isinstance(data, (ProbabilityDistribution, ArrayProbabilityDistribution)):
+			return str(ArrayProbabilityDistribution(data, normalize=False))
+		else:
+			return data
+
+	signature_data = {
+		'insulation_data': serialize(INSULATION_DATA),
+		'min_year_measure_after_construction': insulation_module.MIN_YEAR_MEASURE_AFTER_CONSTRUCTION,
+		'convolution_resolution': insulation_module.convolution_resolution
+	}
+	return hashlib.sha256(json.dumps(signature_data, sort_keys=True).encode()).hexdigest()
+
+class InsulationTable:
+	'''
+	The results of the InsulationModule for every combination
+	of construction year and dwelling type, built once by
+	utils/insulation_table_create.py and saved as NumPy arrays,
+	which are memory-mapped so every process shares them.
+
+	The distributions of all keys and insulation types are
+	stored one after another in 'values', with rows (low, high, p),
+	where low == high for points. The distribution with flat index
+	i is in values[offsets[i]:offsets[i + 1]]. The means and 95%
+	intervals are stored separately, so the InsulationModule can
+	look up its outputs without rebuilding the distributions.
+	'''
+
+	insulation_types = ['facade', 'roof', 'floor', 'window']
+
+	def __init__(self, path=INSULATION_TABLE_DIR, mmap_mode='r'):
+		with open(os.path.join(path, 'info.json')) as file:
+			self.info = json.load(file)
+
+		self.year_min = self.info['year_min']
+		self.year_max = self.info['year_max']
+		self.dwelling_types = self.info['dwelling_types']
+		self.type_indexes = {dwelling_type: index for (index, dwelling_type) in enumerate(self.dwelling_types)}
+
+		# shape (n_years, n_dwelling_types, n_insulation_types)
+		self.means = np.load(os.path.join(path, 'means.npy'), mmap_mode=mmap_mode)
+		# shape (n_years, n_dwelling_types, n_insulation_types, 2)
+		self.intervals = np.load(os.path.join(path, 'intervals.npy'), mmap_mode=mmap_mode)
+		self.offsets = np.load(os.path.join(path, 'offsets.npy'), mmap_mode=mmap_mode)
+		self.values = np.load(os.path.join(path, 'values.npy'), mmap_mode=mmap_mode)
+
+	def get_indexes(self, construction_year, dwelling_type):
+		'''
+		Get the indexes of the year and dwelling type,
+		or None if they are not in the table.
+		'''
+		if construction_year is None or not (self.year_min <= construction_year <= self.year_max):
+			return None
+		if dwelling_type not in self.type_indexes:
+			return None
+		return (int(construction_year) - self.year_min, self.type_indexes[dwelling_type])
+
+	def get_distributions(self, construction_year, dwelling_type):
+		'''
+		Get the distributions like InsulationModule._process()
+		returns them, or None if the key is not in the table.
+		'''
+		indexes = self.get_indexes(construction_year, dwelling_type)
+		if indexes is None:
+			return None
+		(year_index, type_index) = indexes
+
+		distributions = {}
+		for (insulation_index, insulation_type) in enumerate(self.insulation_types):
+			index = (year_index * len(self.dwelling_types) + type_index) * len(self.insulation_types) + insulation_index
+			values = np.array(self.values[self.offsets[index]:self.offsets[index + 1]])
+			is_point = values[:, 0] == values[:, 1]
+			distributions[f'insulation_{insulation_type}_r_dist'] = ArrayProbabilityDistribution.from_arrays(
+				values[is_point, 0],
+				values[is_point, 2],
+				values[~is_point, 0],
+				values[~is_point, 1],
+				values[~is_point, 2],
+				normalize=False
+			)
+		return distributions
+
+	def get_outputs(self, construction_year, dwelling_type):
+		'''
+		Get the outputs of the InsulationModule (the means and
+		95% intervals) like the SamplingModule samples them from
+		the distributions, or None if the key is not in the table.
+		'''
+		indexes = self.get_indexes(construction_year, dwelling_type)
+		if indexes is None:
+			return None
+		means = self.means[indexes].tolist()
+		intervals = self.intervals[indexes].tolist()
+
+		outputs = {}
+		for (insulation_index, insulation_type) in enumerate(self.insulation_types):
+			(low, high) = intervals[insulation_index]
+			outputs[f'insulation_{insulation_type}_r_mean'] = means[insulation_index]
+			outputs[f'insulation_{insulation_type}_r_95'] = NumericRange(round(low, 2), round(high, 2), bounds='[]')
+		return outputs
+
+	def get_summary(self, construction_year, dwelling_type):
+		'''
+		Get a dict with the mean and 95% interval
+		per insulation type, or None if the key
+		is not in the table.
+		'''
+		indexes = self.get_indexes(construction_year, dwelling_type)
+		if indexes is None:
+			return None
+		return {
+			insulation_type: {
+				'mean': float(self.means[indexes][insulation_index]),
+				'interval': tuple(self.intervals[indexes][insulation_index].tolist())
+			}
+			for (insulation_index, insulation_type) in enumerate(self.insulation_types)
+		}
+
+def load_insulation_table(signature, path=INSULATION_TABLE_DIR):
+	'''
+	Load the InsulationTable, or get None when it
+	has not been built or is out of date.
+	'''
+	try:
+		insulation_table = InsulationTable(path)
+	except FileNotFoundError:
+		return None
+	if insulation_table.info.get('signature') != signature:
+		return None
+	return insulation_table
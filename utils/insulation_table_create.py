@@ -0,0 +1,90 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+# Required for relative imports to also work when called
+# from project root directory.
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from insulation_table import INSULATION_TABLE_DIR, YEAR_MIN, InsulationTable, get_signature, get_year_max, load_insulation_table
+from modules.classes import Dwelling
+from modules.insulation_module import InsulationModule
+from utils.probability_utils import ArrayProbabilityDistribution
+
+class InsulationTableModule(InsulationModule):
+	'''
+	InsulationModule that doesn't need a database,
+	since it does not add its columns to 'results'.
+	'''
+
+	def create_required_columns(self):
+		pass
+
+def build_insulation_table(insulation_module, path=INSULATION_TABLE_DIR, year_min=YEAR_MIN, year_max=None):
+	'''
+	Process every construction year from 'year_min'
+	up to 'year_max' (default: this year) for every
+	dwelling type with 'insulation_module', and save
+	the results in 'path'.
+	'''
+	if year_max is None:
+		year_max = get_year_max()
+	years = range(year_min, year_max + 1)
+	dwelling_types = list(insulation_module.dwelling_type_multipliers.keys())
+	insulation_types = InsulationTable.insulation_types
+
+	means = np.empty((len(years), len(dwelling_types), len(insulation_types)))
+	intervals = np.empty((len(years), len(dwelling_types), len(insulation_types), 2))
+	offsets = [0]
+	values = []
+
+	for (year_index, construction_year) in enumerate(years):
+		for (type_index, dwelling_type) in enumerate(dwelling_types):
+			dwelling = Dwelling({'bouwjaar': construction_year, 'woningtype': dwelling_type}, None)
+			results = insulation_module._process(dwelling)
+			for (insulation_index, insulation_type) in enumerate(insulation_types):
+				distribution = ArrayProbabilityDistribution(results[f'insulation_{insulation_type}_r_dist'], normalize=False)
+				means[year_index, type_index, insulation_index] = distribution.mean
+				intervals[year_index, type_index, insulation_index] = distribution.interval(0.95)
+
+				values.append(np.column_stack([distribution.points, distribution.points, distribution.point_ps]))
+				values.append(np.column_stack([distribution.range_los, distribution.range_his, distribution.range_ps]))
+				offsets.append(offsets[-1] + len(distribution.points) + len(distribution.range_ps))
+
+	os.makedirs(path, exist_ok=True)
+	info_path = os.path.join(path, 'info.json')
+	if os.path.exists(info_path):
+		os.remove(info_path)
+	np.save(os.path.join(path, 'means.npy'), means)
+	np.save(os.path.join(path, 'intervals.npy'), intervals)
+	np.save(os.path.join(path, 'offsets.npy'), np.array(offsets, dtype=np.int64))
+	np.save(os.path.join(path, 'values.npy'), np.concatenate(values))
+	# Written last, so an interrupted build
+	# is not mistaken for a finished one.
+	info = {
+		'year_min': year_min,
+		'year_max': year_max,
+		'dwelling_types': dwelling_types,
+		'signature': get_signature(insulation_module)
+	}
+	with open(info_path, 'w') as file:
+		json.dump(info, file)
+
+def main(force=False, path=INSULATION_TABLE_DIR, **kwargs):
+	'''
+	(Re)build the insulation table, but only when it is
+	out of date (or when 'force'). 'kwargs' are the options
+	of the InsulationModule, e.g. convolution_resolution.
+	'''
+	insulation_module = InsulationTableModule(None, silent=True, **kwargs)
+	if not force and load_insulation_table(get_signature(insulation_module), path) is not None:
+		print('   insulation table is up to date.')
+		return
+
+	print('   building insulation table...')
+	build_insulation_table(insulation_module, path)
+
+if __name__ == "__main__":
+	main(force='--force' in sys.argv)
@@ -0,0 +1,54 @@
+import os
+import sys
+
+# Required for relative imports to also work when called
+# from project root directory.
+sys.path.append(os.path.dirname(__file__))
+from database_utils import execute, execute_file
+
+CREATE_TABLE_SQL = 'pc6_stats_create_table.sql'
+
+# Tables that pc6_stats is computed from.
+SOURCE_TABLES = ['bag', 'energy_labels', 'cbs_pc6_2019_energy_use', 'cbs_pc6_2017_kerncijfers']
+
+def get_source_signature(source_tables=SOURCE_TABLES):
+	'''
+	Get a string that changes when rows in one of the
+	source tables are inserted, updated or deleted, or
+	when a source table is recreated: the table oids and
+	the modification counters of the statistics collector.
+	'''
+	query = '''
+	SELECT string_agg(relname || ':' || relid || ':' || (n_tup_ins + n_tup_upd + n_tup_del), ',' ORDER BY relname)
+	FROM pg_stat_user_tables
+	WHERE relname = ANY(%s)
+	'''
+	return execute(query, (source_tables,), fetch='one')[0]
+
+def get_table_signature():
+	'''
+	Get the signature of the source tables at the time
+	pc6_stats was built, saved as the comment of the table.
+	None if the table does not exist.
+	'''
+	query = "SELECT obj_description(to_regclass('pc6_stats'), 'pg_class')"
+	return execute(query, fetch='one')[0]
+
+def main(force=False):
+	'''
+	(Re)build pc6_stats, but only when the source tables
+	have changed since it was last built (or when 'force').
+	'''
+	source_signature = get_source_signature()
+	if not force and source_signature is not None and source_signature == get_table_signature():
+		print('   pc6_stats is up to date.')
+		return
+
+	print('   building pc6_stats...')
+	folder = os.path.dirname(os.path.realpath(__file__))
+	path = os.path.join(folder, CREATE_TABLE_SQL)
+	execute_file(path)
+	execute('COMMENT ON TABLE pc6_stats IS %s', (source_signature,))
+
+if __name__ == "__main__":
+	main(force='--force' in sys.argv)
@@ -0,0 +1,54 @@
+-- Statistics per pc6 that the regional modules need, computed
+-- for all pc6s at once, see utils/pc6_stats_create_table.py.
+-- The filters follow the queries of the regional modules.
+DROP TABLE IF EXISTS pc6_stats;
+CREATE TABLE pc6_stats AS
+WITH
+bag_stats AS (
+	SELECT
+		pc6,
+		COUNT(vbo_id) AS number_of_dwellings,
+		SUM(oppervlakte) AS total_floor_space
+	FROM bag
+	WHERE pc6 IS NOT NULL
+	GROUP BY pc6
+),
+energy_use_stats AS (
+	SELECT
+		pc6,
+		MIN(gemiddelde_aardgaslevering_woningen) AS avg_gas_use,
+		MIN(gemiddelde_elektriciteitslevering_woningen) AS avg_elec_use
+	FROM cbs_pc6_2019_energy_use
+	WHERE gemiddelde_elektriciteitslevering_woningen IS NOT NULL
+	GROUP BY pc6
+),
+kerncijfers_stats AS (
+	SELECT
+		pc6,
+		MIN(gem_hh_gr) AS household_size
+	FROM cbs_pc6_2017_kerncijfers
+	WHERE gem_hh_gr IS NOT NULL
+	GROUP BY pc6
+),
+energy_label_stats AS (
+	SELECT
+		pc6,
+		AVG(LN(epi_imputed)) AS energy_label_epi_log_avg
+	FROM energy_labels
+	WHERE epi_imputed > 0
+	GROUP BY pc6
+)
+SELECT
+	bag_stats.pc6,
+	bag_stats.number_of_dwellings,
+	bag_stats.total_floor_space,
+	energy_use_stats.avg_gas_use,
+	energy_use_stats.avg_elec_use,
+	kerncijfers_stats.household_size,
+	energy_label_stats.energy_label_epi_log_avg
+FROM bag_stats
+LEFT JOIN energy_use_stats ON energy_use_stats.pc6 = bag_stats.pc6
+LEFT JOIN kerncijfers_stats ON kerncijfers_stats.pc6 = bag_stats.pc6
+LEFT JOIN energy_label_stats ON energy_label_stats.pc6 = bag_stats.pc6;
+
+ALTER TABLE pc6_stats ADD PRIMARY KEY (pc6);
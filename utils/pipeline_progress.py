@@ -0,0 +1,55 @@
+import time
+
+# A buurt that is already in 'pipeline_progress' can be
+# finished again when running the pipeline with --vbo_id.
+insert_progress_statement = '''
+INSERT INTO pipeline_progress (buurt_id, n_dwellings)
+VALUES (%s, %s)
+ON CONFLICT (buurt_id) DO NOTHING
+'''
+
+class Checkpointer:
+	'''
+	Commits the results of the pipeline at buurt boundaries,
+	every 'commit_every' dwellings or 'commit_interval'
+	seconds, whichever comes first.
+
+	Finished buurten are recorded in 'pipeline_progress' in
+	the same transaction as their results, so after a crash
+	the pipeline can continue with the first unfinished buurt
+	and only loses the work since the last commit.
+	'''
+
+	def __init__(self, connection, results_writer, commit_every=50000, commit_interval=300):
+		self.connection = connection
+		self.results_writer = results_writer
+		self.commit_every = commit_every
+		self.commit_interval = commit_interval
+
+		self.n_uncommitted = 0
+		self.n_commits = 0
+		self.last_commit_time = time.time()
+
+	def buurt_finished(self, buurt_id, n_dwellings):
+		'''
+		Record that all dwellings in the buurt have been
+		processed, and commit if it is time to do so.
+		'''
+		cursor = self.connection.cursor()
+		cursor.execute(insert_progress_statement, (buurt_id, n_dwellings))
+		cursor.close()
+
+		self.n_uncommitted += n_dwellings
+		if self.n_uncommitted >= self.commit_every or time.time() - self.last_commit_time >= self.commit_interval:
+			self.commit()
+
+	def commit(self):
+		'''
+		Write the buffered results and commit.
+		'''
+		self.results_writer.flush()
+		self.connection.commit()
+
+		self.n_uncommitted = 0
+		self.n_commits += 1
+		self.last_commit_time = time.time()
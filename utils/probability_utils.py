@@ -1,4 +1,7 @@
 import math
+import numbers
+
+import numpy as np
 
 class ProbabilityDistribution:
 
@@ -137,6 +140,14 @@ class ProbabilityDistribution:
 	def __rand__(self, other):
 		return self & other
 
+	def convolve(self, other, resolution=0.01, method='auto'):
+		'''
+		Approximation of self & other on a grid,
+		see ArrayProbabilityDistribution.convolve().
+		'''
+		pd = ArrayProbabilityDistribution(self, normalize=False).convolve(other, resolution=resolution, method=method)
+		return ProbabilityDistribution(list(pd.prob_points.items()))
+
 	def __copy__(self):
 		probs = [*self.prob_points.items(), *self.prob_ranges.items()]
 		return ProbabilityDistribution(probs, normalize=False)
@@ -454,3 +465,480 @@ class ProbabilityDistribution:
 			self.add_range_to_ranges(new_prob_ranges, prob_range)
 
 		return new_prob_ranges
+
+# Above this number of multiplications,
+# ArrayProbabilityDistribution.convolve() uses an FFT.
+CONVOLVE_DIRECT_MAX = 100000
+
+def hat_integral(u):
+	'''
+	Integral from -inf to u of the hat function max(0, 1 - |s|).
+	'''
+	u = np.clip(u, -1, 1)
+	return np.where(u < 0, (u + 1) ** 2 / 2, 1 - (1 - u) ** 2 / 2)
+
+def snap_to_grid(grid_values):
+	'''
+	Round values that are a floating point error away
+	from a grid point, e.g. 2.11 * 100 = 211.00000000000003
+	'''
+	rounded = np.round(grid_values)
+	return np.where(np.abs(grid_values - rounded) < 1e-9, rounded, grid_values)
+
+class ArrayProbabilityDistribution:
+	'''
+	Implementation of ProbabilityDistribution backed by
+	sorted NumPy arrays instead of dicts, with the same
+	public API.
+
+	Point masses are kept in 'points' (sorted, unique) with
+	their probabilities in 'point_ps'. Ranges are kept as
+	non-overlapping uniform segments 'range_los' to 'range_his'
+	with probabilities 'range_ps': overlapping ranges are split
+	at all their bounds at once, instead of recursively for
+	every added range. The cumulative probabilities that
+	interval() needs are computed with a cumsum, once.
+	'''
+
+	def __init__(self, prob_dist, normalize=True):
+		if isinstance(prob_dist, (ProbabilityDistribution, ArrayProbabilityDistribution)):
+			prob_dist = [*prob_dist.prob_points.items(), *prob_dist.prob_ranges.items()]
+		elif type(prob_dist) == dict:
+			prob_dist = prob_dist.items()
+		elif type(prob_dist) in [list, tuple]:
+			pass
+		else:
+			raise ValueError(f'ArrayProbabilityDistribution does not support type {type(prob_dist)} as prob_dist.')
+
+		points = []
+		point_ps = []
+		ranges = []
+		range_ps = []
+		for (key, val) in prob_dist:
+			if type(key) == tuple:
+				ranges.append(key)
+				range_ps.append(val)
+			else:
+				points.append(key)
+				point_ps.append(val)
+
+		ranges = np.array(ranges, dtype=float).reshape(len(ranges), 2)
+		self.set_arrays(
+			np.array(points, dtype=float),
+			np.array(point_ps, dtype=float),
+			ranges[:, 0],
+			ranges[:, 1],
+			np.array(range_ps, dtype=float)
+		)
+
+		# Only when multiplying a distribution with
+		# a number we explicitly do not normalize.
+		if normalize:
+			self.normalize()
+
+	@classmethod
+	def from_arrays(cls, points, point_ps, range_los, range_his, range_ps, normalize=True):
+		pd = cls.__new__(cls)
+		pd.set_arrays(points, point_ps, range_los, range_his, range_ps)
+		if normalize:
+			pd.normalize()
+		return pd
+
+	def set_arrays(self, points, point_ps, range_los, range_his, range_ps):
+		'''
+		Set the points and ranges from unsorted arrays that
+		can contain duplicate points and overlapping ranges.
+		'''
+		# A range without width is a point.
+		is_point = range_los == range_his
+		if is_point.any():
+			points = np.concatenate([points, range_los[is_point]])
+			point_ps = np.concatenate([point_ps, range_ps[is_point]])
+			range_los = range_los[~is_point]
+			range_his = range_his[~is_point]
+			range_ps = range_ps[~is_point]
+
+		# Like ProbabilityDistribution, we leave out values with p = 0.
+		nonzero = point_ps != 0
+		self.points, inverse = np.unique(points[nonzero], return_inverse=True)
+		self.point_ps = np.bincount(inverse.ravel(), weights=point_ps[nonzero], minlength=len(self.points)).astype(float)
+
+		nonzero = range_ps != 0
+		range_los = range_los[nonzero]
+		range_his = range_his[nonzero]
+		range_ps = range_ps[nonzero]
+
+		if len(range_ps) == 0:
+			self.range_los = np.empty(0)
+			self.range_his = np.empty(0)
+			self.range_ps = np.empty(0)
+		else:
+			# Split all ranges at all bounds into segments,
+			# and add up the probabilities of all ranges
+			# that cover a segment, proportional to its length.
+			bounds = np.unique(np.concatenate([range_los, range_his]))
+			starts = np.searchsorted(bounds, range_los)
+			ends = np.searchsorted(bounds, range_his)
+
+			n_segments = ends - starts
+			range_indexes = np.repeat(np.arange(len(range_ps)), n_segments)
+			segment_indexes = np.arange(n_segments.sum()) - np.repeat(np.cumsum(n_segments) - n_segments, n_segments) + starts[range_indexes]
+			segment_lengths = bounds[segment_indexes + 1] - bounds[segment_indexes]
+			fractions = segment_lengths / (range_his - range_los)[range_indexes]
+			segment_ps = np.bincount(segment_indexes, weights=range_ps[range_indexes] * fractions, minlength=len(bounds) - 1)
+			# Segments between ranges are not covered.
+			covered = np.bincount(segment_indexes, minlength=len(bounds) - 1) > 0
+
+			self.range_los = bounds[:-1][covered]
+			self.range_his = bounds[1:][covered]
+			self.range_ps = segment_ps[covered]
+
+		self._normalized = None
+		self._sorted = None
+
+	@property
+	def prob_points(self):
+		return dict(zip(self.points.tolist(), self.point_ps.tolist()))
+
+	@property
+	def prob_ranges(self):
+		return {
+			(lo, hi): p
+			for (lo, hi, p)
+			in zip(self.range_los.tolist(), self.range_his.tolist(), self.range_ps.tolist())
+		}
+
+	def __str__(self):
+		return f'ArrayProbabilityDistribution({self.get_sorted_probs()})'
+
+	def __add__(self, other):
+		if type(other) == ProbabilityDistribution:
+			other = ArrayProbabilityDistribution(other, normalize=False)
+		elif type(other) != ArrayProbabilityDistribution:
+			# Special case, required for sum() to work,
+			# see ProbabilityDistribution.__add__
+			if isinstance(other, numbers.Number) and other == 0:
+				return self
+			raise TypeError(f"Unsupported operation '+' for ArrayProbabilityDistribution and {type(other)}")
+
+		return ArrayProbabilityDistribution.from_arrays(
+			np.concatenate([self.points, other.points]),
+			np.concatenate([self.point_ps, other.point_ps]),
+			np.concatenate([self.range_los, other.range_los]),
+			np.concatenate([self.range_his, other.range_his]),
+			np.concatenate([self.range_ps, other.range_ps]),
+			normalize=False
+		)
+
+	def __radd__(self, other):
+		return self + other
+
+	def __mul__(self, other):
+		if not isinstance(other, numbers.Real):
+			return NotImplemented
+		# We shouldn't normalize, since then we revert exactly the
+		# multiplications that we tried to effect.
+		return ArrayProbabilityDistribution.from_arrays(
+			self.points,
+			self.point_ps * other,
+			self.range_los,
+			self.range_his,
+			self.range_ps * other,
+			normalize=False
+		)
+
+	def __rmul__(self, other):
+		return self * other
+
+	def __and__(self, other):
+		'''
+		Defines self & other, see ProbabilityDistribution.__and__.
+		'''
+		if isinstance(other, numbers.Real):
+			return ArrayProbabilityDistribution.from_arrays(
+				self.points + other,
+				self.point_ps,
+				self.range_los + other,
+				self.range_his + other,
+				self.range_ps
+			)
+
+		if type(other) == ProbabilityDistribution:
+			other = ArrayProbabilityDistribution(other, normalize=False)
+
+		if len(self.range_ps) > 0 and len(other.range_ps) > 0:
+			raise NotImplementedError('Currently no support for adding uniform ranges, since the result is not a uniform range.')
+
+		# All combinations of values, with the ranges
+		# of one shifted by the points of the other.
+		return ArrayProbabilityDistribution.from_arrays(
+			np.add.outer(self.points, other.points).ravel(),
+			np.outer(self.point_ps, other.point_ps).ravel(),
+			np.concatenate([np.add.outer(self.range_los, other.points).ravel(), np.add.outer(other.range_los, self.points).ravel()]),
+			np.concatenate([np.add.outer(self.range_his, other.points).ravel(), np.add.outer(other.range_his, self.points).ravel()]),
+			np.concatenate([np.outer(self.range_ps, other.point_ps).ravel(), np.outer(other.range_ps, self.point_ps).ravel()])
+		)
+
+	def __rand__(self, other):
+		return self & other
+
+	def discretize(self, resolution):
+		'''
+		Spread the probabilities over a grid with spacing
+		'resolution'. A value between two grid points is divided
+		between them in proportion to how close it is to each
+		(linear interpolation), so the mean stays the same.
+		Returns the grid index of the first grid point and the
+		probabilities of the grid points from there on (none
+		for an empty distribution).
+		'''
+		if len(self.points) == 0 and len(self.range_ps) == 0:
+			return 0, np.zeros(0)
+
+		# Divide by the inverse, so 211 / (1 / 0.01) = 2.11,
+		# like in convolve().
+		inverse_resolution = 1 / resolution
+		points = snap_to_grid(self.points * inverse_resolution)
+		range_los = snap_to_grid(self.range_los * inverse_resolution)
+		range_his = snap_to_grid(self.range_his * inverse_resolution)
+
+		grid_min = int(np.floor(np.concatenate([points, range_los]).min()))
+		grid_max = int(np.ceil(np.concatenate([points, range_his]).max()))
+		ps = np.zeros(grid_max - grid_min + 1)
+
+		below = np.floor(points)
+		fractions = points - below
+		below = below.astype(int) - grid_min
+		np.add.at(ps, below, self.point_ps * (1 - fractions))
+		# The fraction is 0 for points on the last grid point.
+		np.add.at(ps, np.minimum(below + 1, len(ps) - 1), self.point_ps * fractions)
+
+		# For a range, the probability of a grid point is the
+		# integral of the uniform density times the hat function
+		# of the grid point, which is nonzero from the grid point
+		# below the range up to the grid point above it.
+		firsts = np.floor(range_los).astype(int)
+		n_grid_points = np.ceil(range_his).astype(int) - firsts + 1
+		range_indexes = np.repeat(np.arange(len(self.range_ps)), n_grid_points)
+		grid_points = np.arange(n_grid_points.sum()) - np.repeat(np.cumsum(n_grid_points) - n_grid_points, n_grid_points) + firsts[range_indexes]
+		densities = self.range_ps / (range_his - range_los)
+		range_ps = densities[range_indexes] * (
+			hat_integral(range_his[range_indexes] - grid_points) - hat_integral(range_los[range_indexes] - grid_points)
+		)
+		np.add.at(ps, grid_points - grid_min, range_ps)
+
+		return grid_min, ps
+
+	def convolve(self, other, resolution=0.01, method='auto'):
+		'''
+		Approximation of self & other, that also works for two
+		distributions with ranges: both distributions are
+		discretized on a grid with spacing 'resolution' (see
+		discretize()) and convolved, 'direct'ly or with an 'fft'
+		('auto' picks the fastest).
+
+		The result only has points on the grid, so its size
+		depends on the width of the distributions and the
+		resolution, not on the number of values. The mean is
+		exact, interval() is off by at most about 'resolution'.
+		'''
+		if isinstance(other, numbers.Real):
+			return self & other
+		if type(other) == ProbabilityDistribution:
+			other = ArrayProbabilityDistribution(other, normalize=False)
+
+		grid_min_1, ps_1 = self.discretize(resolution)
+		grid_min_2, ps_2 = other.discretize(resolution)
+		empty = np.empty(0)
+		# Like self & other, the sum with an empty
+		# distribution is empty.
+		if len(ps_1) == 0 or len(ps_2) == 0:
+			return ArrayProbabilityDistribution.from_arrays(empty, empty, empty, empty, empty, normalize=False)
+
+		if method == 'auto':
+			method = 'direct' if len(ps_1) * len(ps_2) <= CONVOLVE_DIRECT_MAX else 'fft'
+
+		if method == 'direct':
+			ps = np.convolve(ps_1, ps_2)
+		elif method == 'fft':
+			n = len(ps_1) + len(ps_2) - 1
+			ps = np.fft.irfft(np.fft.rfft(ps_1, n) * np.fft.rfft(ps_2, n), n)
+			# Remove the rounding errors of the FFT,
+			# that can also be negative.
+			ps[ps < 1e-12 * ps.max()] = 0
+		else:
+			raise ValueError(f"Unknown convolution method '{method}', expected 'auto', 'direct' or 'fft'")
+
+		grid_points = np.arange(len(ps)) + grid_min_1 + grid_min_2
+		return ArrayProbabilityDistribution.from_arrays(grid_points / (1 / resolution), ps, empty, empty, empty)
+
+	def __copy__(self):
+		return ArrayProbabilityDistribution.from_arrays(
+			self.points.copy(),
+			self.point_ps.copy(),
+			self.range_los.copy(),
+			self.range_his.copy(),
+			self.range_ps.copy(),
+			normalize=False
+		)
+
+	def copy(self):
+		return self.__copy__()
+
+	def get_cum_p(self):
+		'''
+		Gets the total amount of probability assigned.
+		Is 1 for normalized distributions.
+		'''
+		return float(self.point_ps.sum() + self.range_ps.sum())
+
+	def normalize(self):
+		'''
+		Normalizes the distribution so all probabilities
+		sum up to 1.
+		'''
+		cum_p = self.get_cum_p()
+		self.point_ps = self.point_ps / cum_p
+		self.range_ps = self.range_ps / cum_p
+		self._normalized = True
+		self._sorted = None
+
+	@property
+	def is_normalized(self):
+		'''
+		Indicates whether all probabilities
+		sum up to 1 (normalized).
+		'''
+		if self._normalized is None:
+			self._normalized = math.isclose(self.get_cum_p(), 1)
+		return self._normalized
+
+	def pad(self):
+		'''
+		Normalize the distribution
+		by adding or updating the probability
+		for '0'. This doesn't change the mean.
+		'''
+		cum_p = self.get_cum_p()
+		if cum_p < 1:
+			index = np.searchsorted(self.points, 0)
+			if index < len(self.points) and self.points[index] == 0:
+				self.point_ps = self.point_ps.copy()
+				self.point_ps[index] += 1 - cum_p
+			else:
+				self.points = np.insert(self.points, index, 0)
+				self.point_ps = np.insert(self.point_ps, index, 1 - cum_p)
+			self._normalized = True
+			self._sorted = None
+
+	def p(self, value):
+		'''
+		Get the probability of 'value':
+		- if value is a number, retreive the point probability
+		- if value is a range (list or tuple), retreive the probability for the _inclusive_ range
+		'''
+		if type(value) in [list, tuple]:
+			if len(value) == 2:
+				val_min = value[0]
+				val_max = value[1]
+			else:
+				raise ValueError(f'Expected length of interval to be 2, but length is {len(value)}')
+
+			in_range = (val_min <= self.points) & (self.points <= val_max)
+			p_points = self.point_ps[in_range].sum()
+
+			intersection_lengths = np.clip(np.minimum(self.range_his, val_max) - np.maximum(self.range_los, val_min), 0, None)
+			p_ranges = (self.range_ps * intersection_lengths / (self.range_his - self.range_los)).sum()
+
+			return float(p_points + p_ranges)
+		else:
+			index = np.searchsorted(self.points, value)
+			if index < len(self.points) and self.points[index] == value:
+				return float(self.point_ps[index])
+			return 0
+
+	@property
+	def mean(self):
+		if not (self.is_normalized):
+			return None
+		else:
+			mean_points = (self.points * self.point_ps).sum()
+			mean_ranges = ((self.range_los + self.range_his) / 2 * self.range_ps).sum()
+			return float(mean_points + mean_ranges)
+
+	def get_sorted_probs(self):
+		values = {**self.prob_points, **self.prob_ranges}
+		sorted_items = sorted(values.items(), key=lambda val: val[0][0] if type(val[0]) is tuple else val[0])
+		return dict(sorted_items)
+
+	def get_sorted(self):
+		'''
+		Get the points and ranges together as arrays of
+		starts, ends and probabilities, with the orders
+		of ascending start and of descending end, and the
+		cumulative probabilities in those orders. Points go
+		before ranges with the same start or end, like in
+		ProbabilityDistribution.interval().
+		'''
+		if self._sorted is None:
+			starts = np.concatenate([self.points, self.range_los])
+			ends = np.concatenate([self.points, self.range_his])
+			ps = np.concatenate([self.point_ps, self.range_ps])
+			is_range = np.concatenate([np.zeros(len(self.points), dtype=bool), np.ones(len(self.range_ps), dtype=bool)])
+
+			ascending = np.lexsort((is_range, starts))
+			descending = np.lexsort((is_range, -ends))
+			self._sorted = {
+				'starts': starts,
+				'ends': ends,
+				'ps': ps,
+				'is_range': is_range,
+				'ascending': ascending,
+				'cum_ps_ascending': np.cumsum(ps[ascending]),
+				'descending': descending,
+				'cum_ps_descending': np.cumsum(ps[descending])
+			}
+		return self._sorted
+
+	def interval(self, confidence_value):
+		'''
+		Get the interval of values for which the probability is
+		at least 'confidence_value', see ProbabilityDistribution.interval().
+		'''
+		if not (self.is_normalized):
+			raise ValueError('Cannot compute interval() for the ArrayProbabilityDistribution since it is not normalized.')
+
+		if not (0 < confidence_value <= 1):
+			raise ValueError(f'Confidence value for interval should be in (0, 1] but was {confidence_value}')
+
+		threshold = (1 - confidence_value) / 2
+		sorted_ = self.get_sorted()
+
+		def get_threshold_item(order, cum_ps):
+			# Same comparison as math.isclose() to prevent floating
+			# point errors influencing the comparison.
+			is_close = np.abs(cum_ps - threshold) <= 1e-09 * np.maximum(np.abs(cum_ps), abs(threshold))
+			over_threshold = (cum_ps > threshold) & ~is_close
+			if not over_threshold.any():
+				raise ValueError(f'Cannot compute interval() for confidence value {confidence_value}')
+			index = int(np.argmax(over_threshold))
+			item = order[index]
+			# How much of the item's probability is needed to reach the threshold
+			p_required = threshold - (cum_ps[index] - sorted_['ps'][item])
+			return item, p_required
+
+		item, p_required = get_threshold_item(sorted_['ascending'], sorted_['cum_ps_ascending'])
+		if sorted_['is_range'][item]:
+			range_length = sorted_['ends'][item] - sorted_['starts'][item]
+			val_min = sorted_['starts'][item] + p_required / sorted_['ps'][item] * range_length
+		else:
+			val_min = sorted_['starts'][item]
+
+		item, p_required = get_threshold_item(sorted_['descending'], sorted_['cum_ps_descending'])
+		if sorted_['is_range'][item]:
+			range_length = sorted_['ends'][item] - sorted_['starts'][item]
+			val_max = sorted_['ends'][item] - p_required / sorted_['ps'][item] * range_length
+		else:
+			val_max = sorted_['ends'][item]
+
+		return (float(val_min), float(val_max))
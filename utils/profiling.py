@@ -0,0 +1,130 @@
+from collections import Counter
+import cProfile
+import os
+import signal
+import time
+
+# The interval timers of the sampling profiler: 'real' samples
+# every interval of wall time, including the time spent waiting
+# for the database, 'cpu' every interval of CPU time of the
+# process, which excludes it. By timer: (timer, signal, clock).
+TIMERS = {
+	'real': ('ITIMER_REAL', 'SIGALRM', time.perf_counter),
+	'cpu': ('ITIMER_PROF', 'SIGPROF', time.process_time)
+}
+
+class Profiler:
+	'''
+	Profiles the pipeline with cProfile (for a pstats file)
+	and with a sampling profiler that records the call stack
+	every 'interval' seconds (for a collapsed-stack file, the
+	input of flamegraph tools such as flamegraph.pl or
+	speedscope). With timer='real' (the default) these are
+	seconds of wall time, so the time that the pipeline waits
+	for the database shows up in the frames that run the
+	statements; with timer='cpu' they are seconds of CPU time,
+	which shows where the Python code itself spends its time.
+
+	With every=1 everything between start() and stop() is
+	profiled. With every=k, only every k-th call of profile()
+	is, e.g. the modules of every k-th dwelling, which
+	keeps the overhead of the profilers low.
+	'''
+
+	def __init__(self, every=1, interval=0.005, timer='real'):
+		if timer not in TIMERS:
+			raise ValueError(f"timer should be one of {', '.join(TIMERS)}, not '{timer}'")
+		self.every = every
+		self.interval = interval
+		(timer_name, signal_name, self.clock) = TIMERS[timer]
+		self.cprofile = cProfile.Profile()
+		self.stacks = Counter()
+		self.n_calls = 0
+		self.active = False
+		self.last_sample_time = None
+		# The sampling profiler needs an interval timer signal, which
+		# is not available on every platform (e.g. Windows).
+		self.sampling = hasattr(signal, 'setitimer') and hasattr(signal, signal_name)
+		if self.sampling:
+			self.timer = getattr(signal, timer_name)
+			self.signal = getattr(signal, signal_name)
+
+	def start(self):
+		if self.sampling:
+			self.previous_handler = signal.signal(self.signal, self.sample)
+			signal.setitimer(self.timer, self.interval, self.interval)
+		if self.every == 1:
+			self.enable()
+
+	def stop(self):
+		if self.every == 1:
+			self.disable()
+		if self.sampling:
+			signal.setitimer(self.timer, 0, 0)
+			signal.signal(self.signal, self.previous_handler)
+
+	def enable(self):
+		self.cprofile.enable()
+		self.last_sample_time = self.clock()
+		self.active = True
+
+	def disable(self):
+		self.active = False
+		self.cprofile.disable()
+
+	def profile(self, function, *args):
+		'''
+		Call function(*args), profiling every
+		'every'-th call (when every > 1).
+		'''
+		profile_call = self.every > 1 and self.n_calls % self.every == 0
+		self.n_calls += 1
+		if not profile_call:
+			return function(*args)
+
+		self.enable()
+		try:
+			return function(*args)
+		finally:
+			self.disable()
+
+	def sample(self, signal_number, frame):
+		if not self.active:
+			return
+		# The signal is handled when the interpreter runs again, so
+		# the intervals that expire during a statement (or another
+		# call into C) arrive as one signal. The sample is weighted
+		# by the number of intervals since the previous one.
+		now = self.clock()
+		weight = max(1, round((now - self.last_sample_time) / self.interval))
+		self.last_sample_time = now
+		self.stacks[get_collapsed_stack(frame)] += weight
+
+	def save(self, path):
+		'''
+		Save the profile to '{path}.pstats' and the sampled
+		stacks to '{path}.collapsed'. Returns the paths.
+		'''
+		pstats_path = f'{path}.pstats'
+		self.cprofile.dump_stats(pstats_path)
+		collapsed_path = f'{path}.collapsed'
+		with open(collapsed_path, 'w') as file:
+			for (stack, count) in self.stacks.most_common():
+				file.write(f'{stack} {count}\n')
+		return pstats_path, collapsed_path
+
+def get_frame_name(frame):
+	code = frame.f_code
+	return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+def get_collapsed_stack(frame):
+	'''
+	Get the stack of 'frame' in the collapsed-stack format:
+	the frames from the outermost to the innermost, separated
+	by semicolons.
+	'''
+	names = []
+	while frame is not None:
+		names.append(get_frame_name(frame).replace(';', ','))
+		frame = frame.f_back
+	return ';'.join(reversed(names))
@@ -0,0 +1,88 @@
+import hashlib
+
+import numpy as np
+
+# Constants of Philox4x32 (Salmon et al., 'Parallel random
+# numbers: as easy as 1, 2, 3', 2011).
+PHILOX_M0 = np.uint64(0xD2511F53)
+PHILOX_M1 = np.uint64(0xCD9E8D57)
+PHILOX_W0 = np.uint64(0x9E3779B9)
+PHILOX_W1 = np.uint64(0xBB67AE85)
+MASK_32 = np.uint64(0xFFFFFFFF)
+SHIFT_32 = np.uint64(32)
+
+def philox4x32(counters, key, rounds=10):
+	'''
+	The counter-based random number generator Philox4x32-10,
+	for many counters at once. 'counters' is an array of shape
+	(..., 4) with 32-bit words, 'key' a pair of 32-bit words.
+	Returns the random 32-bit words, in the same shape as
+	'counters'. Every counter gives independent random words,
+	so the numbers don't depend on the order they are drawn in.
+	'''
+	counters = np.asarray(counters, dtype=np.uint64)
+	c0, c1, c2, c3 = [counters[..., i] & MASK_32 for i in range(4)]
+	k0 = np.uint64(key[0]) & MASK_32
+	k1 = np.uint64(key[1]) & MASK_32
+
+	for i in range(rounds):
+		if i > 0:
+			k0 = (k0 + PHILOX_W0) & MASK_32
+			k1 = (k1 + PHILOX_W1) & MASK_32
+		# The products of two 32-bit words fit in 64 bits.
+		product_0 = PHILOX_M0 * c0
+		product_1 = PHILOX_M1 * c2
+		c0, c1, c2, c3 = (
+			(product_1 >> SHIFT_32) ^ c1 ^ k0,
+			product_1 & MASK_32,
+			(product_0 >> SHIFT_32) ^ c3 ^ k1,
+			product_0 & MASK_32
+		)
+
+	return np.stack([c0, c1, c2, c3], axis=-1).astype(np.uint32)
+
+def words_to_uniforms(high_words, low_words):
+	'''
+	Convert two arrays of random 32-bit words to
+	uniform doubles in [0, 1), with 53 random bits.
+	'''
+	high = high_words.astype(np.uint64) >> np.uint64(5)
+	low = low_words.astype(np.uint64) >> np.uint64(6)
+	return (high * np.uint64(1 << 26) + low).astype(float) / float(1 << 53)
+
+def get_stream_id(value, n_bytes=8):
+	'''
+	Get an integer of 'n_bytes' bytes to identify 'value' (e.g.
+	a vbo_id or output name) in the counter. Numeric strings
+	(vbo_ids) that fit are used as they are, other values are hashed.
+	'''
+	value = str(value)
+	if value.isdigit() and int(value) < 2 ** (8 * n_bytes):
+		return int(value)
+	return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=n_bytes).digest(), 'little')
+
+def get_uniforms(seed, vbo_ids, names, attempt=0, realizations=0):
+	'''
+	Get a uniform number in [0, 1) for every combination of
+	vbo_id and (output) name, as an array of shape
+	(len(vbo_ids), len(names)). The numbers only depend on
+	(seed, vbo_id, name, attempt, realization), so they are
+	the same whichever process or run draws them. 'realizations'
+	is one realization for all vbo_ids, or an array with the
+	realization of every vbo_id.
+	'''
+	vbo_stream_ids = np.array([get_stream_id(vbo_id) for vbo_id in vbo_ids], dtype=np.uint64)
+	name_stream_ids = np.array([get_stream_id(name, n_bytes=4) for name in names], dtype=np.uint64)
+
+	counters = np.empty((len(vbo_ids), len(names), 4), dtype=np.uint64)
+	counters[..., 0] = (vbo_stream_ids & MASK_32)[:, np.newaxis]
+	counters[..., 1] = (vbo_stream_ids >> SHIFT_32)[:, np.newaxis]
+	counters[..., 2] = name_stream_ids[np.newaxis, :]
+	# The attempts are small numbers, so they
+	# share the last word with the realization.
+	realizations = np.broadcast_to(np.asarray(realizations, dtype=np.uint64), (len(vbo_ids),))
+	counters[..., 3] = ((realizations << np.uint64(8)) | np.uint64(attempt))[:, np.newaxis]
+
+	seed = int(seed) % 2 ** 64
+	words = philox4x32(counters, (seed & 0xFFFFFFFF, seed >> 32))
+	return words_to_uniforms(words[..., 0], words[..., 1])
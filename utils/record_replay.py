@@ -0,0 +1,350 @@
+from collections import Counter
+import datetime
+import decimal
+import gzip
+import json
+
+from psycopg2 import ProgrammingError, sql
+from psycopg2.extensions import AsIs, adapt
+
+from utils.database_utils import StatementObserver, observe_statements
+
+# Version of the file format of Recording.save().
+RECORDING_VERSION = 1
+
+def render_query(query):
+	'''
+	Get the text of a query, which can be a string, bytes
+	or a psycopg2.sql.Composable. Unlike Composable.as_string(),
+	this needs no connection, so the text is the same when
+	recording and when replaying.
+	'''
+	if isinstance(query, bytes):
+		return query.decode()
+	if isinstance(query, sql.Composed):
+		return ''.join([render_query(part) for part in query.seq])
+	if isinstance(query, sql.SQL):
+		return query.string
+	if isinstance(query, sql.Identifier):
+		return '.'.join([f'"{string}"' for string in query.strings])
+	if isinstance(query, sql.Literal):
+		return quote_value(query.wrapped)
+	if isinstance(query, sql.Placeholder):
+		return '%s' if query.name is None else f'%({query.name})s'
+	return query
+
+def quote_value(value):
+	'''
+	Quote 'value' for a statement the way psycopg2 adapts it
+	on a UTF8 connection, e.g. NULL, 'O''Brien' or ARRAY[1,2].
+	'''
+	if isinstance(value, list) and len(value) > 0:
+		# The List adapter only gets the encoding
+		# for its strings from a connection.
+		return f"ARRAY[{','.join([quote_value(item) for item in value])}]"
+	adapted = adapt(value)
+	if hasattr(adapted, 'encoding'):
+		adapted.encoding = 'utf8'
+	return adapted.getquoted().decode()
+
+def mogrify(query, vars=None):
+	'''
+	Like cursor.mogrify() of psycopg2, but without
+	a connection (see render_query()).
+	'''
+	statement = render_query(query)
+	if isinstance(vars, dict):
+		statement = statement % {key: quote_value(value) for (key, value) in vars.items()}
+	elif vars is not None:
+		statement = statement % tuple([quote_value(value) for value in vars])
+	return statement.encode()
+
+def normalize_statement(statement):
+	'''
+	Collapse the whitespace of a statement, so it
+	does not matter how the query is indented.
+	'''
+	return ' '.join(statement.split()).rstrip(';').rstrip()
+
+def encode_value(value):
+	'''
+	Encode the values that JSON does not have.
+	'''
+	if isinstance(value, decimal.Decimal):
+		return {'decimal': str(value)}
+	if isinstance(value, datetime.date):
+		return {'date': value.isoformat()}
+	if isinstance(value, AsIs):
+		return {'as_is': value.getquoted().decode()}
+	raise TypeError(f'Cannot record a value of type {type(value).__name__}')
+
+def decode_value(value):
+	if isinstance(value, dict):
+		if 'decimal' in value:
+			return decimal.Decimal(value['decimal'])
+		if 'date' in value:
+			return datetime.date.fromisoformat(value['date'])
+	return value
+
+def get_parameters_key(parameters):
+	'''
+	Get a string that identifies the parameters of a
+	statement, e.g. '["1234AB"]'. Tuples and lists are
+	the same, as they are to psycopg2.
+	'''
+	if parameters is None:
+		return None
+	if isinstance(parameters, dict):
+		parameters = dict(parameters)
+	else:
+		parameters = list(parameters)
+	return json.dumps(parameters, default=encode_value, sort_keys=True, ensure_ascii=False)
+
+class Recording(StatementObserver):
+	'''
+	The statements that were executed on a connection (see
+	record_statements()), with their parameters and result rows,
+	so they can be replayed without a database (see
+	ReplayConnection).
+
+	Every statement text and every distinct result is stored
+	once, so a recording of a few buurten stays small.
+	'''
+
+	def __init__(self, statements=None, results=None, executions=None):
+		self.statements = statements if statements is not None else []
+		self.results = results if results is not None else []
+		# Tuples (statement index, parameters key, result index).
+		self.executions = executions if executions is not None else []
+		self.statement_indexes = {statement: index for (index, statement) in enumerate(self.statements)}
+		self.result_indexes = {json.dumps(result, default=encode_value): index for (index, result) in enumerate(self.results)}
+
+	def __len__(self):
+		return len(self.executions)
+
+	def executed(self, cursor, query, vars, duration):
+		# The rows are fetched all at once, the cursor
+		# returns them to its caller afterwards.
+		rows = None
+		if cursor.description is not None:
+			rows = cursor.get_result_rows()
+		self.record(query, vars, rows)
+
+	def executed_many(self, cursor, query, vars_list, duration):
+		# No results, so the statement
+		# can be recorded once.
+		for vars in vars_list:
+			self.record(query, vars, None)
+
+	def copied(self, cursor, sql, duration):
+		# The rows that are copied are not recorded.
+		self.record(sql, None, None)
+
+	def record(self, query, parameters, rows):
+		'''
+		Record an execution of 'query' with 'parameters',
+		with 'rows' None for a statement without results.
+		'''
+		statement = normalize_statement(render_query(query))
+		if statement not in self.statement_indexes:
+			self.statement_indexes[statement] = len(self.statements)
+			self.statements.append(statement)
+
+		result = None if rows is None else [list(row) for row in rows]
+		result_key = json.dumps(result, default=encode_value)
+		if result_key not in self.result_indexes:
+			self.result_indexes[result_key] = len(self.results)
+			self.results.append(result)
+
+		self.executions.append((self.statement_indexes[statement], get_parameters_key(parameters), self.result_indexes[result_key]))
+
+	def save(self, path):
+		'''
+		Save the recording to 'path' as gzipped JSON.
+		'''
+		recording = {
+			'version': RECORDING_VERSION,
+			'statements': self.statements,
+			'results': self.results,
+			'executions': self.executions
+		}
+		with gzip.open(path, 'wt', encoding='utf-8') as file:
+			json.dump(recording, file, default=encode_value, ensure_ascii=False, separators=(',', ':'))
+
+def load_recording(path):
+	with gzip.open(path, 'rt', encoding='utf-8') as file:
+		recording = json.load(file, object_hook=decode_value)
+	if recording['version'] != RECORDING_VERSION:
+		raise ValueError(f"Recording {path} has version {recording['version']}, expected {RECORDING_VERSION}")
+	return Recording(recording['statements'], recording['results'], [tuple(execution) for execution in recording['executions']])
+
+def record_statements(connection, recording):
+	'''
+	Record the statements of the cursors of 'connection' in
+	'recording' (except cursors with their own cursor_factory).
+	'''
+	observe_statements(connection, recording)
+
+class ReplayConnection:
+	'''
+	Stands in for a connection by replaying a Recording: every
+	statement gets the rows that it got when it was recorded with
+	the same parameters. When a statement was recorded multiple
+	times with different results, these are replayed in order
+	(and the last one after that).
+
+	Statements that were not recorded are counted in 'missing',
+	see get_missing_report(). With 'strict', they raise a
+	NotImplementedError instead, like the mock connection of
+	the tests; otherwise they get no rows.
+	'''
+
+	def __init__(self, recording, strict=False):
+		self.recording = recording
+		self.strict = strict
+		self.cursor_factory = ReplayCursor
+		self.encoding = 'UTF8'
+		self.autocommit = False
+		self.closed = 0
+		self.missing = Counter()
+
+		# The result indexes of every (statement, parameters), in order.
+		self.result_queues = {}
+		for (statement_index, parameters_key, result_index) in recording.executions:
+			key = (recording.statements[statement_index], parameters_key)
+			self.result_queues.setdefault(key, []).append(result_index)
+		self.n_replayed = Counter()
+
+	def cursor(self, name=None, cursor_factory=None):
+		return (cursor_factory or self.cursor_factory)(self)
+
+	def commit(self):
+		pass
+
+	def rollback(self):
+		pass
+
+	def close(self):
+		self.closed = 1
+
+	def replay(self, query, parameters=None):
+		'''
+		Get the recorded rows of the statement, or
+		None for a statement without results.
+		'''
+		key = (normalize_statement(render_query(query)), get_parameters_key(parameters))
+		if key not in self.result_queues:
+			self.missing[key] += 1
+			if self.strict:
+				raise NotImplementedError(f'The statement was not recorded: {key[0]} with parameters {key[1]}')
+			return []
+
+		result_queue = self.result_queues[key]
+		result_index = result_queue[min(self.n_replayed[key], len(result_queue) - 1)]
+		self.n_replayed[key] += 1
+		result = self.recording.results[result_index]
+		if result is None:
+			return None
+		return [tuple(row) for row in result]
+
+	def get_missing_report(self):
+		'''
+		Get the statements that were not recorded, as a
+		list of dicts with the statement, parameters and
+		the number of executions, the most executed first.
+		'''
+		return [
+			{'statement': statement, 'parameters': parameters_key, 'count': count}
+			for ((statement, parameters_key), count) in self.missing.most_common()
+		]
+
+class RowsCursor:
+	'''
+	Stands in for a psycopg2 cursor (with the methods that
+	are used) and returns the rows of its statements from a
+	list. Subclasses get the rows of a statement in execute()
+	and pass them to set_rows(), None for a statement without
+	results. See ReplayCursor and benchmarks/stand_in.py.
+	'''
+
+	def __init__(self, connection):
+		self.connection = connection
+		self.rows = None
+		# Index in self.rows of the next row to fetch.
+		self.row_index = 0
+		self.rowcount = -1
+		self.arraysize = 1
+		self.closed = False
+
+	def execute(self, query, vars=None):
+		raise NotImplementedError
+
+	def set_rows(self, rows):
+		self.rows = rows
+		self.row_index = 0
+		self.rowcount = -1 if rows is None else len(rows)
+
+	def executemany(self, query, vars_list):
+		for vars in vars_list:
+			self.execute(query, vars)
+		self.set_rows(None)
+
+	def mogrify(self, query, vars=None):
+		# Used by execute_values(), which executes the
+		# statement with the values in it: quoted like
+		# psycopg2 does, so the statement is the same.
+		return mogrify(query, vars)
+
+	@property
+	def description(self):
+		# Only whether there are results, not their columns.
+		return None if self.rows is None else ()
+
+	def check_rows(self):
+		if self.rows is None:
+			raise ProgrammingError('no results to fetch')
+
+	def fetchone(self):
+		self.check_rows()
+		if self.row_index >= len(self.rows):
+			return None
+		row = self.rows[self.row_index]
+		self.row_index += 1
+		return row
+
+	def fetchmany(self, size=None):
+		self.check_rows()
+		size = self.arraysize if size is None else size
+		rows = self.rows[self.row_index:self.row_index + size]
+		self.row_index += len(rows)
+		return rows
+
+	def fetchall(self):
+		self.check_rows()
+		rows = self.rows[self.row_index:]
+		self.row_index = len(self.rows)
+		return rows
+
+	def __iter__(self):
+		return iter(self.fetchall())
+
+	def close(self):
+		self.closed = True
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+class ReplayCursor(RowsCursor):
+	'''
+	A cursor of a ReplayConnection.
+	'''
+
+	def execute(self, query, vars=None):
+		self.set_rows(self.connection.replay(query, vars))
+
+	def copy_expert(self, sql, file, size=8192):
+		self.connection.replay(sql)
+		file.read()
@@ -0,0 +1,123 @@
+import io
+
+import numpy as np
+from psycopg2 import sql
+from psycopg2.extras import Range
+
+class ResultsWriter:
+	'''
+	Buffers result rows in memory and writes them to the
+	'results' table in batches using COPY ... FROM STDIN.
+	This is a lot faster than doing an INSERT (and thus a
+	round-trip to the database) for every single dwelling.
+
+	Don't forget to call flush() before committing, otherwise
+	the rows still in the buffer will not be written.
+	'''
+
+	def __init__(self, connection, table_name='results', flush_size=10000):
+		self.connection = connection
+		self.table_name = table_name
+		self.flush_size = flush_size
+		self.rows = []
+		self.n_written = 0
+
+	def add(self, row_dict):
+		'''
+		Add 'row_dict' to the buffer, where every key is a
+		column_name in the table. Flushes the buffer when it
+		has reached 'flush_size' rows.
+		'''
+		# We cannot insert an empty dict into the database.
+		if len(row_dict) == 0:
+			return
+
+		self.rows.append(row_dict)
+		if len(self.rows) >= self.flush_size:
+			self.flush()
+
+	def flush(self):
+		'''
+		Write all the buffered rows to the database.
+		'''
+		if len(self.rows) == 0:
+			return
+
+		# COPY requires a fixed list of columns, so we group
+		# the rows on their columns. In practice all dwellings
+		# pass the same modules, so there is only one group.
+		batches = {}
+		for row in self.rows:
+			batches.setdefault(tuple(row.keys()), []).append(row)
+
+		cursor = self.connection.cursor()
+		for columns, rows in batches.items():
+			copy_statement = sql.SQL('COPY {table_name} ({columns}) FROM STDIN').format(
+				table_name=sql.Identifier(self.table_name),
+				columns=sql.SQL(', ').join([sql.Identifier(column) for column in columns])
+			)
+			cursor.copy_expert(copy_statement, rows_to_copy_buffer(rows))
+		cursor.close()
+
+		self.n_written += len(self.rows)
+		self.rows = []
+
+def rows_to_copy_buffer(rows):
+	'''
+	Convert a list of row dicts into a file-like object
+	in the text format expected by COPY FROM STDIN.
+	'''
+	buffer = io.StringIO()
+	for row in rows:
+		buffer.write('\t'.join([format_copy_value(value) for value in row.values()]))
+		buffer.write('\n')
+	buffer.seek(0)
+	return buffer
+
+def format_copy_value(value):
+	'''
+	Format a Python value as a field for the text
+	format of COPY. Unlike with INSERT, psycopg2 does
+	not adapt the values for us, so we have to do that
+	ourselves for the types that are used in the results:
+	booleans, numbers, strings, numranges and
+	energy_label_class(_range)s.
+	'''
+	if value is None:
+		return '\\N'
+	elif isinstance(value, (bool, np.bool_)):
+		return 't' if value else 'f'
+	elif isinstance(value, Range):
+		return escape_copy_text(format_range(value))
+	else:
+		# Also works for numpy numbers: str(np.float64(0.5)) is '0.5',
+		# and an energy_label_class is just its label, e.g. 'A+'.
+		return escape_copy_text(str(value))
+
+def format_range(range_):
+	'''
+	Format a psycopg2 Range (e.g. a NumericRange or an
+	EnergyLabelClassRange) as a Postgres range literal,
+	e.g. '["D","A"]'.
+	'''
+	if range_.isempty:
+		return 'empty'
+
+	lower_bound = '[' if range_.lower_inc else '('
+	upper_bound = ']' if range_.upper_inc else ')'
+	lower = '' if range_.lower_inf else quote_range_bound(range_.lower)
+	upper = '' if range_.upper_inf else quote_range_bound(range_.upper)
+	return f'{lower_bound}{lower},{upper}{upper_bound}'
+
+def quote_range_bound(value):
+	# Quoting makes sure that labels like 'A+' and numbers
+	# are both read correctly by Postgres.
+	escaped_value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+	return f'"{escaped_value}"'
+
+def escape_copy_text(text):
+	'''
+	Escape the characters that have a special meaning
+	in the text format of COPY.
+	'''
+	return text.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')